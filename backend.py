@@ -1,6 +1,11 @@
-
 import pathway as pw
+import io
 import os
+import json
+import time
+import argparse
+import pandas as pd
+from datetime import timedelta
 from dotenv import load_dotenv
 load_dotenv()
 
@@ -8,103 +13,428 @@ from pathway.xpacks.llm.question_answering import SummaryQuestionAnswerer, BaseR
 from pathway.xpacks.llm.servers import QASummaryRestServer
 from pathway.xpacks.llm import llms, embedders, splitters, parsers
 from pathway.stdlib.indexing import UsearchKnnFactory
+import stream_store
+import stats_store
+import embedding
+import dedup
+import symptoms
+import metrics
 
 # --- CONFIGURATION ---
-DATA_DIR = "./data"
+DATA_DIR = stream_store.DATA_DIR
 RESULTS_DIR = "./results"
 os.makedirs(RESULTS_DIR, exist_ok=True)
 
+# Pipeline state survives restarts (VIGILANCE_PERSIST=0 turns it off)
+PERSIST = os.getenv("VIGILANCE_PERSIST", "1") != "0"
+PERSIST_DIR = os.getenv("VIGILANCE_PERSIST_DIR", os.path.join(RESULTS_DIR, "pw_state"))
+SNAPSHOT_INTERVAL_MS = int(os.getenv("VIGILANCE_SNAPSHOT_MS", "10000"))
+
 # API Keys (Set these in .env or environment)
 # For demo, we assume they are set or we use a free key if available, but here we expect OPENAI_API_KEY
 # pw.set_license_key("YOUR_KEY") # Optional for free features
 
+# --- INPUTS (flat CSVs or the hourly Parquet store, see stream_store.py) ---
+PW_TYPES = {"str": str, "int": int, "float": float, "bool": bool}
+
+def stream_schema(stream, columns=None):
+    """Pathway schema from stream_store.SCHEMAS, projected to `columns`"""
+    types = stream_store.SCHEMAS[stream]
+    return pw.schema_from_types(**{col: PW_TYPES[types[col]] for col in (columns or types)})
+
+class PartitionSubject(pw.io.python.ConnectorSubject):
+    """Streams newly written Parquet part files into Pathway, reading only `columns`"""
+    def __init__(self, stream, columns=None, poll_secs=1.0):
+        super().__init__()
+        self.stream = stream
+        self.columns = columns or list(stream_store.SCHEMAS[stream])
+        self.poll_secs = poll_secs
+
+    def run(self):
+        tracker = stream_store.PartTracker(self.stream)
+        str_cols = [c for c in self.columns if stream_store.SCHEMAS[self.stream][c] == "str"]
+        while True:
+            df = tracker.read_new(self.columns)
+            if not df.empty:
+                df[str_cols] = df[str_cols].astype(object).where(df[str_cols].notna(), "")
+                for row in df.to_dict("records"):
+                    self.next(**row)
+                metrics.count("backend_source_rows", len(df), stream=self.stream)
+            time.sleep(self.poll_secs)
+
+class SegmentSubject(pw.io.python.ConnectorSubject):
+    """
+    Streams the committed rows of a CSV stream's segments into Pathway
+    (stream_store.SegmentTail stops at the writers' commit markers, which the
+    plain file connector would read past). The tail position is reported as
+    the connector offset, so a persisted run resumes after the last row sent.
+    """
+    def __init__(self, stream, columns=None, poll_secs=1.0, static=False, on_resume=None):
+        super().__init__()
+        self.stream = stream
+        self.columns = columns or list(stream_store.SCHEMAS[stream])
+        self.poll_secs = poll_secs
+        self.static = static
+        self.on_resume = on_resume
+        self.tail = stream_store.SegmentTail(stream_store.CSV_FILES[stream])
+
+    def _seek(self, state):
+        self.tail.restore(json.loads(state))
+        if self.on_resume: self.on_resume(self.tail)
+
+    def run(self):
+        types = stream_store.SCHEMAS[self.stream]
+        while True:
+            block, restarted = self.tail.read_new()
+            if restarted:  # truncated/replaced: read the new content from the start
+                self.tail = stream_store.SegmentTail(stream_store.CSV_FILES[self.stream])
+                continue
+            if block.strip():
+                df = pd.read_csv(io.BytesIO(self.tail.header + block), usecols=self.columns,
+                                 dtype=str, keep_default_na=False)
+                for col in self.columns:
+                    if types[col] == "int": df[col] = pd.to_numeric(df[col], errors="coerce").fillna(0).astype("int64")
+                    elif types[col] == "float": df[col] = pd.to_numeric(df[col], errors="coerce")
+                    elif types[col] == "bool": df[col] = df[col].str.lower().eq("true")
+                for row in df[self.columns].to_dict("records"):
+                    self.next(**row)
+                metrics.count("backend_source_rows", len(df), stream=self.stream)
+                self._report_offset(json.dumps(self.tail.state()).encode())
+            if self.static: break
+            time.sleep(self.poll_secs)
+
+def read_stream(stream, columns=None, mode="streaming", name=None, on_resume=None):
+    """Input table for one event stream (projection pushed down to the reader).
+    `name` identifies the input in persisted state, so a restart resumes at its offsets
+    (`on_resume` is then called with the restored SegmentTail)."""
+    schema = stream_schema(stream, columns)
+    if stream_store.STORAGE_MODE == "parquet":
+        return pw.io.python.read(PartitionSubject(stream, columns), schema=schema, name=name)
+    subject = SegmentSubject(stream, columns, static=(mode == "static"), on_resume=on_resume)
+    return pw.io.python.read(subject, schema=schema, name=name)
+
+def persistence_config(path=PERSIST_DIR):
+    """
+    Snapshots of input offsets and pipeline state under `path`.
+    With PATHWAY_LICENSE_KEY set, operator state (reducers, windows, KNN index)
+    is snapshotted directly. Without it only the input is persisted: a restart
+    reads just the new source rows, but replays the persisted input to rebuild
+    the windows and the KNN index, so posts are re-embedded unless the local
+    embedder's on-disk cache serves them (see restart_notice).
+    """
+    if not PERSIST: return None
+    mode = pw.PersistenceMode.OPERATOR_PERSISTING if os.getenv("PATHWAY_LICENSE_KEY") else pw.PersistenceMode.PERSISTING
+    return pw.persistence.Config(
+        pw.persistence.Backend.filesystem(path),
+        snapshot_interval_ms=SNAPSHOT_INTERVAL_MS,
+        persistence_mode=mode
+    )
+
+def restart_notice(rag=True):
+    """What a restart rebuilds under the current persistence setup (None when nothing)"""
+    if not PERSIST or os.getenv("PATHWAY_LICENSE_KEY"): return None
+    notice = "No PATHWAY_LICENSE_KEY: windows and index are rebuilt by replaying the persisted input"
+    if rag and embedding.EMBEDDER != "local":
+        notice += "; every post is re-embedded via OpenAI (VIGILANCE_EMBEDDER=local caches embeddings)"
+    return notice
+
 # --- PART 1: ANALYTICS PIPELINE (DASHBOARD) ---
-sales = pw.io.csv.read(
-    os.path.join(DATA_DIR, "sales_stream.csv"),
-    mode="streaming",
-    schema=pw.schema_from_csv(os.path.join(DATA_DIR, "sales_stream.csv"))
-)
-
-rx = pw.io.csv.read(
-    os.path.join(DATA_DIR, "prescriptions_stream.csv"),
-    mode="streaming",
-    schema=pw.schema_from_csv(os.path.join(DATA_DIR, "prescriptions_stream.csv"))
-)
-
-# Aggregations
-sales_stats = sales.groupby(sales.drug_name).reduce(
-    total_sold=pw.reducers.sum(sales.quantity_sold),
-    last_location=pw.reducers.max(sales.location)
-)
-
-rx_stats = rx.groupby(rx.drug_name).reduce(
-    total_prescribed=pw.reducers.count(),
-    avg_dosage=pw.reducers.avg(rx.dosage_mg)
-)
-
-# Join for Dashboard
-dashboard_stats = sales_stats.join(
-    rx_stats, on=sales_stats.id == rx_stats.id, how="outer"
-).select(
-    drug_name=sales_stats.id,
-    total_sold=pw.coalesce(sales_stats.total_sold, 0),
-    total_prescribed=pw.coalesce(rx_stats.total_prescribed, 0),
-    avg_dosage=pw.coalesce(rx_stats.avg_dosage, 0.0)
-)
-
-# Risk Score Calculation
-dashboard_stats = dashboard_stats.select(
-    *dashboard_stats,
-    risk_score=(dashboard_stats.total_sold * 0.5) + (dashboard_stats.total_prescribed * 1.2)
-)
-
-# Output to CSV for Streamlit
-pw.io.csv.write(
-    dashboard_stats,
-    os.path.join(RESULTS_DIR, "live_stats.csv")
-)
+# Event time comes from the `timestamp` column (isoformat, fraction optional)
+TIME_FORMAT = "%Y-%m-%dT%H:%M:%S%.f"
+
+# Events are counted into 1-minute tumbling panes; each window sums the panes it covers,
+# i.e. a sliding window with a 1-minute hop
+PANE = timedelta(minutes=1)
+WINDOWS = {
+    "5m": timedelta(minutes=5),
+    "1h": timedelta(hours=1),
+    "24h": timedelta(hours=24),
+}
+# Events later than this (behind the newest event) are dropped; panes older than the
+# longest window plus this are evicted
+ALLOWED_LATENESS = timedelta(seconds=int(os.getenv("VIGILANCE_LATENESS_SECS", "60")))
+
+# Risk = time-decayed sum of 0.5 per unit sold + 1.2 per prescription
+RISK_HALF_LIFE_SECS = float(os.getenv("VIGILANCE_RISK_HALF_LIFE_MIN", "30")) * 60
+SALES_WEIGHT = 0.5
+RX_WEIGHT = 1.2
+
+def with_event_time(table):
+    return table.with_columns(event_time=table.timestamp.dt.strptime(TIME_FORMAT))
+
+@pw.reducers.stateful_single
+def decayed_sum(state, t, weight):
+    """(score, as_of): exponentially decayed sum, O(1) state per group"""
+    if state is None: return (weight, t)
+    score, as_of = state
+    if t >= as_of:
+        return (score * 2 ** ((as_of - t) / RISK_HALF_LIFE_SECS) + weight, t)
+    return (score + weight * 2 ** ((t - as_of) / RISK_HALF_LIFE_SECS), as_of) # Late event
+
+@pw.reducers.stateful_single
+def running_max(state, value):
+    """max() without keeping every value (inputs are insert-only)"""
+    return value if state is None else max(state, value)
+
+def panes(sales, rx):
+    """Per-drug 1-minute sales/Rx panes, kept only as long as the longest window needs them"""
+    behavior = pw.temporal.common_behavior(cutoff=max(WINDOWS.values()) + ALLOWED_LATENESS, keep_results=False)
+
+    sales_p = sales.windowby(
+        sales.event_time, window=pw.temporal.tumbling(duration=PANE), instance=sales.drug_name, behavior=behavior
+    ).reduce(
+        drug_name=pw.this._pw_instance,
+        pane_start=pw.this._pw_window_start,
+        sold=pw.reducers.sum(pw.this.quantity_sold),
+        last_location=pw.reducers.max(pw.this.location)
+    )
+    rx_p = rx.windowby(
+        rx.event_time, window=pw.temporal.tumbling(duration=PANE), instance=rx.drug_name, behavior=behavior
+    ).reduce(
+        drug_name=pw.this._pw_instance,
+        pane_start=pw.this._pw_window_start,
+        prescribed=pw.reducers.count(),
+        dosage=pw.reducers.sum(pw.this.dosage_mg)
+    )
+    return sales_p.join_outer(
+        rx_p, sales_p.drug_name == rx_p.drug_name, sales_p.pane_start == rx_p.pane_start
+    ).select(
+        drug_name=pw.coalesce(sales_p.drug_name, rx_p.drug_name),
+        start_s=pw.unwrap(pw.coalesce(sales_p.pane_start, rx_p.pane_start)).dt.timestamp(unit="s"),
+        sold=pw.coalesce(sales_p.sold, 0),
+        last_location=pw.coalesce(sales_p.last_location, ""),
+        prescribed=pw.coalesce(rx_p.prescribed, 0),
+        dosage=pw.coalesce(rx_p.dosage, 0)
+    )
+
+def current_window(pane_table, name, watermark):
+    """Per-drug stats over the last `name` of event time, ending at the watermark's pane"""
+    span = WINDOWS[name].total_seconds()
+    # The panes starting in (watermark - span, watermark]
+    live = pane_table.filter(
+        (pane_table.start_s > watermark.ix_ref().watermark - span)
+        & (pane_table.start_s <= watermark.ix_ref().watermark)
+    )
+    return live.groupby(live.drug_name).reduce(
+        live.drug_name,
+        sold=pw.reducers.sum(live.sold),
+        prescribed=pw.reducers.sum(live.prescribed),
+        avg_dosage=pw.if_else(
+            pw.reducers.sum(live.prescribed) > 0,
+            pw.reducers.sum(live.dosage) / pw.reducers.sum(live.prescribed),
+            0.0
+        ),
+        last_location=pw.reducers.max(live.last_location)
+    )
+
+def build_dashboard_stats(sales, rx):
+    """
+    Per-drug sales/Rx over the last 5 minutes, hour and 24 hours plus the
+    current (time-decayed) risk score. Panes are evicted once the newest event
+    is past them by the longest window plus ALLOWED_LATENESS, so state stays
+    flat over long runs.
+    """
+    sales = with_event_time(sales)
+    rx = with_event_time(rx)
+
+    # 1. Decayed risk per drug, decayed forward to the newest event of any drug
+    events = sales.select(
+        sales.drug_name, t=sales.event_time.dt.timestamp(unit="s"), weight=sales.quantity_sold * SALES_WEIGHT
+    ).concat_reindex(rx.select(
+        rx.drug_name, t=rx.event_time.dt.timestamp(unit="s"), weight=RX_WEIGHT
+    ))
+    watermark = events.reduce(watermark=pw.declare_type(float, running_max(events.t)))
+    risk = events.groupby(events.drug_name).reduce(events.drug_name, state=decayed_sum(events.t, events.weight))
+    risk = risk.select(
+        risk.drug_name,
+        as_of=pw.declare_type(float, risk.state[1]),
+        score=pw.declare_type(float, risk.state[0])
+    )
+    dashboard_stats = risk.select(
+        risk.drug_name,
+        risk_score=risk.score * 2 ** ((risk.as_of - watermark.ix_ref().watermark) / RISK_HALF_LIFE_SECS)
+    )
+
+    # 2. Current windows (drugs without events in a window show zeros)
+    pane_table = panes(sales, rx)
+    for name in WINDOWS:
+        current = current_window(pane_table, name, watermark)
+        dashboard_stats = dashboard_stats.join_left(
+            current, dashboard_stats.drug_name == current.drug_name
+        ).select(
+            *pw.left,
+            **{
+                f"sold_{name}": pw.coalesce(current.sold, 0),
+                f"prescribed_{name}": pw.coalesce(current.prescribed, 0),
+                f"avg_dosage_{name}": pw.coalesce(current.avg_dosage, 0.0),
+                f"last_location_{name}": pw.coalesce(current.last_location, ""),
+            }
+        )
+    return dashboard_stats
 
 # --- PART 2: RAG PIPELINE (CHATBOT) ---
+NEAR_DUPS = dedup.NearDupIndex()
+
+@pw.udf(max_batch_size=1024)
+def canonical_post(post_ids: list[str], texts: list[str], drugs: list[str], timestamps: list[str]) -> list[str]:
+    """post_id of the first post each post near-duplicates (see dedup.py)"""
+    return NEAR_DUPS.add_many(post_ids, texts, drugs, order=timestamps)
+
+def rebuild_near_dups(tail):
+    """
+    Re-adds the posts a resumed run's snapshot already covers (up to the
+    restored tail position) to NEAR_DUPS. Operator snapshots restore
+    canonical_post's results but not the index, so without this, posts
+    arriving after a restart would not match the clusters from before it.
+    Input replay re-runs canonical_post over them instead.
+    """
+    if not os.getenv("PATHWAY_LICENSE_KEY"): return
+    frames = []
+    for path in stream_store.list_segments(tail.path):
+        if os.path.basename(path) in tail.done:
+            frames.append(stream_store.read_segment(path, dtype=str, keep_default_na=False))
+        elif path == tail.current and tail.offset:
+            with open(path, "rb") as f:
+                frames.append(pd.read_csv(io.BytesIO(f.read(tail.offset)), dtype=str, keep_default_na=False))
+    if not frames: return
+    posts = pd.concat(frames, ignore_index=True)
+    NEAR_DUPS.add_many(posts["post_id"].tolist(), posts["text"].tolist(), posts["drug_name"].tolist(),
+                       order=posts["timestamp"].tolist())
+    print(f"DEBUG: Rebuilt near-duplicate index from {len(posts)} persisted posts")
+
+@pw.udf(max_batch_size=1024)
+def extract_symptoms(texts: list[str]) -> list[list[str]]:
+    """Symptoms mentioned in each text (see symptoms.py)"""
+    return symptoms.get_extractor().extract_many(texts)
 
-# 1. Input: Social Stream (Text)
-documents = pw.io.csv.read(
-    os.path.join(DATA_DIR, "social_stream.csv"),
-    mode="streaming",
-    schema=pw.schema_from_csv(os.path.join(DATA_DIR, "social_stream.csv")),
-    with_metadata=True
-)
-
-# 2. Components
-# We use OpenAI by default (requires OPENAI_API_KEY env var)
-# If unavailable, one could swap with LiteLLMChat and a local Ollama.
-llm_model = llms.OpenAIChat(model="gpt-3.5-turbo", temperature=0.0)
-embedder = embedders.OpenAIEmbedder()
-
-# 3. RAG App
-# AdaptiveRAGQuestionAnswerer is a high-level pack
-rag_app = BaseRAGQuestionAnswerer(
-    llm=llm_model,
-    indexer=pw.xpacks.llm.document_store.DocumentStore(
+def multiplicity_bucket(count):
+    """Power-of-two floor of a count: metadata changes O(log n) times, not on every copy"""
+    return 1 << (count.bit_length() - 1)
+
+def social_documents(social):
+    """
+    One document per canonical social post: near-duplicates are collapsed
+    before parsing/embedding, with their (bucketed) multiplicity and the
+    symptoms extracted from the text in the metadata.
+    """
+    keyed = social.select(
+        social.text, social.drug_name, social.source, social.timestamp,
+        canonical=canonical_post(social.post_id, social.text, social.drug_name, social.timestamp),
+        rank=social.timestamp + "|" + social.post_id
+    )
+    groups = keyed.groupby(keyed.canonical).reduce(
+        keyed.canonical,
+        first=pw.reducers.argmin(keyed.rank),
+        first_seen=pw.reducers.min(keyed.timestamp),
+        multiplicity=pw.apply_with_type(multiplicity_bucket, int, pw.reducers.count())
+    )
+    # The document is the group's oldest post, whatever order the copies were processed in
+    # (a replay after a restart then embeds the same texts as the run before it)
+    first = keyed.ix(groups.first)
+    groups = groups.with_columns(text=first.text, drug_name=first.drug_name, source=first.source)
+    groups = groups.with_columns(symptoms=extract_symptoms(groups.text))
+    return groups.select(
+        data=pw.apply_with_type(lambda text: text.encode("utf-8"), bytes, groups.text),
+        _metadata=pw.apply_with_type(
+            lambda post_id, drug, source, first_seen, multiplicity, found: {
+                "post_id": post_id, "drug_name": drug, "source": source,
+                "first_seen": first_seen, "multiplicity": multiplicity, "symptoms": list(found),
+            },
+            pw.Json, groups.canonical, groups.drug_name, groups.source, groups.first_seen, groups.multiplicity,
+            groups.symptoms
+        )
+    )
+
+def build_document_store(documents, embedder=None):
+    """KNN index over the social stream documents"""
+    # OpenAI embeddings, or CPU-local batched + cached ones (VIGILANCE_EMBEDDER=local, see embedding.py)
+    if embedder is None:
+        embedder, dimensions = embedding.make_embedder(cache_dir=PERSIST_DIR if PERSIST else None)
+    else:
+        dimensions = embedder.dimensions
+    return pw.xpacks.llm.document_store.DocumentStore(
         docs=documents,
-        splitter=splitters.TokenCountSplitter(max_tokens=200),
+        # Posts are a sentence or two: one chunk each, decoded as-is. This keeps a
+        # restart's replay down to the (cached) embedding lookups
+        splitter=splitters.NullSplitter(),
         retriever_factory=UsearchKnnFactory(
             embedder=embedder,
-            dimensions=1536 # OpenAI embedding size
+            dimensions=dimensions
         ),
-        parser=parsers.ParseUnstructured() # Simple parser
-    ),
-    short_prompt_template="Answer the question based on the context: {context}\nQuestion: {question}"
-)
+        parser=parsers.Utf8Parser()
+    )
+
+def build_rag_app(store):
+    """Question answering over the document store"""
+    # We use OpenAI by default (requires OPENAI_API_KEY env var)
+    # If unavailable, one could swap with LiteLLMChat and a local Ollama.
+    llm_model = llms.OpenAIChat(model="gpt-3.5-turbo", temperature=0.0)
+    # AdaptiveRAGQuestionAnswerer is a high-level pack
+    return BaseRAGQuestionAnswerer(
+        llm=llm_model,
+        indexer=store,
+        short_prompt_template="Answer the question based on the context: {context}\nQuestion: {question}"
+    )
 
-# 4. Expose as HTTP API
-# This will run on localhost:8000/v1/pw_ai_answer
+def probe_index(store, query="side effects", on_result=None):
+    """
+    One retrieval against the store. A static run has no REST server, so this
+    is what makes it build the index (the result is handed to `on_result`).
+    """
+    queries = pw.debug.table_from_rows(
+        pw.schema_from_types(query=str, k=int, metadata_filter=str | None, filepath_globpattern=str | None),
+        [(query, 1, None, None)],
+    )
+    results = store.retrieve_query(queries)
+    pw.io.subscribe(results, on_change=lambda key, row, time, is_addition:
+                    on_result(row["result"]) if on_result and is_addition else None)
+
+# Exposed as HTTP API on localhost:8000/v1/pw_ai_answer
 host = "0.0.0.0"
 port = 8000
-rag_server = QASummaryRestServer(host, port, rag_app)
 
 # --- EXECUTION ---
+def count_rows(table, stream):
+    """Input rows per stream into the metrics counters (one count reduce, not a per-row callback)"""
+    totals = table.reduce(rows=pw.reducers.count())
+    seen = [0]
+    def on_change(key, row, time, is_addition):
+        if is_addition:
+            metrics.count("backend_rows", row["rows"] - seen[0], stream=stream)
+            seen[0] = row["rows"]
+    pw.io.subscribe(totals, on_change=on_change)
+
+def build_pipeline(mode="streaming", rag=True, db_file=stats_store.DB_FILE, embedder=None):
+    """Dashboard stats into SQLite, plus the RAG index (served over HTTP unless static) over the social stream"""
+    sales = read_stream("sales", columns=["timestamp", "drug_name", "quantity_sold", "location"], mode=mode, name="sales")
+    rx = read_stream("rx", columns=["timestamp", "drug_name", "dosage_mg"], mode=mode, name="rx")
+    count_rows(sales, "sales")
+    count_rows(rx, "rx")
+    dashboard_stats = build_dashboard_stats(sales, rx)
+
+    # Latest state per drug for Streamlit (upserted SQLite table, see stats_store.py)
+    stats_store.subscribe(dashboard_stats, db_file)
+
+    if rag:
+        # Input: Social Stream (Text), near-duplicates collapsed
+        social = read_stream("social", columns=["post_id", "timestamp", "drug_name", "source", "text"], mode=mode,
+                             name="social", on_resume=rebuild_near_dups)
+        count_rows(social, "social")
+        store = build_document_store(social_documents(social), embedder)
+        if mode == "static": probe_index(store)
+        else: QASummaryRestServer(host, port, build_rag_app(store))
+
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Vigilance.AI Pathway backend")
+    parser.add_argument("--static", action="store_true", help="Process what is on disk, then exit")
+    parser.add_argument("--no-rag", action="store_true", help="Only the dashboard stats (no chatbot API)")
+    args = parser.parse_args()
+    build_pipeline(mode="static" if args.static else "streaming", rag=not args.no_rag)
+    metrics.start("backend")
+
     print(f"Starting Pathway Backend...")
-    print(f" - Dashboard Stats writing into {RESULTS_DIR}")
-    print(f" - Chatbot API listening on {host}:{port}")
-    pw.run()
+    print(f" - Dashboard Stats upserted into {stats_store.DB_FILE}")
+    if not args.no_rag: print(f" - Chatbot API listening on {host}:{port}")
+    if PERSIST: print(f" - Resuming from / snapshotting to {PERSIST_DIR}")
+    if notice := restart_notice(rag=not args.no_rag): print(f"WARNING: {notice}")
+    pw.run(persistence_config=persistence_config())
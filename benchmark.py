@@ -0,0 +1,223 @@
+"""
+Benchmark suite for the hot paths, on synthetic streams of 10k..10M rows.
+
+    python benchmark.py --sizes 10k,100k,1M            # run and record results
+    python benchmark.py --save-baseline                # run and make it the baseline
+    python benchmark.py --baseline results/bench_baseline.json --tolerance 1.25
+
+Synthetic files are generated with mock_stream's throughput mode (same
+schemas, fixed seed) under results/bench_data/<rows>/ and reused. Results
+go to results/benchmarks/<timestamp>.json; any op slower than
+baseline x tolerance is reported and the process exits with status 1.
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import statistics
+import contextlib
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, ROOT)
+
+BENCH_DIR = os.path.join(ROOT, "results", "bench_data")
+RESULTS_DIR = os.path.join(ROOT, "results", "benchmarks")
+DEFAULT_BASELINE = os.path.join(ROOT, "results", "bench_baseline.json")
+
+SIZES = {"10k": 10_000, "100k": 100_000, "1M": 1_000_000, "10M": 10_000_000}
+SEED = 42
+APPEND_ROWS = 1_000  # rows appended before each "incremental" measurement
+WARM_REPEATS = 5
+
+QUESTIONS = [
+    "Side effects of Wegovy for women under 30",
+    "Is Rinvoq safe for men over 50?",
+    "What are patients saying about Mounjaro?",
+]
+
+
+@contextlib.contextmanager
+def working_dir(path):
+    """Every module reads ./data relative to the cwd"""
+    previous = os.getcwd()
+    os.chdir(path)
+    try: yield
+    finally: os.chdir(previous)
+
+
+def generate(rows, workers):
+    """Synthetic streams with exactly the mock_stream schemas (cached per size)"""
+    import mock_stream
+    workdir = os.path.join(BENCH_DIR, str(rows))
+    marker = os.path.join(workdir, ".complete")
+    if not os.path.exists(marker):
+        os.makedirs(os.path.join(workdir, "data"), exist_ok=True)
+        with working_dir(workdir):
+            for name in ("social_stream.csv", "prescriptions_stream.csv", "sales_stream.csv"):
+                with contextlib.suppress(FileNotFoundError): os.remove(os.path.join("data", name))
+            mock_stream.run_throughput(0, workers=workers, seed=SEED, max_events=rows)
+        open(marker, "w").close()
+    return workdir
+
+
+def append_rows(rows, seed):
+    import mock_stream
+    mock_stream.run_worker(0, 0, seed=seed, max_events=rows, batch_rows=rows)
+
+
+def timed(fn, repeats=1):
+    """Median wall time of `repeats` calls, in seconds"""
+    samples = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples)
+
+
+class StubLLM:
+    """Stands in for OpenAI(): returns a fixed answer without network"""
+    class chat:
+        class completions:
+            @staticmethod
+            def create(**kwargs):
+                message = type("Message", (), {"content": "stub answer"})
+                return type("Completion", (), {"choices": [type("Choice", (), {"message": message})]})
+
+
+def bench_app(results):
+    import utils
+    import fetch_fda
+    fetch_fda.OFFLINE = True # FDA stubbed: labels only from the local store
+    utils.OpenAI = StubLLM   # LLM stubbed
+
+    for cached in (utils.get_data_hub, utils.get_response_cache):
+        cached.clear()
+
+    # load_data: cold (full parse), warm (nothing new), incremental (APPEND_ROWS new rows)
+    results["load_data.cold"] = timed(utils.load_data)
+    results["load_data.warm"] = timed(utils.load_data, WARM_REPEATS)
+    append_rows(APPEND_ROWS, SEED + 1)
+    results["load_data.incremental"] = timed(utils.load_data)
+
+    # Copilot social-stats path (cube build, then per-question cost)
+    results["copilot.social_stats.cold"] = timed(lambda: utils.social_insight_for(utils.parse_intent(QUESTIONS[0])))
+    results["copilot.social_stats.warm"] = timed(
+        lambda: [utils.social_insight_for(utils.parse_intent(q)) for q in QUESTIONS], WARM_REPEATS)
+
+    def ask_uncached():
+        utils.get_response_cache.clear()
+        for q in QUESTIONS: utils.query_copilot(q)
+    results["copilot.query.warm"] = timed(ask_uncached, WARM_REPEATS)
+
+    # Feed thread assembly (index build, then one page)
+    results["feed.page.cold"] = timed(lambda: utils.load_feed_page("All Sources"))
+    results["feed.page.warm"] = timed(lambda: utils.load_feed_page("All Sources"), WARM_REPEATS)
+
+    # Dashboard aggregations (views build, then snapshot)
+    results["dashboard.views.cold"] = timed(utils.load_dashboard_views)
+    results["dashboard.views.warm"] = timed(utils.load_dashboard_views, WARM_REPEATS)
+
+    # Everything again after an append: the incremental paths
+    append_rows(APPEND_ROWS, SEED + 2)
+    results["feed.page.incremental"] = timed(lambda: utils.load_feed_page("All Sources"))
+    results["dashboard.views.incremental"] = timed(utils.load_dashboard_views)
+    results["copilot.social_stats.incremental"] = timed(lambda: utils.social_insight_for(utils.parse_intent(QUESTIONS[0])))
+
+
+def bench_backend(results):
+    """Analytics pipeline of backend.py over the static files"""
+    try:
+        import pathway as pw
+        import backend
+    except Exception as e:
+        print(f"   (backend skipped: {e})")
+        return
+
+    def run():
+        pw.internals.parse_graph.G.clear()
+        sales = backend.read_stream("sales", columns=["timestamp", "drug_name", "quantity_sold", "location"], mode="static")
+        rx = backend.read_stream("rx", columns=["timestamp", "drug_name", "dosage_mg"], mode="static")
+        pw.debug.table_to_pandas(backend.build_dashboard_stats(sales, rx))
+    results["backend.dashboard_stats"] = timed(run)
+
+
+def compare(current, baseline, tolerance):
+    """Ops slower than baseline x tolerance: [(size, op, baseline_s, current_s)]"""
+    regressions = []
+    for size, ops in current.items():
+        for op, seconds in ops.items():
+            before = baseline.get(size, {}).get(op)
+            if before and seconds > before * tolerance:
+                regressions.append((size, op, before, seconds))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Vigilance.AI hot-path benchmarks")
+    parser.add_argument("--sizes", default="10k,100k", help=f"Comma separated, from {', '.join(SIZES)}")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Generator processes")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="Baseline results JSON to compare against")
+    parser.add_argument("--tolerance", type=float, default=1.25, help="Allowed slowdown factor vs baseline")
+    parser.add_argument("--save-baseline", action="store_true", help="Store this run as the new baseline")
+    parser.add_argument("--skip-backend", action="store_true")
+    args = parser.parse_args()
+
+    current = {}
+    for label in args.sizes.split(","):
+        rows = SIZES[label.strip()]
+        print(f">>> {label}: preparing {rows:,} rows...")
+        workdir = generate(rows, args.workers)
+
+        # Work on a scratch copy so appends do not grow the cached files
+        scratch = os.path.join(workdir, "run")
+        shutil.rmtree(scratch, ignore_errors=True)
+        shutil.copytree(os.path.join(workdir, "data"), os.path.join(scratch, "data"))
+        fda_store = os.path.join(ROOT, "data", "fda_context.json")
+        if os.path.exists(fda_store): shutil.copy(fda_store, os.path.join(scratch, "data"))
+
+        results = {}
+        with working_dir(scratch):
+            bench_app(results)
+            if not args.skip_backend: bench_backend(results)
+        current[label] = results
+        for op, seconds in results.items():
+            print(f"   {op:<36} {seconds * 1000:>10.2f} ms")
+
+    report = {
+        "created_at": datetime.now().isoformat(),
+        "python": platform.python_version(),
+        "machine": platform.platform(),
+        "results": current,
+    }
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    out = os.path.join(RESULTS_DIR, f"{datetime.now():%Y%m%dT%H%M%S}.json")
+    with open(out, "w") as f: json.dump(report, f, indent=2)
+    print(f"Saved results to {out}")
+
+    if args.save_baseline:
+        with open(args.baseline, "w") as f: json.dump(report, f, indent=2)
+        print(f"Saved baseline to {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline} (run with --save-baseline to create one)")
+        return 0
+    with open(args.baseline) as f: baseline = json.load(f)["results"]
+
+    regressions = compare(current, baseline, args.tolerance)
+    if regressions:
+        print(f"\n!!! PERFORMANCE REGRESSION ({len(regressions)} ops slower than baseline x {args.tolerance}) !!!")
+        for size, op, before, now in regressions:
+            print(f"   [{size}] {op}: {before * 1000:.2f} ms -> {now * 1000:.2f} ms ({now / before:.2f}x)")
+        return 1
+    print("No regressions against baseline.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
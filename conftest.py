@@ -0,0 +1,13 @@
+import pytest
+
+import stream_store
+
+
+@pytest.fixture
+def stream_file(tmp_path, monkeypatch):
+    """stream_file(stream) points stream_store.CSV_FILES[stream] at a fresh file under tmp_path"""
+    def use(stream):
+        path = str(tmp_path / f"{stream}.csv")
+        monkeypatch.setitem(stream_store.CSV_FILES, stream, path)
+        return path
+    return use
@@ -0,0 +1,94 @@
+import re
+import time
+import threading
+from collections import OrderedDict
+
+# Words that do not change what the copilot is asked
+STOPWORDS = {"a", "an", "the", "of", "for", "in", "on", "with", "to", "is", "are", "what", "whats",
+             "about", "me", "tell", "please", "any", "do", "does", "and", "or", "there", "my"}
+
+
+def normalize_question(user_query):
+    """Case, punctuation, word order and filler words do not matter"""
+    words = re.findall(r"[a-z0-9]+", user_query.lower())
+    return " ".join(sorted(set(w for w in words if w not in STOPWORDS)))
+
+
+def fingerprint(stats):
+    """What an answer was based on: (posts, avg rating, top-3 symptoms) of its slice"""
+    posts, avg_rating, symptoms = stats
+    named = [(s, n) for s, n in symptoms.items() if s != "None"]
+    top = tuple(sorted(s for s, _ in sorted(named, key=lambda kv: -kv[1])[:3]))
+    return posts, avg_rating, top
+
+
+def changed_materially(old, new, drift=0.1, rating_drift=0.5):
+    """Slice grew/shrank by more than `drift`, avg rating moved, or the top symptoms changed"""
+    old_posts, old_rating, old_top = old
+    new_posts, new_rating, new_top = new
+    if old_top != new_top: return True
+    if abs(new_posts - old_posts) > drift * max(old_posts, 1): return True
+    if old_posts and new_posts and abs(new_rating - old_rating) > rating_drift: return True
+    return False
+
+
+class ResponseCache:
+    """
+    Bounded LRU + TTL cache of copilot answers.
+    Keys are the normalized intent (drug, gender, age, question). The data
+    version is the fingerprint of the aggregates an answer was based on: an
+    entry is dropped once those changed materially, or after `ttl` seconds.
+    """
+
+    def __init__(self, max_entries=256, ttl=900):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()  # key -> (answer, created_at, fingerprint)
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.evictions = 0
+
+    @staticmethod
+    def key(intent, user_query):
+        return (intent["drug"], intent["gender"], intent["age"], normalize_question(user_query))
+
+    def get(self, key, current):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                answer, created_at, based_on = entry
+                if time.time() - created_at > self.ttl:
+                    del self.entries[key]
+                    self.evictions += 1
+                elif changed_materially(based_on, current):
+                    del self.entries[key]
+                    self.invalidations += 1
+                else:
+                    self.entries.move_to_end(key)
+                    self.hits += 1
+                    return answer
+            self.misses += 1
+            return None
+
+    def put(self, key, current, answer):
+        with self.lock:
+            self.entries[key] = (answer, time.time(), current)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self.entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "invalidations": self.invalidations,
+                "evictions": self.evictions,
+            }
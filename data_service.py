@@ -0,0 +1,426 @@
+import io
+import os
+import json
+import struct
+import argparse
+import threading
+from urllib.parse import urlparse, parse_qs
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import stream_loader
+import stream_store
+import live_views
+import signals
+import scorecards
+import demand
+import metrics
+
+# --- SHARED DATA SERVICE ---
+# DataHub owns the parsed streams and every incrementally maintained view.
+# In-process it is what the Streamlit pages use (one per app process). Run as
+#
+#     python data_service.py --port 8765
+#
+# it serves the same slices and aggregates over a local HTTP API (DataFrames
+# as Arrow IPC), and pages started with VIGILANCE_DATA_SERVICE=http://127.0.0.1:8765
+# use RemoteHub instead: no stream is parsed per app process/session. The
+# pages read the service's views; only load() (raw frames, for scripts and the
+# benchmark) keeps a per-process copy, limited to the newest REMOTE_MAX_ROWS
+# rows per stream and extended with the rows appended since the last call (/since).
+
+SERVICE_URL = os.getenv("VIGILANCE_DATA_SERVICE")  # unset = in-process hub
+SERVICE_PORT = int(os.getenv("VIGILANCE_DATA_SERVICE_PORT", "8765"))
+REMOTE_MAX_ROWS = int(os.getenv("VIGILANCE_REMOTE_MAX_ROWS", "200000"))
+
+
+class DataHub:
+    """Parsed streams + views, each refreshed from newly appended rows only when read"""
+
+    def __init__(self, loader=None, inventory_path=demand.INVENTORY_DB):
+        self.loader = loader or stream_loader.StreamLoader()
+        self.feed_index = live_views.FeedIndex()
+        self.dashboard_views = live_views.DashboardViews()
+        self.cube_view = live_views.DemographicCube()
+        self.canonical = live_views.CanonicalPosts()
+        self.detector = signals.SignalDetector()
+        self.cards = scorecards.Scorecards(self.detector)
+        self.engine = demand.DemandEngine(inventory_path)
+
+    def _refresh(self, *names):
+        for name in names:
+            reader = self.loader.readers[name]
+            try: reader.refresh()
+            except Exception as e: print(f"DEBUG: Error tailing {reader.path} - {e}")
+
+    def load(self):
+        """{stream: DataFrame} of everything parsed so far"""
+        return self.loader.load()
+
+    def since(self, stream, cursor=None):
+        """Rows of one stream appended after `cursor` (see ChunkedReader.since)"""
+        self._refresh(stream)
+        return self.loader.readers[stream].since(cursor)
+
+    def slice(self, stream, columns=None, drugs=None, start=None, end=None):
+        """Projected, filtered slice of one stream (pushed down to Parquet in parquet mode)"""
+        if stream_store.STORAGE_MODE == "parquet":
+            return stream_store.read_parquet(stream, columns, drugs, start, end)
+        self._refresh(stream)
+        df = self.loader.readers[stream].frame()
+        if df.empty: return df
+        return stream_store.filter_frame(df, columns, drugs, start, end)
+
+    def feed_page(self, feed_filter, before=None, page_size=20):
+        self._refresh('social')
+        reader = self.loader.readers['social']
+        self.feed_index.sync(reader)
+        positions, next_cursor = self.feed_index.page(feed_filter, before, page_size)
+        parents = reader.take(positions)
+
+        child_positions = {pid: self.feed_index.children_of(pid) for pid in parents['post_id']} if not parents.empty else {}
+        all_children = reader.take([p for ps in child_positions.values() for p in ps])
+        threads = {pid: all_children.loc[ps] for pid, ps in child_positions.items()}
+        return parents, threads, next_cursor, self.feed_index.total(feed_filter)
+
+    def dashboard(self):
+        self._refresh('social', 'rx')
+        self.dashboard_views.sync(self.loader.readers['social'], self.loader.readers['rx'])
+        return self.dashboard_views.snapshot()
+
+    def cube(self):
+        self._refresh('social')
+        self.cube_view.sync(self.loader.readers['social'])
+        return self.cube_view
+
+    def canonical_posts(self, drug=None, n=5):
+        self._refresh('social')
+        self.canonical.sync(self.loader.readers['social'])
+        return self.canonical.top(drug, n)
+
+    def signals(self, drug=None):
+        self._refresh('social')
+        self.detector.sync(self.loader.readers['social'])
+        return self.detector.table(drug)
+
+    def scorecards(self):
+        self._refresh('social')
+        self.cards.sync(self.loader.readers['social'])
+        return self.cards
+
+    def demand(self):
+        self._refresh('sales', 'social')
+        self.engine.sync(self.loader.readers['sales'], self.loader.readers['social'])
+        return self.engine
+
+
+# --- WIRE FORMAT ---
+# A response is a JSON header (plain values + table names) followed by one
+# Arrow IPC stream per DataFrame, each length-prefixed.
+
+def _json_default(value):
+    if isinstance(value, np.generic): return value.item()
+    if isinstance(value, (pd.Timestamp,)): return value.isoformat()
+    return str(value)
+
+
+def pack(values=None, tables=None):
+    tables = tables or {}
+    header = json.dumps({"values": values or {}, "tables": list(tables)}, default=_json_default).encode()
+    out = io.BytesIO()
+    out.write(struct.pack("<I", len(header)))
+    out.write(header)
+    for df in tables.values():
+        sink = pa.BufferOutputStream()
+        table = pa.Table.from_pandas(df, preserve_index=True)
+        with pa.ipc.new_stream(sink, table.schema) as writer: writer.write_table(table)
+        body = sink.getvalue()
+        out.write(struct.pack("<Q", body.size))
+        out.write(body)
+    return out.getvalue()
+
+
+def unpack(payload):
+    """(values, {name: DataFrame})"""
+    view = memoryview(payload)
+    size = struct.unpack_from("<I", view, 0)[0]
+    header = json.loads(bytes(view[4:4 + size]))
+    offset, tables = 4 + size, {}
+    for name in header["tables"]:
+        length = struct.unpack_from("<Q", view, offset)[0]
+        offset += 8
+        tables[name] = pa.ipc.open_stream(pa.py_buffer(view[offset:offset + length])).read_all().to_pandas()
+        offset += length
+    return header["values"], tables
+
+
+def _threads_table(threads):
+    """{post_id: replies} as one frame with a _thread column"""
+    parts = [df.assign(_thread=pid) for pid, df in threads.items() if not df.empty]
+    return pd.concat(parts) if parts else pd.DataFrame(columns=['_thread'])
+
+
+# --- HTTP API ---
+
+def _arg(query, name, default=None):
+    values = query.get(name)
+    return values[0] if values and values[0] != "" else default
+
+
+def _list(query, name):
+    value = _arg(query, name)
+    return value.split(",") if value else None
+
+
+def handle(hub, path, query, body=None):
+    """Routes one request to the hub; returns the packed response"""
+    if path == "/version":
+        return pack({"streams": {name: list(reader.version) for name, reader in hub.loader.readers.items()}})
+    if path == "/since":
+        cursor = _arg(query, "cursor")
+        cursor = tuple(int(x) for x in cursor.split(",")) if cursor else None
+        rows, cursor, reset = hub.since(_arg(query, "stream"), cursor)
+        limit = int(_arg(query, "limit", 0))
+        if limit and len(rows) > limit: rows = rows.iloc[-limit:]  # the caller only keeps the newest rows
+        return pack({"cursor": cursor, "reset": reset}, {"rows": rows})
+    if path == "/slice":
+        df = hub.slice(_arg(query, "stream"), _list(query, "columns"), _list(query, "drugs"),
+                       _arg(query, "start"), _arg(query, "end"))
+        return pack(tables={"slice": df})
+    if path == "/feed":
+        before = _arg(query, "before")
+        before = tuple(int(x) for x in before.split(",")) if before else None
+        parents, threads, next_cursor, total = hub.feed_page(_arg(query, "filter"), before, int(_arg(query, "size", 20)))
+        return pack({"next_cursor": next_cursor, "total": total},
+                    {"parents": parents, "replies": _threads_table(threads)})
+    if path == "/dashboard":
+        snapshot = hub.dashboard()
+        return pack({"kpis": snapshot["kpis"]}, {k: v for k, v in snapshot.items() if k != "kpis"})
+    if path == "/cube":
+        posts, avg_rating, symptom_counts = hub.cube().query(
+            _arg(query, "drug"), _arg(query, "gender"), _arg(query, "age"), _arg(query, "source"))
+        return pack({"stats": [posts, avg_rating, symptom_counts]})
+    if path == "/canonical":
+        return pack(tables={"posts": hub.canonical_posts(_arg(query, "drug"), int(_arg(query, "n", 5)))})
+    if path == "/signals":
+        return pack(tables={"signals": hub.signals(_arg(query, "drug"))})
+    if path == "/scorecards":
+        return pack({"drugs": hub.scorecards().drug_list()})
+    if path == "/scorecard":
+        card = hub.scorecards().card(_arg(query, "drug"))
+        if card is None: return pack({"card": None})
+        return pack({"card": {k: v for k, v in card.items() if not isinstance(v, pd.DataFrame)}},
+                    {k: v for k, v in card.items() if isinstance(v, pd.DataFrame)})
+    if path == "/demand":
+        engine = hub.demand()
+        return pack(tables={"drugs": engine.drugs(), "pharmacies": engine.pharmacies()})
+    if path == "/demand/restock":
+        order = json.loads(body or b"{}")
+        hub.demand().restock(order["pharmacy_id"], order["drug_name"], float(order["quantity"]))
+        return pack({"ok": True})
+    return None
+
+
+class Handler(BaseHTTPRequestHandler):
+    hub = None
+
+    def _respond(self, body=None):
+        url = urlparse(self.path)
+        try:
+            with metrics.span("service.request", endpoint=url.path):
+                payload = handle(self.hub, url.path, parse_qs(url.query), body)
+        except Exception as e:
+            print(f"DEBUG: Error serving {self.path} - {e}")
+            self.send_error(500, str(e))
+            return
+        if payload is None:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "application/vnd.apache.arrow.stream")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_GET(self):
+        self._respond()
+
+    def do_POST(self):
+        self._respond(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+
+    def log_message(self, *args):
+        pass
+
+
+def serve(hub=None, host="127.0.0.1", port=SERVICE_PORT):
+    """Serves a hub over HTTP (returns the server; serve_forever() is the caller's)"""
+    handler = type("BoundHandler", (Handler,), {"hub": hub or DataHub()})
+    return ThreadingHTTPServer((host, port), handler)
+
+
+# --- CLIENT ---
+
+class RemoteHub:
+    """DataHub interface over the HTTP API (one pooled connection set per app process)"""
+
+    def __init__(self, url=SERVICE_URL, timeout=30, max_rows=REMOTE_MAX_ROWS):
+        import requests
+        self.url = url.rstrip("/")
+        self.timeout = timeout
+        self.max_rows = max_rows
+        self.session = requests.Session()
+        self.lock = threading.Lock()
+        self.readers = None  # created by the first load(); the pages never need them
+
+    def _get(self, path, **params):
+        params = {k: ",".join(map(str, v)) if isinstance(v, (list, tuple)) else v
+                  for k, v in params.items() if v is not None}
+        response = self.session.get(f"{self.url}{path}", params=params, timeout=self.timeout)
+        response.raise_for_status()
+        return unpack(response.content)
+
+    def load(self):
+        """{stream: DataFrame} of the newest max_rows rows per stream; only rows appended
+        since the previous load are transferred"""
+        with self.lock:
+            if self.readers is None:
+                self.readers = {name: RemoteReader(self, name, self.max_rows) for name in stream_store.SCHEMAS}
+        for reader in self.readers.values():
+            try: reader.refresh()
+            except Exception as e: print(f"DEBUG: Error fetching {reader.path} - {e}")
+        return {name: reader.frame().copy(deep=False) for name, reader in self.readers.items()}
+
+    def slice(self, stream, columns=None, drugs=None, start=None, end=None):
+        return self._get("/slice", stream=stream, columns=columns, drugs=drugs, start=start, end=end)[1]["slice"]
+
+    def feed_page(self, feed_filter, before=None, page_size=20):
+        values, tables = self._get("/feed", filter=feed_filter, before=before, size=page_size)
+        replies = tables["replies"]
+        threads = {pid: group.drop(columns="_thread") for pid, group in replies.groupby("_thread", sort=False)}
+        threads.update({pid: replies.iloc[:0].drop(columns="_thread")
+                        for pid in tables["parents"].get("post_id", []) if pid not in threads})
+        cursor = values["next_cursor"]
+        return tables["parents"], threads, tuple(cursor) if cursor else None, values["total"]
+
+    def dashboard(self):
+        values, tables = self._get("/dashboard")
+        return {"kpis": values["kpis"], **tables}
+
+    def cube(self):
+        return RemoteCube(self)
+
+    def canonical_posts(self, drug=None, n=5):
+        return self._get("/canonical", drug=drug, n=n)[1]["posts"]
+
+    def signals(self, drug=None):
+        return self._get("/signals", drug=drug)[1]["signals"]
+
+    def scorecards(self):
+        return RemoteScorecards(self)
+
+    def demand(self):
+        return RemoteDemand(self)
+
+
+class RemoteReader(stream_loader.ChunkedReader):
+    """
+    Local copy of the newest `max_rows` rows of one service stream, extended
+    with the rows appended after its cursor. Row positions (the frame index)
+    keep counting from the start of the stream.
+    """
+
+    def __init__(self, hub, stream, max_rows=REMOTE_MAX_ROWS):
+        self.hub = hub
+        self.max_rows = max_rows
+        self.cursor = None
+        super().__init__(f"{hub.url}/since?stream={stream}", stream=stream)
+
+    def _reset(self):
+        super()._reset()
+        self.held = 0
+
+    def refresh(self):
+        with self.lock:
+            values, tables = self.hub._get("/since", stream=self.stream, cursor=self.cursor, limit=self.max_rows)
+            if values["reset"] and self.cursor is not None: self._reset()
+            rows = tables["rows"]
+            self.rows = values["cursor"][1] - len(rows)  # rows the service left out are counted, not held
+            self.cursor = values["cursor"]
+            if rows.empty: return 0
+            self._append(rows)
+            self.held += len(rows)
+            self._trim()
+            return len(rows)
+
+    def _trim(self):
+        """Drops the oldest rows past max_rows"""
+        excess = self.held - self.max_rows
+        while excess > 0 and self.chunks:
+            first = self.chunks[0]
+            if len(first) <= excess: self.chunks.pop(0)
+            else: self.chunks[0] = first.iloc[excess:].copy()
+            dropped = min(len(first), excess)
+            self.held -= dropped
+            excess -= dropped
+        self._frame = None
+
+
+class RemoteCube:
+    def __init__(self, hub):
+        self.hub = hub
+
+    def query(self, drug=None, gender=None, age=None, source=None):
+        posts, avg_rating, symptom_counts = self.hub._get("/cube", drug=drug, gender=gender, age=age,
+                                                          source=source)[0]["stats"]
+        return posts, float('nan') if avg_rating is None else avg_rating, symptom_counts
+
+
+class RemoteScorecards:
+    def __init__(self, hub):
+        self.hub = hub
+        self.drugs = hub._get("/scorecards")[0]["drugs"]
+
+    def drug_list(self):
+        return self.drugs
+
+    def card(self, drug):
+        values, tables = self.hub._get("/scorecard", drug=drug)
+        return None if values["card"] is None else {**values["card"], **tables}
+
+
+class RemoteDemand:
+    def __init__(self, hub):
+        self.hub = hub
+        _, self.tables = hub._get("/demand")
+
+    def drugs(self):
+        return self.tables["drugs"]
+
+    def pharmacies(self):
+        return self.tables["pharmacies"]
+
+    def restock(self, pharmacy_id, drug_name, quantity):
+        response = self.hub.session.post(f"{self.hub.url}/demand/restock", timeout=self.hub.timeout,
+                                         json={"pharmacy_id": pharmacy_id, "drug_name": drug_name, "quantity": quantity})
+        response.raise_for_status()
+
+
+def make_hub(url=None):
+    """RemoteHub when a service URL is configured, else an in-process DataHub"""
+    url = url or SERVICE_URL
+    return RemoteHub(url) if url else DataHub()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Vigilance.AI shared data service")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=SERVICE_PORT)
+    args = parser.parse_args()
+
+    hub = DataHub()
+    hub.load() # Parse the history once up front
+    server = serve(hub, args.host, args.port)
+    metrics.start("data_service")
+    print(f"Data service listening on http://{args.host}:{args.port} (set VIGILANCE_DATA_SERVICE to use it)")
+    server.serve_forever()
@@ -1,9 +1,11 @@
 
 import pandas as pd
 import os
+import stream_store
 
 try:
-    df = pd.read_csv("./data/social_stream.csv")
+    # Thread integrity only needs these columns (read from CSV or the Parquet store)
+    df = stream_store.read_stream("social", columns=['post_id', 'parent_id', 'timestamp', 'drug_name', 'is_launch'])
     print(f"Total Rows: {len(df)}")
     
     # Check Columns
@@ -0,0 +1,147 @@
+import re
+import zlib
+import threading
+from collections import Counter
+import numpy as np
+import pandas as pd
+
+# --- NEAR-DUPLICATE COLLAPSING OF SOCIAL POSTS ---
+# Posts are normalized (case, @mentions, numbers, whitespace) and compared by
+# MinHash over character shingles. Identical normalized texts match by dict
+# lookup; the rest go through LSH banding and a signature-agreement check.
+# Posts of different drugs are never merged.
+
+SHINGLE = 5          # characters per shingle
+NUM_PERM = 64        # MinHash signature length
+BANDS = 16           # LSH bands (NUM_PERM / BANDS rows each)
+THRESHOLD = 0.8      # estimated Jaccard similarity to count as a duplicate
+
+MENTION_RE = re.compile(r"@\w+")
+NUMBER_RE = re.compile(r"\d+")
+SPACE_RE = re.compile(r"\s+")
+
+_PRIME = np.uint64((1 << 31) - 1)
+_rng = np.random.default_rng(1)
+_A = _rng.integers(1, int(_PRIME), NUM_PERM, dtype=np.uint64)
+_B = _rng.integers(0, int(_PRIME), NUM_PERM, dtype=np.uint64)
+
+
+def normalize(text):
+    text = MENTION_RE.sub("@user", str(text).lower())
+    text = NUMBER_RE.sub("0", text)
+    return SPACE_RE.sub(" ", text).strip()
+
+
+def normalize_many(texts):
+    """normalize() over a batch, with vectorized string ops"""
+    texts = pd.Series(texts, dtype=object).astype(str).str.lower()
+    texts = texts.str.replace(MENTION_RE, "@user", regex=True).str.replace(NUMBER_RE, "0", regex=True)
+    return texts.str.replace(SPACE_RE, " ", regex=True).str.strip()
+
+
+def shingles(normalized):
+    """crc32 of every SHINGLE-character window (the whole text when shorter)"""
+    if len(normalized) <= SHINGLE:
+        return np.array([zlib.crc32(normalized.encode("utf-8"))], dtype=np.uint64)
+    encoded = [normalized[i:i + SHINGLE].encode("utf-8") for i in range(len(normalized) - SHINGLE + 1)]
+    return np.unique(np.fromiter((zlib.crc32(s) for s in encoded), dtype=np.uint64, count=len(encoded)))
+
+
+def minhash(normalized):
+    """NUM_PERM-long MinHash signature, (a * x + b) mod 2^31-1 permutations"""
+    x = shingles(normalized) % _PRIME  # < 2^31, so a * x + b stays inside uint64
+    return ((x[:, None] * _A + _B) % _PRIME).min(axis=0)
+
+
+def similarity(sig_a, sig_b):
+    """Estimated Jaccard similarity of two signatures"""
+    return float(np.mean(sig_a == sig_b))
+
+
+class NearDupIndex:
+    """
+    Assigns every post a canonical id: the id of the first post it
+    near-duplicates (itself when it is new), and counts multiplicities.
+    """
+
+    def __init__(self, threshold=THRESHOLD):
+        self.threshold = threshold
+        self.lock = threading.Lock()
+        self.exact = {}       # (scope, normalized text) -> canonical id
+        self.buckets = {}     # (scope, band, band bytes) -> canonical id
+        self.signatures = {}  # canonical id -> signature
+        self.counts = Counter()
+
+    def _lookup(self, scope, signature):
+        rows = NUM_PERM // BANDS
+        candidates = []
+        for band in range(BANDS):
+            canonical = self.buckets.get((scope, band, signature[band * rows:(band + 1) * rows].tobytes()))
+            if canonical is not None and canonical not in candidates: candidates.append(canonical)
+        for canonical in candidates:
+            if similarity(self.signatures[canonical], signature) >= self.threshold:
+                return canonical
+        return None
+
+    def _insert(self, scope, signature, canonical):
+        rows = NUM_PERM // BANDS
+        self.signatures[canonical] = signature
+        for band in range(BANDS):
+            self.buckets.setdefault((scope, band, signature[band * rows:(band + 1) * rows].tobytes()), canonical)
+
+    def _canonical(self, doc_id, scope, normalized):
+        canonical = self.exact.get((scope, normalized))
+        if canonical is None:
+            signature = minhash(normalized)
+            canonical = self._lookup(scope, signature)
+            if canonical is None:
+                canonical = doc_id
+                self._insert(scope, signature, canonical)
+            self.exact[(scope, normalized)] = canonical
+        return canonical
+
+    def add(self, doc_id, text, scope=""):
+        """Canonical id of `text` (registering it as canonical when it is new)"""
+        with self.lock:
+            canonical = self._canonical(doc_id, scope, normalize(text))
+            self.counts[canonical] += 1
+            return canonical
+
+    def add_many(self, doc_ids, texts, scopes=None, order=None):
+        """
+        add() over a batch: each distinct (scope, normalized text) is resolved once.
+        With `order` (e.g. timestamps) the batch is resolved in (order, doc id)
+        order, so the canonical ids do not depend on how rows were batched.
+        """
+        if len(texts) == 0: return []
+        if order is not None:
+            ranks = np.lexsort((np.asarray(doc_ids, dtype=str), np.asarray(order, dtype=str)))
+            pick = lambda values: [values[i] for i in ranks]
+            canonical = self.add_many(pick(doc_ids), pick(texts), pick(scopes) if scopes is not None else None)
+            result = [None] * len(ranks)
+            for i, value in zip(ranks, canonical): result[i] = value
+            return result
+        scopes = pd.Series(scopes if scopes is not None else [""] * len(texts), dtype=object).astype(str)
+        # Normalize each distinct raw text once, then group by normalized text
+        raw_codes, raw = pd.factorize(scopes + "\x00" + pd.Series(texts, dtype=object).astype(str))
+        parts = raw.str.split("\x00", n=1)
+        raw_scopes, normalized = parts.str[0], normalize_many(parts.str[1])
+        codes, _ = pd.factorize(raw_scopes + "\x00" + normalized)
+        _, first = np.unique(codes, return_index=True)
+        _, first_row = np.unique(raw_codes, return_index=True)
+        with self.lock:
+            resolved = np.array([self._canonical(doc_ids[first_row[i]], raw_scopes[i], normalized.iat[i]) for i in first],
+                                dtype=object)
+            canonical = resolved[codes][raw_codes]
+            self.counts.update(Counter(canonical.tolist()))
+            return canonical.tolist()
+
+    def multiplicity(self, canonical):
+        with self.lock:
+            return self.counts.get(canonical, 0)
+
+    def stats(self):
+        with self.lock:
+            posts = sum(self.counts.values())
+            return {"posts": posts, "canonical": len(self.counts),
+                    "collapse_ratio": posts / len(self.counts) if self.counts else 0.0}
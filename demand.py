@@ -0,0 +1,311 @@
+import os
+import sqlite3
+import threading
+import contextlib
+from datetime import datetime
+import numpy as np
+import pandas as pd
+from live_views import _epoch_seconds, _summary
+
+# --- DEMAND VELOCITY AND DAYS-TO-STOCKOUT FOR THE PHARMACY VIEW ---
+# Units sold per (pharmacy, drug) and social mentions per drug are tracked as
+# an exponentially weighted rate and a rolling-window rate. State is a few
+# numpy arrays indexed by key, so a batch of new rows is a handful of
+# vectorized updates no matter how many pharmacies there are. Stock levels
+# come from a persisted inventory table; units sold after a row's as_of time
+# are subtracted from it to project days to stockout.
+
+HALF_LIFE_SECS = float(os.getenv("VIGILANCE_DEMAND_HALF_LIFE_MIN", "60")) * 60
+WINDOW_SECS = int(os.getenv("VIGILANCE_DEMAND_WINDOW_MIN", "60")) * 60
+DEFAULT_STOCK = int(os.getenv("VIGILANCE_DEFAULT_STOCK", "100"))
+PANE_SECS = 60
+DAY = 24 * 3600
+
+RESULTS_DIR = "./results"
+INVENTORY_DB = os.path.join(RESULTS_DIR, "inventory.db")
+KEY_SEP = "\x1f"
+
+
+class RateTracker:
+    """
+    Per-key EWMA rate (time-decayed sum, half-life `half_life`) and rolling
+    rate over the last `window` seconds (1-minute panes, expired as the
+    watermark moves). Rates are per second at the watermark.
+    """
+
+    def __init__(self, half_life=HALF_LIFE_SECS, window=WINDOW_SECS, pane=PANE_SECS):
+        self.half_life = half_life
+        self.window = window
+        self.pane = pane
+        self.index = {}  # key -> position in the arrays
+        self.keys = []
+        self.decayed = np.zeros(0)
+        self.rolling = np.zeros(0)
+        self.total = np.zeros(0)
+        self.panes = {}  # pane start -> (positions, values)
+        self.watermark = None
+
+    def positions(self, keys):
+        """Array positions of `keys`, registering new ones"""
+        codes, uniques = pd.factorize(np.asarray(keys, dtype=object))
+        mapped = np.empty(len(uniques), dtype=np.int64)
+        for i, key in enumerate(uniques):
+            pos = self.index.get(key)
+            if pos is None:
+                pos = self.index[key] = len(self.keys)
+                self.keys.append(key)
+            mapped[i] = pos
+        if len(self.keys) > len(self.decayed):
+            grow = len(self.keys) - len(self.decayed)
+            self.decayed, self.rolling, self.total = (np.concatenate([a, np.zeros(grow)])
+                                                      for a in (self.decayed, self.rolling, self.total))
+        return mapped[codes]
+
+    def add(self, keys, times, values):
+        if len(times) == 0: return np.zeros(0, dtype=np.int64)
+        pos = self.positions(keys)
+        times, values = np.asarray(times, dtype=float), np.asarray(values, dtype=float)
+
+        # 1. EWMA: decay every key to the new watermark in one multiply, then add the batch
+        newest = float(times.max()) if self.watermark is None else max(self.watermark, float(times.max()))
+        if self.watermark is not None: self.decayed *= 2 ** ((self.watermark - newest) / self.half_life)
+        np.add.at(self.decayed, pos, values * np.exp2((times - newest) / self.half_life))
+        np.add.at(self.total, pos, values)
+        self.watermark = newest
+
+        # 2. ROLLING: one pane entry per (pane, key) of the batch, late rows of expired panes dropped
+        starts = (times // self.pane * self.pane).astype(np.int64)
+        live = starts > newest - self.window
+        frame = pd.DataFrame({'pane': starts[live], 'pos': pos[live], 'value': values[live]})
+        for start, group in frame.groupby('pane'):
+            summed = group.groupby('pos')['value'].sum()
+            np.add.at(self.rolling, summed.index.to_numpy(), summed.to_numpy())
+            old = self.panes.get(start)
+            self.panes[start] = (summed.index.to_numpy(), summed.to_numpy()) if old is None else (
+                np.concatenate([old[0], summed.index.to_numpy()]), np.concatenate([old[1], summed.to_numpy()]))
+        for start in [s for s in self.panes if s <= newest - self.window]:
+            expired_pos, expired_values = self.panes.pop(start)
+            np.subtract.at(self.rolling, expired_pos, expired_values)
+        return pos
+
+    def ewma_rate(self):
+        """Per-second EWMA rate of every key (a constant rate r decays to a sum of r * half_life / ln 2)"""
+        return self.decayed * np.log(2) / self.half_life
+
+    def rolling_rate(self):
+        return np.maximum(self.rolling, 0) / self.window
+
+
+def connect(path=INVENTORY_DB):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS inventory ("
+        "pharmacy_id TEXT, drug_name TEXT, stock REAL, max_stock REAL, as_of REAL, updated_at TEXT, "
+        "PRIMARY KEY (pharmacy_id, drug_name))"
+    )
+    # Sales segments already folded into stock (see checkpoint_inventory)
+    conn.execute("CREATE TABLE IF NOT EXISTS checkpoints (segment TEXT PRIMARY KEY, checkpointed_at TEXT)")
+    return conn
+
+
+def read_inventory(path=INVENTORY_DB):
+    """Stock per (pharmacy, drug) as of `as_of` (epoch seconds); empty frame when there is none yet"""
+    if not os.path.exists(path): return pd.DataFrame(columns=['pharmacy_id', 'drug_name', 'stock', 'max_stock', 'as_of'])
+    with contextlib.closing(connect(path)) as conn:
+        return pd.read_sql_query("SELECT pharmacy_id, drug_name, stock, max_stock, as_of FROM inventory", conn)
+
+
+UPSERT = ("INSERT INTO inventory VALUES (?, ?, ?, ?, ?, ?) ON CONFLICT(pharmacy_id, drug_name) DO UPDATE SET "
+          "stock = excluded.stock, max_stock = excluded.max_stock, as_of = excluded.as_of, updated_at = excluded.updated_at")
+
+
+def write_inventory(rows, path=INVENTORY_DB, overwrite=True):
+    """Upserts (pharmacy_id, drug_name, stock, max_stock, as_of) rows in one transaction
+    (overwrite=False only inserts keys the table does not have yet)"""
+    updated_at = datetime.now().isoformat()
+    sql = UPSERT if overwrite else "INSERT OR IGNORE INTO inventory VALUES (?, ?, ?, ?, ?, ?)"
+    with contextlib.closing(connect(path)) as conn, conn:
+        conn.executemany(sql, [(*row, updated_at) for row in rows])
+
+
+def checkpoint_inventory(rows, path=INVENTORY_DB, segment=None):
+    """
+    Folds sales rows that are about to be summarized away into the inventory
+    table: units sold after each key's as_of come off its stock and as_of moves
+    to the key's last sale, so stock never needs those rows again. A named
+    `segment` is recorded in the same transaction and checkpointed only once.
+    Returns False when it already was.
+    """
+    sales = pd.DataFrame({
+        'pharmacy_id': rows['pharmacy_id'].astype(str), 'drug_name': rows['drug_name'].astype(str),
+        't': _epoch_seconds(rows['timestamp']),
+        'qty': pd.to_numeric(rows['quantity_sold'], errors='coerce').fillna(0).to_numpy(dtype=float),
+    })
+    updated_at = datetime.now().isoformat()
+    with contextlib.closing(connect(path)) as conn, conn:
+        conn.execute("BEGIN IMMEDIATE")  # no restock can slip in between the read and the write
+        if segment is not None:
+            if conn.execute("SELECT 1 FROM checkpoints WHERE segment = ?", (segment,)).fetchone(): return False
+            conn.execute("INSERT INTO checkpoints VALUES (?, ?)", (segment, updated_at))
+        current = pd.read_sql_query("SELECT pharmacy_id, drug_name, stock, max_stock, as_of FROM inventory", conn)
+        sales = sales.merge(current, on=['pharmacy_id', 'drug_name'], how='left')
+        first_sale = sales.groupby(['pharmacy_id', 'drug_name'])['t'].transform('min') - 1e-6
+        sales['as_of'] = sales['as_of'].fillna(first_sale)
+        sales['stock'] = sales['stock'].fillna(DEFAULT_STOCK)
+        sales['max_stock'] = sales['max_stock'].fillna(DEFAULT_STOCK)
+        sales['sold'] = sales['qty'].where(sales['t'] > sales['as_of'], 0.0)
+        keys = sales.groupby(['pharmacy_id', 'drug_name']).agg(
+            stock=('stock', 'first'), max_stock=('max_stock', 'first'), as_of=('as_of', 'first'),
+            sold=('sold', 'sum'), last_sale=('t', 'max')).reset_index()
+        conn.executemany(UPSERT, [
+            (row.pharmacy_id, row.drug_name, max(row.stock - row.sold, 0.0), row.max_stock,
+             max(row.as_of, row.last_sale), updated_at) for row in keys.itertuples(index=False)
+        ])
+    return True
+
+
+class DemandEngine:
+    """
+    Demand velocity and stock projection, folded in from the sales and social
+    readers. Keys never seen in the inventory table are stocked with
+    DEFAULT_STOCK as of their first sale (and persisted). Summarized history
+    (segments.py) is folded in as one event per key and hour.
+    """
+
+    def __init__(self, path=INVENTORY_DB, half_life=HALF_LIFE_SECS, window=WINDOW_SECS):
+        self.path = path
+        self.half_life = half_life
+        self.window = window
+        self.lock = threading.Lock()
+        self.cursors = {"sales": None, "social": None}
+        self._reset_sales()
+        self.mentions = RateTracker(half_life, window)
+
+    def _reset_sales(self):
+        self.sales = RateTracker(self.half_life, self.window)
+        self.stock = np.zeros(0)      # per sales key, from the inventory table
+        self.max_stock = np.zeros(0)
+        self.as_of = np.zeros(0)
+        self.sold_since = np.zeros(0) # units sold after as_of
+        self.pharmacy_ids = []        # per sales key, split once when the key is registered
+        self.drug_names = []
+        self.inventory = {}           # key -> (stock, max_stock, as_of) from the table
+        try:
+            for row in read_inventory(self.path).itertuples(index=False):
+                self.inventory[f"{row.pharmacy_id}{KEY_SEP}{row.drug_name}"] = (row.stock, row.max_stock, row.as_of)
+        except Exception as e:
+            print(f"DEBUG: Error reading {self.path} - {e}")
+
+    def _grow(self, size):
+        grow = size - len(self.stock)
+        if grow <= 0: return
+        self.stock, self.max_stock, self.sold_since = (np.concatenate([a, np.zeros(grow)])
+                                                       for a in (self.stock, self.max_stock, self.sold_since))
+        self.as_of = np.concatenate([self.as_of, np.full(grow, np.nan)])
+
+    def sync(self, sales_reader, social_reader):
+        with self.lock:
+            rows, self.cursors["sales"], reset = sales_reader.since(self.cursors["sales"])
+            if reset:
+                self._reset_sales()
+                summary = _summary(sales_reader)
+                if summary is not None: self._add_sales(summary.assign(timestamp=summary['hour'] + ":00:00"))
+            if not rows.empty: self._add_sales(rows)
+
+            rows, self.cursors["social"], reset = social_reader.since(self.cursors["social"])
+            if reset:
+                self.mentions = RateTracker(self.half_life, self.window)
+                summary = _summary(social_reader)
+                if summary is not None:
+                    self.mentions.add(summary['drug_name'].astype(str).to_numpy(),
+                                      _epoch_seconds(summary['hour'] + ":00:00"),
+                                      summary['posts'].to_numpy(dtype=float))
+            if not rows.empty:
+                self.mentions.add(rows['drug_name'].astype(str).to_numpy(), _epoch_seconds(rows['timestamp']),
+                                  np.ones(len(rows)))
+
+    def _add_sales(self, rows):
+        times = _epoch_seconds(rows['timestamp'])
+        keys = (rows['pharmacy_id'].astype(str) + KEY_SEP + rows['drug_name'].astype(str)).to_numpy()
+        qty = pd.to_numeric(rows['quantity_sold'], errors='coerce').fillna(0).to_numpy(dtype=float)
+        known = len(self.sales.keys)
+        pos = self.sales.add(keys, times, qty)
+        self._grow(len(self.sales.keys))
+
+        # New keys: stock from the table, or DEFAULT_STOCK just before their first sale
+        if len(self.sales.keys) > known:
+            first_sale = pd.Series(times).groupby(pos).min()
+            seeded = []
+            for p in range(known, len(self.sales.keys)):
+                key = self.sales.keys[p]
+                pharmacy_id, drug_name = key.split(KEY_SEP, 1)
+                self.pharmacy_ids.append(pharmacy_id)
+                self.drug_names.append(drug_name)
+                stock, max_stock, as_of = self.inventory.get(key) or (DEFAULT_STOCK, DEFAULT_STOCK, first_sale[p] - 1e-6)
+                if key not in self.inventory:
+                    self.inventory[key] = (stock, max_stock, as_of)
+                    seeded.append((pharmacy_id, drug_name, stock, max_stock, as_of))
+                self.stock[p], self.max_stock[p], self.as_of[p] = stock, max_stock, as_of
+            if seeded:
+                try: write_inventory(seeded, self.path, overwrite=False)
+                except Exception as e: print(f"DEBUG: Error writing {self.path} - {e}")
+
+        after = times > self.as_of[pos]
+        np.add.at(self.sold_since, pos[after], qty[after])
+
+    def restock(self, pharmacy_id, drug_name, quantity):
+        """Adds `quantity` units to the projected stock and persists the new level"""
+        with self.lock:
+            key = f"{pharmacy_id}{KEY_SEP}{drug_name}"
+            now = self.sales.watermark or datetime.now().timestamp()
+            p = self.sales.index.get(key)
+            if p is None:
+                stock, max_stock, _ = self.inventory.get(key, (0, DEFAULT_STOCK, now))
+                remaining = stock
+            else:
+                remaining, max_stock = max(self.stock[p] - self.sold_since[p], 0), self.max_stock[p]
+            stock, max_stock = remaining + quantity, max(max_stock, remaining + quantity)
+            write_inventory([(pharmacy_id, drug_name, stock, max_stock, now)], self.path)
+            self.inventory[key] = (stock, max_stock, now)
+            if p is not None:
+                self.stock[p], self.max_stock[p], self.as_of[p], self.sold_since[p] = stock, max_stock, now, 0.0
+
+    def pharmacies(self):
+        """One row per (pharmacy, drug): demand rates (units/day), projected stock and days to stockout"""
+        with self.lock:
+            if not self.sales.keys: return pd.DataFrame(columns=['pharmacy_id', 'drug_name', 'ewma_per_day',
+                                                                 'rolling_per_day', 'units_sold', 'stock',
+                                                                 'max_stock', 'days_to_stockout'])
+            ewma = self.sales.ewma_rate() * DAY
+            remaining = np.maximum(self.stock - self.sold_since, 0)
+            df = pd.DataFrame({
+                'pharmacy_id': self.pharmacy_ids, 'drug_name': self.drug_names,
+                'ewma_per_day': ewma,
+                'rolling_per_day': self.sales.rolling_rate() * DAY,
+                'units_sold': self.sales.total.copy(),
+                'stock': remaining,
+                'max_stock': self.max_stock.copy(),
+            })
+        with np.errstate(divide='ignore'):
+            df['days_to_stockout'] = np.where(ewma > 0, remaining / ewma, np.inf)
+        return df
+
+    def drugs(self):
+        """Per-drug rollup: sales and social-mention velocity, total stock, earliest stockout across pharmacies"""
+        per_key = self.pharmacies()
+        with self.lock:
+            mentions = pd.DataFrame({'drug_name': self.mentions.keys,
+                                     'mentions_ewma_per_hour': self.mentions.ewma_rate() * 3600,
+                                     'mentions_rolling_per_hour': self.mentions.rolling_rate() * 3600})
+        per_drug = per_key.groupby('drug_name').agg(
+            ewma_per_day=('ewma_per_day', 'sum'), rolling_per_day=('rolling_per_day', 'sum'),
+            stock=('stock', 'sum'), max_stock=('max_stock', 'sum'),
+            pharmacies=('pharmacy_id', 'count'), min_days_to_stockout=('days_to_stockout', 'min'),
+        ).reset_index()
+        with np.errstate(divide='ignore'):
+            per_drug['days_to_stockout'] = np.where(per_drug['ewma_per_day'] > 0,
+                                                    per_drug['stock'] / per_drug['ewma_per_day'], np.inf)
+        return per_drug.merge(mentions, on='drug_name', how='outer').fillna(
+            {'mentions_ewma_per_hour': 0.0, 'mentions_rolling_per_hour': 0.0})
@@ -0,0 +1,198 @@
+import os
+import re
+import struct
+import hashlib
+import threading
+from collections import OrderedDict
+import numpy as np
+import metrics
+from pathway.xpacks.llm.embedders import BaseEmbedder
+
+# --- LOCAL EMBEDDINGS FOR THE RAG INDEX ---
+# VIGILANCE_EMBEDDER=openai (default) keeps the OpenAI embedder; "local" embeds on
+# the CPU, in batches, behind a content-hash cache. The local model is a
+# sentence-transformers model when VIGILANCE_EMBEDDER_MODEL names one, and a
+# dependency-free feature-hashing embedder otherwise.
+EMBEDDER = os.getenv("VIGILANCE_EMBEDDER", "openai")
+EMBEDDER_MODEL = os.getenv("VIGILANCE_EMBEDDER_MODEL")
+EMBED_DIM = int(os.getenv("VIGILANCE_EMBED_DIM", "384"))
+EMBED_BATCH = int(os.getenv("VIGILANCE_EMBED_BATCH", "256"))
+EMBED_CACHE_SIZE = int(os.getenv("VIGILANCE_EMBED_CACHE", "200000"))
+OPENAI_DIM = 1536
+
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+def content_key(text):
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+
+
+RECORD_HEADER = struct.Struct("<16sI")  # content hash, dimensions
+
+
+class EmbeddingCache:
+    """
+    Bounded LRU of content hash -> vector (identical texts are embedded once).
+    With a `path`, new vectors are also appended to a file and loaded back on
+    start, so a restarted backend does not re-embed what it has seen.
+    """
+
+    def __init__(self, max_entries=EMBED_CACHE_SIZE, path=None):
+        self.max_entries = max_entries
+        self.path = path
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        if path: self._load()
+
+    def _load(self):
+        records, torn = 0, False
+        try:
+            with open(self.path, "rb") as f:
+                while header := f.read(RECORD_HEADER.size):
+                    key, dimensions = RECORD_HEADER.unpack(header) if len(header) == RECORD_HEADER.size else (None, 0)
+                    body = f.read(4 * dimensions)
+                    if key is None or len(body) < 4 * dimensions: # Torn tail from a crash
+                        torn = True
+                        break
+                    self.entries[key] = np.frombuffer(body, dtype=np.float32)
+                    records += 1
+        except FileNotFoundError:
+            return
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+        if torn or records != len(self.entries):
+            self._rewrite() # Drop the torn tail (later appends must start on a record boundary) and evicted/duplicate records
+        print(f"DEBUG: Loaded {len(self.entries)} cached embeddings from {self.path}")
+
+    def _rewrite(self):
+        tmp = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            for key, vector in self.entries.items(): f.write(self._record(key, vector))
+        os.replace(tmp, self.path)
+
+    @staticmethod
+    def _record(key, vector):
+        vector = np.ascontiguousarray(vector, dtype=np.float32)
+        return RECORD_HEADER.pack(key, len(vector)) + vector.tobytes()
+
+    def get_many(self, keys):
+        with self.lock:
+            found = {}
+            for key in keys:
+                vector = self.entries.get(key)
+                if vector is not None:
+                    self.entries.move_to_end(key)
+                    found[key] = vector
+            hits = sum(1 for key in keys if key in found)
+            self.hits += hits
+            self.misses += len(keys) - hits
+            return found
+
+    def put_many(self, items):
+        with self.lock:
+            for key, vector in items:
+                self.entries[key] = vector
+                self.entries.move_to_end(key)
+            if self.path:
+                try:
+                    os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+                    with open(self.path, "ab") as f:
+                        f.write(b"".join(self._record(key, vector) for key, vector in items))
+                except Exception as e:
+                    print(f"DEBUG: Error writing {self.path} - {e}")
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {"size": len(self.entries), "hits": self.hits, "misses": self.misses,
+                    "hit_rate": self.hits / lookups if lookups else 0.0}
+
+
+class HashingModel:
+    """
+    Signed feature hashing of word unigrams and bigrams, L2-normalized.
+    No model download, deterministic across processes and restarts.
+    """
+
+    def __init__(self, dimensions=EMBED_DIM):
+        self.dimensions = dimensions
+        self.features = {}  # token -> (index, sign); the social vocabulary is small
+
+    def _feature(self, token):
+        feature = self.features.get(token)
+        if feature is None:
+            h = int.from_bytes(hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest(), "little")
+            feature = self.features[token] = (h % self.dimensions, 1.0 if h >> 63 else -1.0)
+        return feature
+
+    def encode(self, texts):
+        out = np.zeros((len(texts), self.dimensions), dtype=np.float32)
+        for row, text in enumerate(texts):
+            words = TOKEN_RE.findall(text.lower())
+            for token in words + [f"{a} {b}" for a, b in zip(words, words[1:])]:
+                index, sign = self._feature(token)
+                out[row, index] += sign
+        norms = np.linalg.norm(out, axis=1, keepdims=True)
+        return out / np.where(norms == 0, 1.0, norms)
+
+
+class SentenceTransformerModel:
+    def __init__(self, model):
+        from sentence_transformers import SentenceTransformer
+        self.model = SentenceTransformer(model, device="cpu")
+        self.dimensions = self.model.get_sentence_embedding_dimension()
+
+    def encode(self, texts):
+        return np.asarray(self.model.encode(texts, batch_size=EMBED_BATCH), dtype=np.float32)
+
+
+class LocalEmbedder(BaseEmbedder):
+    """
+    CPU-local Pathway embedder. Pathway hands it up to `batch_size` texts at a
+    time; texts already seen (same content hash) come from the cache and only
+    the distinct misses are encoded, in one call.
+    """
+
+    def __init__(self, model=None, dimensions=EMBED_DIM, batch_size=EMBED_BATCH, cache=None, cache_path=None):
+        super().__init__(max_batch_size=batch_size)
+        self.model = SentenceTransformerModel(model) if model else HashingModel(dimensions)
+        self.cache = cache if cache is not None else EmbeddingCache(path=cache_path)
+
+    @property
+    def dimensions(self):
+        return self.model.dimensions
+
+    def embed(self, texts):
+        keys = [content_key(text or ".") for text in texts]
+        found = self.cache.get_many(keys)
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in found: missing.setdefault(key, text or ".")
+        if missing:
+            vectors = self.model.encode(list(missing.values()))
+            metrics.count("embedded_texts", len(missing))
+            fresh = list(zip(missing, vectors))
+            self.cache.put_many(fresh)
+            found.update(fresh)
+        return [found[key] for key in keys]
+
+    def __wrapped__(self, input: list[str], **kwargs) -> list[np.ndarray]:
+        if isinstance(input, str): # get_embedding_dimension() passes a single text
+            return self.embed([input])[0]
+        return self.embed(list(input))
+
+
+def make_embedder(kind=None, cache_dir=None):
+    """(embedder, dimensions) for the configured VIGILANCE_EMBEDDER (local cache kept in `cache_dir`)"""
+    if (kind or EMBEDDER) == "local":
+        # One cache file per model, vectors of another model/size are never mixed in
+        name = re.sub(r"[^A-Za-z0-9.-]+", "_", EMBEDDER_MODEL or f"hashing-{EMBED_DIM}")
+        cache_path = os.path.join(cache_dir, f"embeddings-{name}.bin") if cache_dir else None
+        embedder = LocalEmbedder(model=EMBEDDER_MODEL, cache_path=cache_path)
+        return embedder, embedder.dimensions
+    from pathway.xpacks.llm import embedders
+    return embedders.OpenAIEmbedder(), OPENAI_DIM
@@ -1,6 +1,14 @@
 import requests
 import json
 import os
+import sys
+import time
+import random
+import argparse
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from requests.adapters import HTTPAdapter
 
 DATA_DIR = "./data"
 os.makedirs(DATA_DIR, exist_ok=True)
@@ -18,73 +26,377 @@ DRUG_MAP = {
     "Paracetamol": "acetaminophen"
 }
 
+# --- OPENFDA CLIENT ---
+# One pooled session, requests spaced by a shared rate limiter, and retries with
+# exponential backoff (plus jitter, or the server's Retry-After) on 429/5xx and
+# connection errors. A 404 is OpenFDA's "no match" and is not retried.
+FDA_URL = os.getenv("VIGILANCE_FDA_URL", "https://api.fda.gov/drug/label.json")
+FDA_API_KEY = os.getenv("VIGILANCE_FDA_API_KEY", "")
+REQUEST_TIMEOUT = 5
+MAX_RETRIES = int(os.getenv("VIGILANCE_FDA_RETRIES", "4"))
+BACKOFF_SECS = 0.5
+BACKOFF_MAX_SECS = 30.0
+PREFETCH_WORKERS = int(os.getenv("VIGILANCE_FDA_WORKERS", "8"))
+PREFETCH_RATE = float(os.getenv("VIGILANCE_FDA_RATE", "4"))  # requests/sec; OpenFDA allows 240/min
+SAVE_EVERY = 25  # prefetched labels written to the store per batch
+
+class FetchError(Exception):
+    """OpenFDA still failing after MAX_RETRIES"""
+
+class RateLimiter:
+    """Spaces calls at least 1/rate seconds apart across threads (rate 0 = unlimited)"""
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate else 0.0
+        self.next_at = 0.0
+        self.lock = threading.Lock()
+
+    def wait(self):
+        if not self.interval: return
+        with self.lock:
+            now = time.monotonic()
+            at = max(now, self.next_at)
+            self.next_at = at + self.interval
+        time.sleep(max(0.0, at - now))
+
+def make_session(pool_size=PREFETCH_WORKERS):
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+_session = None
+_limiter = RateLimiter(0)
+
+def _default_session():
+    global _session
+    if _session is None: _session = make_session()
+    return _session
+
+def _backoff(attempt, response=None):
+    retry_after = response.headers.get("Retry-After") if response is not None else None
+    if retry_after and retry_after.isdigit(): return min(float(retry_after), BACKOFF_MAX_SECS)
+    return min(BACKOFF_SECS * 2 ** attempt, BACKOFF_MAX_SECS) * random.uniform(0.5, 1.0)
+
+def _query(session, search, limiter, retries=MAX_RETRIES):
+    """First label matching an OpenFDA search (None = no match). Raises FetchError."""
+    params = {"search": search, "limit": 1}
+    if FDA_API_KEY: params["api_key"] = FDA_API_KEY
+    error = None
+    for attempt in range(retries + 1):
+        limiter.wait()
+        response = None
+        try:
+            response = session.get(FDA_URL, params=params, timeout=REQUEST_TIMEOUT)
+            if response.status_code == 200:
+                results = response.json().get("results") or []
+                return results[0] if results else None
+            if response.status_code == 404: return None
+            error = f"HTTP {response.status_code}"
+            if response.status_code != 429 and response.status_code < 500: break
+        except (requests.ConnectionError, requests.Timeout, ValueError) as e:
+            error = repr(e)
+        if attempt < retries: time.sleep(_backoff(attempt, response))
+    raise FetchError(f"{search}: {error}")
+
+def _search_term(drug_name):
+    """Normalized search term: brands in DRUG_MAP map to their ingredient"""
+    search_term = drug_name.lower().strip()
+    for brand, ingredient in DRUG_MAP.items():
+        if brand.lower() == search_term:
+            return ingredient
+    return search_term
+
+def _first(values, default):
+    return values[0] if isinstance(values, list) and values else default
+
+def parse_label(res, drug_name):
+    """
+    Store entry for one OpenFDA label: the summary fields the app reads, the
+    label's set id/version, and every text section (the HTML *_table
+    renderings of the same sections are left out).
+    """
+    openfda = res.get("openfda", {})
+    return {
+        "source": "OpenFDA",
+        "brand": _first(openfda.get("brand_name"), drug_name),
+        "generic": _first(openfda.get("substance_name"), "Unknown"),
+        "warnings": _first(res.get("warnings"), "No boxed warnings."),
+        "adverse_reactions": _first(res.get("adverse_reactions"), "No side effects listed."),
+        "indications": _first(res.get("indications_and_usage"), "No indications listed."),
+        "set_id": res.get("set_id"),
+        "version": res.get("version"),
+        "effective_time": res.get("effective_time"),
+        "sections": {
+            name: "\n".join(map(str, value)) for name, value in res.items()
+            if isinstance(value, list) and not name.endswith("_table") and all(isinstance(v, str) for v in value)
+        },
+    }
+
+def fetch_label(drug_name, session=None, limiter=None, retries=MAX_RETRIES):
+    """
+    Official FDA label of one drug (None = OpenFDA has no match). Tries the
+    exact brand/generic name, then a fuzzy search. Raises FetchError.
+    """
+    session = session or _default_session()
+    limiter = limiter or _limiter
+    search_term = _search_term(drug_name)
+    res = _query(session, f'openfda.brand_name:"{search_term}" OR openfda.generic_name:"{search_term}"', limiter, retries)
+    if res is None:
+        res = _query(session, f"openfda.brand_name:{search_term} OR openfda.generic_name:{search_term}", limiter, retries)
+    return parse_label(res, drug_name) if res is not None else None
+
 def fetch_drug_label(drug_name):
     """
     Fetches official FDA label. 
     Handles Brand -> Generic mapping locally before querying.
     """
-    # 1. Normalize & Map
-    search_term = drug_name.lower().strip()
-    
-    # Direct Mapping (Custom Demo & Real World)
-    # Check if the lowercased drug_name matches any lowercased key in DRUG_MAP
-    mapped_ingredient = None
-    for brand, ingredient in DRUG_MAP.items():
-        if brand.lower() == search_term:
-            mapped_ingredient = ingredient
-            break
-    
-    if mapped_ingredient:
-        search_term = mapped_ingredient
-        
-    print(f"DEBUG: Fetching OpenFDA for '{search_term}' (Original: '{drug_name}')")
-
-    # 2. Query OpenFDA
+    print(f"DEBUG: Fetching OpenFDA for '{_search_term(drug_name)}' (Original: '{drug_name}')")
     try:
-        # Strategy A: Try Exact Brand Name
-        url = f"https://api.fda.gov/drug/label.json?search=openfda.brand_name:\"{search_term}\"+OR+openfda.generic_name:\"{search_term}\"&limit=1"
-        r = requests.get(url, timeout=5)
-        
-        if r.status_code != 200:
-            # Strategy B: Fuzzy Search
-            url = f"https://api.fda.gov/drug/label.json?search=openfda.brand_name:{search_term}+OR+openfda.generic_name:{search_term}&limit=1"
-            r = requests.get(url, timeout=5)
-
-        if r.status_code == 200:
-            data = r.json()
-            if "results" in data:
-                res = data["results"][0]
-                return {
-                    "source": "OpenFDA",
-                    "brand": res.get("openfda", {}).get("brand_name", [drug_name])[0],
-                    "generic": res.get("openfda", {}).get("substance_name", ["Unknown"])[0],
-                    "warnings": res.get("warnings", ["No boxed warnings."])[0],
-                    "adverse_reactions": res.get("adverse_reactions", ["No side effects listed."])[0],
-                    "indications": res.get("indications_and_usage", ["No indications listed."])[0]
-                }
+        return fetch_label(drug_name, retries=1)
     except Exception as e:
-        print(f"DEBUG: Error fetching {url} - {e}")
+        print(f"DEBUG: Error fetching {drug_name} - {e}")
         return None
-            
+
+# --- LABEL CACHE ---
+# In-memory LRU in front of fetch_drug_label, backed by OUTPUT_FILE on disk.
+# Fresh entries are served directly; stale ones are served immediately while a
+# background thread refreshes them; misses are cached too (for a shorter TTL).
+# An unknown drug is fetched in the background as well: callers wait at most
+# MISS_WAIT_SECS for that one fetch, then go on without a label.
+CACHE_TTL = float(os.getenv("VIGILANCE_FDA_TTL", 7 * 24 * 3600))
+NEGATIVE_TTL = float(os.getenv("VIGILANCE_FDA_NEGATIVE_TTL", 3600))
+CACHE_SIZE = 256
+MISS_WAIT_SECS = float(os.getenv("VIGILANCE_FDA_MISS_WAIT_SECS", "2"))  # longest a caller waits on a label fetch
+OFFLINE = os.getenv("VIGILANCE_FDA_OFFLINE", "").lower() in ("1", "true", "yes")
+
+_cache = OrderedDict()  # normalized drug name -> {"label": dict | None, "fetched_at": float}
+_cache_lock = threading.Lock()
+_inflight = {}  # normalized drug name -> Event set when its fetch finishes
+_stored = set()  # normalized drug names with a label in OUTPUT_FILE
+_store_mtime = None
+_store_lock = threading.Lock()  # read-merge-write of OUTPUT_FILE
+
+def _key(drug_name):
+    return drug_name.lower().strip()
+
+def _load_store():
+    """(Re)loads the newest labels of the on-disk store into the LRU (up to CACHE_SIZE) when the file changed"""
+    global _store_mtime
+    try: mtime = os.path.getmtime(OUTPUT_FILE)
+    except OSError: return
+    if mtime == _store_mtime: return
+    try:
+        with open(OUTPUT_FILE) as f: store = json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"DEBUG: Could not read {OUTPUT_FILE} - {e}")
+        return
+    _store_mtime = mtime
+    _stored.clear()
+    _stored.update(_key(brand) for brand, label in store.items() if isinstance(label, dict))
+    # Entries written before the cache existed count as fetched when the file was written
+    entries = sorted(((label.get("_fetched_at", mtime), _key(brand), label) for brand, label in store.items()
+                      if isinstance(label, dict)),
+                     key=lambda entry: entry[0], reverse=True)
+    for fetched_at, key, label in entries:
+        if key in _cache:
+            if _cache[key]["fetched_at"] < fetched_at: _cache[key] = {"label": label, "fetched_at": fetched_at}
+        elif len(_cache) < CACHE_SIZE:
+            # Not used yet: behind every cached entry, older labels last
+            _cache[key] = {"label": label, "fetched_at": fetched_at}
+            _cache.move_to_end(key, last=False)
+
+def _read_stored(key):
+    """Cache entry for one drug from the on-disk store (labels the LRU evicted or never loaded)"""
+    try:
+        mtime = os.path.getmtime(OUTPUT_FILE)
+        with open(OUTPUT_FILE) as f: store = json.load(f)
+    except (OSError, ValueError):
+        return None
+    for brand, label in store.items():
+        if _key(brand) == key and isinstance(label, dict):
+            return {"label": label, "fetched_at": label.get("_fetched_at", mtime)}
     return None
 
-def main():
-    print("Fetching OpenFDA Data...")
-    fda_db = {}
-    
-    for brand, ingredient in DRUG_MAP.items():
-        print(f" - Querying for {brand} ({ingredient})...")
-        data = fetch_drug_label(ingredient)
-        if data:
-            fda_db[brand] = data
-            print(f"   ✓ Found label.")
-        else:
-            print(f"   ✗ No data found.")
-            
-    with open(OUTPUT_FILE, "w") as f:
-        json.dump(fda_db, f, indent=2)
-    
-    print(f"Saved FDA Context to {OUTPUT_FILE}")
+def _merge(old, label, now):
+    """
+    (entry to store, status). The same label version only bumps _fetched_at; a
+    new version replaces the entry and the superseded one is noted in _history.
+    """
+    if not isinstance(old, dict) or not old.get("set_id"):
+        return label, "new" if not isinstance(old, dict) else "updated"
+    if (old.get("set_id"), old.get("version")) == (label.get("set_id"), label.get("version")):
+        return {**old, "_fetched_at": label.get("_fetched_at", now)}, "unchanged"
+    replaced = {"set_id": old.get("set_id"), "version": old.get("version"),
+                "effective_time": old.get("effective_time"), "replaced_at": now}
+    return {**label, "_history": old.get("_history", []) + [replaced]}, "updated"
+
+def _save_labels(labels):
+    """
+    Write-through of {drug_name: label} to the on-disk store (merged with its
+    current contents, swapped atomically). Returns {drug_name: status}.
+    """
+    global _store_mtime
+    now = time.time()
+    with _store_lock:
+        try:
+            with open(OUTPUT_FILE) as f: store = json.load(f)
+        except (OSError, ValueError):
+            store = {}
+        statuses = {}
+        for drug_name, label in labels.items():
+            brand = next((b for b in store if _key(b) == _key(drug_name)), drug_name)
+            store[brand], statuses[drug_name] = _merge(store.get(brand), label, now)
+        tmp = f"{OUTPUT_FILE}.{os.getpid()}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(store, f, indent=2)
+        os.replace(tmp, OUTPUT_FILE)
+        _store_mtime = os.path.getmtime(OUTPUT_FILE)
+        _stored.update(_key(brand) for brand, label in store.items() if isinstance(label, dict))
+    return statuses
+
+def _save_label(drug_name, label):
+    return _save_labels({drug_name: label})[drug_name]
+
+def _put(key, label, fetched_at):
+    _cache[key] = {"label": label, "fetched_at": fetched_at}
+    _cache.move_to_end(key)
+    while len(_cache) > CACHE_SIZE:
+        _cache.popitem(last=False)
+
+def _refresh(drug_name):
+    """Fetches a label and updates the cache; a failed fetch keeps the previous label"""
+    key = _key(drug_name)
+    try:
+        label = fetch_drug_label(drug_name)
+        now = time.time()
+        with _cache_lock:
+            if label:
+                label["_fetched_at"] = now
+                _put(key, label, now)
+            elif key not in _cache or _cache[key]["label"] is None:
+                _put(key, None, now) # Negative entry
+        if label:
+            try: _save_label(drug_name, label)
+            except OSError as e: print(f"DEBUG: Could not update {OUTPUT_FILE} - {e}")
+        return label
+    finally:
+        with _cache_lock: done = _inflight.pop(key, None)
+        if done is not None: done.set()
+
+def get_drug_label(drug_name, offline=None):
+    """
+    Cached FDA label lookup. A drug already in the cache or on disk never
+    blocks on the network (stale entries are refreshed in the background).
+    Unknown drugs are fetched once in the background; callers wait up to
+    MISS_WAIT_SECS for it and get None if it is slower (the label is cached
+    when it arrives). Misses are remembered for NEGATIVE_TTL.
+    Offline mode (VIGILANCE_FDA_OFFLINE=1) only ever reads the cache.
+    """
+    offline = OFFLINE if offline is None else offline
+    key = _key(drug_name)
+    with _cache_lock:
+        _load_store()
+        entry = _cache.get(key)
+        if entry is None and key in _stored:
+            entry = _read_stored(key)
+            if entry is not None: _put(key, entry["label"], entry["fetched_at"])
+        if entry is not None:
+            _cache.move_to_end(key)
+            ttl = CACHE_TTL if entry["label"] is not None else NEGATIVE_TTL
+            stale = time.time() - entry["fetched_at"] > ttl
+            if stale and not offline and key not in _inflight:
+                _inflight[key] = threading.Event()
+                threading.Thread(target=_refresh, args=(drug_name,), daemon=True).start()
+            return entry["label"]
+        if offline:
+            return None
+        fetching = _inflight.get(key)
+        started = fetching is None
+        if started: fetching = _inflight[key] = threading.Event()
+    if started: threading.Thread(target=_refresh, args=(drug_name,), daemon=True).start()
+    # Wait briefly for the fetch (ours or another caller's); a slow one finishes in the background
+    fetching.wait(MISS_WAIT_SECS)
+    with _cache_lock:
+        entry = _cache.get(key)
+        return entry["label"] if entry is not None else None
+
+# --- BULK PREFETCH ---
+
+def _stored_at(drug_names):
+    """{drug_name: _fetched_at} of the labels already in the store"""
+    try:
+        mtime = os.path.getmtime(OUTPUT_FILE)
+        with open(OUTPUT_FILE) as f: store = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    fetched = {_key(brand): label.get("_fetched_at", mtime) for brand, label in store.items() if isinstance(label, dict)}
+    return {drug: fetched[_key(drug)] for drug in drug_names if _key(drug) in fetched}
+
+def prefetch(drug_names, workers=PREFETCH_WORKERS, rate=PREFETCH_RATE, force=False, session=None):
+    """
+    Fetches the labels of many drugs concurrently (`workers` threads sharing
+    one pooled session, at most `rate` requests/sec) into the store, which is
+    updated every SAVE_EVERY labels. Labels fetched within CACHE_TTL are
+    skipped unless `force`. Returns {drug_name: new|updated|unchanged|fresh|missing|"error: ..."}.
+    """
+    drug_names = list(dict.fromkeys(drug_names))
+    now = time.time()
+    report = {}
+    if not force:
+        report = {drug: "fresh" for drug, at in _stored_at(drug_names).items() if now - at <= CACHE_TTL}
+    todo = [drug for drug in drug_names if drug not in report]
+    session = session or make_session(workers)
+    limiter = RateLimiter(rate)
+
+    pending = {}
+    def save():
+        if not pending: return
+        statuses = _save_labels(pending)
+        report.update(statuses)
+        with _cache_lock:
+            for drug_name, label in pending.items(): _put(_key(drug_name), label, label["_fetched_at"])
+        pending.clear()
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(fetch_label, drug, session, limiter): drug for drug in todo}
+        for future in as_completed(futures):
+            drug = futures[future]
+            try:
+                label = future.result()
+            except Exception as e:
+                report[drug] = f"error: {e}"
+                continue
+            if label is None:
+                report[drug] = "missing"
+                continue
+            label["_fetched_at"] = time.time()
+            pending[drug] = label
+            if len(pending) >= SAVE_EVERY: save()
+    save()
+    return {drug: report[drug] for drug in drug_names}
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Prefetch OpenFDA labels into " + OUTPUT_FILE)
+    parser.add_argument("drugs", nargs="*", help="Drug names (default: DRUG_MAP)")
+    parser.add_argument("--drugs-file", help="File with one drug name per line")
+    parser.add_argument("--workers", type=int, default=PREFETCH_WORKERS, help="Concurrent requests")
+    parser.add_argument("--rate", type=float, default=PREFETCH_RATE, help="Requests/sec (0 = unlimited)")
+    parser.add_argument("--force", action="store_true", help="Refetch labels that are still fresh")
+    args = parser.parse_args(argv)
+
+    drugs = list(args.drugs)
+    if args.drugs_file:
+        with open(args.drugs_file) as f: drugs += [line.strip() for line in f if line.strip()]
+    drugs = drugs or list(DRUG_MAP)
+
+    print(f"Fetching OpenFDA Data for {len(drugs)} drugs...")
+    start = time.time()
+    report = prefetch(drugs, workers=args.workers, rate=args.rate, force=args.force)
+    for drug, status in report.items():
+        print(f" {'✗' if status == 'missing' or status.startswith('error') else '✓'} {drug}: {status}")
+    print(f"Saved FDA Context to {OUTPUT_FILE} ({time.time() - start:.1f}s)")
+    return 1 if any(status.startswith("error") for status in report.values()) else 0
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
@@ -0,0 +1,375 @@
+import os
+import bisect
+import threading
+from array import array
+from collections import Counter, defaultdict
+import numpy as np
+import pandas as pd
+import dedup
+from symptoms import age_bucket, post_symptoms
+
+# --- INCREMENTAL VIEWS OVER THE SHARED STREAM LOADER ---
+# Each view keeps a cursor into one stream_loader reader and, on sync(),
+# folds in only the rows appended since its last sync. A reader restart
+# (truncation/rotation) rebuilds the view from scratch.
+
+# Feed filters shown on the Interact Feed (None = every source)
+FEED_FILTERS = {
+    "All Sources": None,
+    "Social Media": {"Reddit", "Twitter"},
+    "Clinical Research (PubMed/DoctorForum)": {"PubMed", "DoctorForum"},
+}
+
+
+def _datetimes(timestamps):
+    """Timestamps as datetimes (reader frames arrive parsed; raw ISO strings are parsed here)"""
+    if pd.api.types.is_datetime64_any_dtype(timestamps): return timestamps
+    return pd.to_datetime(timestamps, format='ISO8601')
+
+
+def _epoch_seconds(timestamps):
+    return _datetimes(timestamps).to_numpy(dtype='datetime64[ns]').astype('int64') / 1e9
+
+
+def _summary(reader):
+    """Aggregates of history the reader skipped (segments.py summaries), or None"""
+    summary = getattr(reader, "summary", None)
+    return summary if summary is not None and not summary.empty else None
+
+
+def _extend(arr, values):
+    """Appends a numpy int64 array to an array('q') without a Python-level loop"""
+    arr.frombytes(np.ascontiguousarray(values, dtype='int64').tobytes())
+
+
+class FeedIndex:
+    """
+    Parent -> children index of the social stream.
+    Root posts are kept per feed filter as sorted arrays of row positions
+    (arrival order), so a page of threads is a bisect plus a slice no matter
+    how long the history is.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.cursor = None
+        self._reset()
+
+    def _reset(self):
+        self.parents = {name: array('q') for name in FEED_FILTERS}
+        self.replies = {name: array('q') for name in FEED_FILTERS}
+        self.children = defaultdict(lambda: array('q'))
+
+    def sync(self, reader):
+        with self.lock:
+            rows, self.cursor, reset = reader.since(self.cursor)
+            if reset: self._reset()
+            if rows.empty: return
+
+            # Normalize only the new rows
+            positions = rows.index.to_numpy(dtype='int64')
+            is_launch = rows['is_launch'].astype(str).str.lower().eq('true').to_numpy()
+            parent_ids = rows['parent_id'].fillna("").astype(str).str.strip().replace("nan", "").to_numpy(dtype=object)
+            sources = rows['source'].astype(str)
+
+            for name, allowed in FEED_FILTERS.items():
+                in_filter = np.ones(len(rows), dtype=bool) if allowed is None else sources.isin(allowed).to_numpy()
+                _extend(self.parents[name], positions[in_filter & is_launch])
+                _extend(self.replies[name], positions[in_filter & ~is_launch])
+
+            # Group replies by parent with one factorize + stable sort
+            is_reply = ~is_launch & (parent_ids != "")
+            codes, uniques = pd.factorize(parent_ids[is_reply])
+            if len(codes) == 0: return
+            order = np.argsort(codes, kind='stable')
+            groups = np.split(positions[is_reply][order], np.flatnonzero(np.diff(codes[order])) + 1)
+            for parent_id, group in zip(uniques, groups):
+                _extend(self.children[parent_id], group)
+
+    def total(self, feed_filter):
+        return len(self.parents[feed_filter]) + len(self.replies[feed_filter])
+
+    def page(self, feed_filter, before=None, size=20):
+        """
+        Up to `size` root posts older than the `before` cursor, newest first,
+        plus the cursor for the next page (None when there is nothing older).
+        Cursors are (generation, row position), so new posts arriving never
+        shift a page; a cursor from before a reader restart starts over.
+        Falls back to the latest replies when the filter has no root posts.
+        """
+        with self.lock:
+            generation = self.cursor[0] if self.cursor else None
+            posts = self.parents[feed_filter] or self.replies[feed_filter][-50:]
+            end = len(posts)
+            if before is not None and before[0] == generation:
+                end = bisect.bisect_left(posts, before[1])
+            start = max(0, end - size)
+            page = list(posts[start:end])[::-1]
+            return page, ((generation, posts[start]) if start > 0 else None)
+
+    def children_of(self, post_id):
+        with self.lock:
+            return list(self.children.get(str(post_id).strip(), ()))
+
+
+# "Current" risk forgets events with this half-life (event time, same as backend.py)
+RISK_HALF_LIFE_SECS = float(os.getenv("VIGILANCE_RISK_HALF_LIFE_MIN", "30")) * 60
+
+
+class DecayedCount:
+    """Exponentially time-decayed event count: O(1) state, late events allowed"""
+
+    def __init__(self, half_life=RISK_HALF_LIFE_SECS):
+        self.half_life = half_life
+        self.score = 0.0
+        self.as_of = None
+
+    def add(self, times):
+        """times: event times in epoch seconds (numpy array)"""
+        if len(times) == 0: return
+        newest = float(times.max()) if self.as_of is None else max(self.as_of, float(times.max()))
+        self.score = self.value_at(newest) + float(np.exp2((times - newest) / self.half_life).sum())
+        self.as_of = newest
+
+    def value_at(self, t):
+        if self.as_of is None: return 0.0
+        return self.score * 2 ** ((self.as_of - t) / self.half_life)
+
+
+class DashboardViews:
+    """
+    Materialized aggregates behind the Drug Dashboard, maintained from the
+    social and rx streams. Each sync folds the new rows into small per-key
+    tables, so a dashboard rerun only reads a few hundred cells.
+
+    Views:
+      kpis            posts, patient safety events, rating sum/count (rating > 0), prescriptions,
+                      all-time and current (time-decayed) risk index
+      ae_trend        patient posts per minute
+      symptom_counts  symptom frequencies (extracted from the text, else detected_symptom)
+      sentiment       rating sum/count per (minute, author_role)
+      rx_share        prescriptions per drug
+
+    After a reset the all-time views (KPIs, symptoms, rx share) are seeded
+    from the readers' summarized history; the per-minute charts show the hot
+    window only.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.cursors = {"social": None, "rx": None}
+        self._reset_social()
+        self._reset_rx()
+
+    def _reset_social(self):
+        self.posts = 0
+        self.safety_events = 0
+        self.rating_sum = 0.0
+        self.rating_count = 0
+        self.ae_trend = Counter()
+        self.recent_events = DecayedCount()
+        self.symptom_counts = Counter()
+        self.sentiment = defaultdict(lambda: [0.0, 0])
+
+    def _reset_rx(self):
+        self.prescriptions = 0
+        self.recent_rx = DecayedCount()
+        self.rx_share = Counter()
+
+    def sync(self, social_reader, rx_reader):
+        with self.lock:
+            rows, self.cursors["social"], reset = social_reader.since(self.cursors["social"])
+            if reset:
+                self._reset_social()
+                self._add_social_summary(_summary(social_reader))
+            if not rows.empty: self._add_social(rows)
+
+            rows, self.cursors["rx"], reset = rx_reader.since(self.cursors["rx"])
+            if reset:
+                self._reset_rx()
+                self._add_rx_summary(_summary(rx_reader))
+            if not rows.empty: self._add_rx(rows)
+
+    def _add_social(self, rows):
+        minute = _datetimes(rows['timestamp']).dt.floor('min')
+        rating = pd.to_numeric(rows['rating'], errors='coerce')
+        is_patient = rows['author_role'] == 'Patient'
+
+        self.posts += len(rows)
+        self.safety_events += int(is_patient.sum())
+        rated = rating[rating > 0]
+        self.rating_sum += float(rated.sum())
+        self.rating_count += int(rated.count())
+
+        self.ae_trend.update(minute[is_patient].value_counts().to_dict())
+        self.recent_events.add(_epoch_seconds(rows['timestamp'][is_patient]))
+
+        symptoms = post_symptoms(rows)
+        self.symptom_counts.update(symptoms[symptoms != "None"].value_counts().to_dict())
+
+        grouped = rating.groupby([minute, rows['author_role']]).agg(['sum', 'count'])
+        for key, total, count in zip(grouped.index, grouped['sum'], grouped['count']):
+            cell = self.sentiment[key]
+            cell[0] += float(total)
+            cell[1] += int(count)
+
+    def _add_social_summary(self, summary):
+        if summary is None: return
+        self.posts += int(summary['posts'].sum())
+        self.safety_events += int(summary.loc[summary['author_role'] == 'Patient', 'posts'].sum())
+        self.rating_sum += float(summary['rating_sum'].sum())
+        self.rating_count += int(summary['rated_posts'].sum())
+        counts = summary[summary['symptom'] != "None"].groupby('symptom')['posts'].sum()
+        self.symptom_counts.update({symptom: int(n) for symptom, n in counts.items()})
+
+    def _add_rx_summary(self, summary):
+        if summary is None: return
+        self.prescriptions += int(summary['prescriptions'].sum())
+        counts = summary.groupby('drug_name')['prescriptions'].sum()
+        self.rx_share.update({drug: int(n) for drug, n in counts.items()})
+
+    def _add_rx(self, rows):
+        self.prescriptions += len(rows)
+        self.recent_rx.add(_epoch_seconds(rows['timestamp']))
+        self.rx_share.update(rows['drug_name'].value_counts().to_dict())
+
+    def snapshot(self):
+        """Small DataFrames shaped like the charts expect"""
+        with self.lock:
+            kpis = {
+                "posts": self.posts,
+                "safety_events": self.safety_events,
+                "avg_rating": self.rating_sum / self.rating_count if self.rating_count else float('nan'),
+                "prescriptions": self.prescriptions,
+                "risk_index": self.safety_events * 1.5 / (self.prescriptions + 1) * 100,
+            }
+            # Both decayed to the newest event of either stream
+            watermark = max((c.as_of for c in (self.recent_events, self.recent_rx) if c.as_of is not None), default=0.0)
+            kpis["risk_index_now"] = (self.recent_events.value_at(watermark) * 1.5
+                                      / (self.recent_rx.value_at(watermark) + 1) * 100)
+            ae_trend = pd.DataFrame(sorted(self.ae_trend.items()), columns=['ts', 'post_id'])
+            symptom_counts = pd.DataFrame(self.symptom_counts.most_common(), columns=['Symptom', 'Count'])
+            sentiment = pd.DataFrame(
+                [(ts, role, total / count) for (ts, role), (total, count) in sorted(self.sentiment.items()) if count],
+                columns=['ts', 'author_role', 'rating'],
+            )
+            rx_share = pd.DataFrame(self.rx_share.most_common(), columns=['Drug', 'Count'])
+
+        # Resample semantics: minutes without patient posts show as zero
+        if not ae_trend.empty:
+            ae_trend = ae_trend.set_index('ts').resample('1min')['post_id'].sum().reset_index()
+        sentiment['ts'] = pd.to_datetime(sentiment['ts'])  # datetime64 even with no rated rows
+        sentiment['time_short'] = sentiment['ts'].dt.strftime('%H:%M')
+        return {"kpis": kpis, "ae_trend": ae_trend, "symptom_counts": symptom_counts,
+                "sentiment": sentiment, "rx_share": rx_share}
+
+
+ALL = "*"  # wildcard value of a DemographicCube dimension
+
+
+class DemographicCube:
+    """
+    Counts and rating sums of social posts over
+    drug x gender x age bucket x source x symptom.
+
+    Every combination of the first four dimensions is also kept with ALL
+    ("*") wildcards, so any slice the copilot can ask for is one dict lookup.
+    Each cell holds [posts, rating_sum, {symptom: [posts, rating_sum]}].
+    """
+
+    DIMENSIONS = ['drug_name', 'patient_gender', 'age_bucket', 'source']
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.cursor = None
+        self.cells = {}
+
+    def sync(self, reader):
+        with self.lock:
+            rows, self.cursor, reset = reader.since(self.cursor)
+            if reset:
+                self.cells = {}
+                summary = _summary(reader)
+                if summary is not None:
+                    grouped = summary.groupby(self.DIMENSIONS + ['symptom']).agg(
+                        count=('posts', 'sum'), sum=('rating_sum', 'sum'))
+                    self._add_grouped(grouped)
+            if rows.empty: return
+
+            frame = pd.DataFrame({
+                'drug_name': rows['drug_name'].astype(str),
+                'patient_gender': rows['patient_gender'].astype(object).fillna("Unknown").astype(str),
+                'age_bucket': age_bucket(rows['patient_age']),
+                'source': rows['source'].astype(str),
+                'symptom': post_symptoms(rows),
+                'rating': pd.to_numeric(rows['rating'], errors='coerce').fillna(0.0),
+            })
+            self._add_grouped(frame.groupby(self.DIMENSIONS + ['symptom'])['rating'].agg(['count', 'sum']))
+
+    def _add_grouped(self, grouped):
+        for key, count, total in zip(grouped.index, grouped['count'], grouped['sum']):
+            self._add(key[:-1], key[-1], int(count), float(total))
+
+    def _add(self, dims, symptom, count, total):
+        # 2^4 rollups: each dimension either kept or replaced by ALL
+        for mask in range(16):
+            rollup = tuple(ALL if mask >> i & 1 else value for i, value in enumerate(dims))
+            cell = self.cells.get(rollup)
+            if cell is None:
+                cell = self.cells[rollup] = [0, 0.0, {}]
+            cell[0] += count
+            cell[1] += total
+            per_symptom = cell[2].setdefault(symptom, [0, 0.0])
+            per_symptom[0] += count
+            per_symptom[1] += total
+
+    def query(self, drug=None, gender=None, age=None, source=None):
+        """(posts, avg rating, {symptom: posts}) for one slice (None = any value)"""
+        key = tuple(ALL if value is None else value for value in (drug, gender, age, source))
+        with self.lock:
+            cell = self.cells.get(key)
+            if cell is None or cell[0] == 0:
+                return 0, float('nan'), {}
+            return cell[0], cell[1] / cell[0], {symptom: c[0] for symptom, c in cell[2].items()}
+
+
+class CanonicalPosts:
+    """
+    Social posts with near-duplicates collapsed (see dedup.py): one canonical
+    post per group with its multiplicity, so copilot context and listings
+    show each distinct report once.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.cursor = None
+        self._reset()
+
+    def _reset(self):
+        self.index = dedup.NearDupIndex()
+        self.posts = {}  # canonical post_id -> (drug_name, source, text, is_root)
+
+    def sync(self, reader):
+        with self.lock:
+            rows, self.cursor, reset = reader.since(self.cursor)
+            if reset: self._reset()
+            if rows.empty: return
+
+            post_ids = rows['post_id'].astype(str).tolist()
+            drugs = rows['drug_name'].astype(str).tolist()
+            canonical = self.index.add_many(post_ids, rows['text'].fillna("").astype(str).tolist(), drugs)
+            is_new = [c == p and c not in self.posts for c, p in zip(canonical, post_ids)]
+            is_root = rows['is_launch'].astype(str).str.lower().eq('true').to_numpy()
+            for i in np.flatnonzero(is_new):
+                self.posts[post_ids[i]] = (drugs[i], str(rows['source'].iat[i]), str(rows['text'].iat[i]), bool(is_root[i]))
+
+    def top(self, drug=None, n=5, roots_only=True):
+        """Most repeated canonical posts (of one drug), as a DataFrame"""
+        with self.lock:
+            items = [(pid, d, src, text, self.index.counts[pid]) for pid, (d, src, text, root) in self.posts.items()
+                     if (drug is None or d == drug) and (root or not roots_only)]
+        items.sort(key=lambda item: -item[4])
+        return pd.DataFrame(items[:n], columns=['post_id', 'drug_name', 'source', 'text', 'multiplicity'])
+
+    def stats(self):
+        return self.index.stats()
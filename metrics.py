@@ -0,0 +1,296 @@
+import os
+import json
+import time
+import atexit
+import bisect
+import threading
+import contextlib
+from datetime import datetime
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+# --- STAGE TIMINGS AND THROUGHPUT COUNTERS ---
+# span("stage") records how long a block took into a fixed-bucket histogram;
+# count("name", n) adds to a counter. Each process exports what it recorded
+# in Prometheus text format on a local port (/metrics, JSON at /metrics.json)
+# and appends a snapshot with per-interval p50/p90/p99 to a rolling JSON-lines
+# file under results/metrics/.
+
+METRICS_PORT = int(os.getenv("VIGILANCE_METRICS_PORT", "9464"))  # 0 = no HTTP endpoint
+METRICS_INTERVAL = float(os.getenv("VIGILANCE_METRICS_INTERVAL", "15"))
+METRICS_DIR = os.path.join("./results", "metrics")
+METRICS_MAX_BYTES = int(os.getenv("VIGILANCE_METRICS_MAX_BYTES", str(5 * 1024 * 1024)))
+
+# Port offsets from METRICS_PORT, one per long-running process
+PORTS = {"app": 0, "mock_stream": 1, "backend": 2, "data_service": 3}
+
+# Latency buckets (seconds): 0.25ms doubling up to ~65s
+BUCKETS = [0.00025 * 2 ** k for k in range(19)]
+QUANTILES = (0.5, 0.9, 0.99)
+
+# "# HELP" text of the counter families (others are exported as "<name> count")
+COUNTER_HELP = {
+    "ingested_rows": "Rows written to the event streams by mock_stream",
+    "backend_source_rows": "Rows the backend read from the stream files",
+    "backend_rows": "Rows that reached the backend pipeline, persisted replay included",
+    "backend_upserts": "Dashboard stat rows upserted into SQLite",
+    "embedded_texts": "Texts encoded by the local embedding model (cache misses)",
+    "copilot_cache_hits": "Copilot answers served from the response cache",
+    "copilot_llm_errors": "Copilot LLM calls that failed",
+}
+
+
+class Histogram:
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)  # last = +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(BUCKETS, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def copy(self):
+        other = Histogram()
+        other.counts, other.sum, other.count = list(self.counts), self.sum, self.count
+        return other
+
+
+def quantile(counts, q):
+    """Quantile from bucket counts, interpolated inside the bucket (like histogram_quantile)"""
+    total = sum(counts)
+    if not total: return None
+    rank = q * total
+    seen = 0
+    for i, count in enumerate(counts):
+        if seen + count >= rank and count:
+            if i == len(BUCKETS): return BUCKETS[-1]
+            lower = BUCKETS[i - 1] if i else 0.0
+            return lower + (BUCKETS[i] - lower) * (rank - seen) / count
+        seen += count
+    return BUCKETS[-1]
+
+
+_lock = threading.Lock()
+_histograms = {}  # (name, labels) -> Histogram
+_counters = {}    # (name, labels) -> float
+_process = None
+_snapshotter = None
+_flush_lock = threading.Lock()
+_started = time.time()
+
+
+def _key(name, labels):
+    return name, tuple(sorted(labels.items()))
+
+
+def observe(stage, seconds, **labels):
+    """Records one duration of `stage` (extra labels, e.g. page=..., split the series)"""
+    key = _key("stage_seconds", {"stage": stage, **labels})
+    with _lock:
+        hist = _histograms.get(key)
+        if hist is None: hist = _histograms[key] = Histogram()
+        hist.observe(seconds)
+
+
+@contextlib.contextmanager
+def span(stage, **labels):
+    """Times the enclosed block as `stage`"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(stage, time.perf_counter() - start, **labels)
+
+
+def timed(stage):
+    """Decorator form of span()"""
+    def wrap(fn):
+        def inner(*args, **kwargs):
+            with span(stage): return fn(*args, **kwargs)
+        inner.__name__, inner.__doc__, inner.__wrapped__ = fn.__name__, fn.__doc__, fn
+        return inner
+    return wrap
+
+
+def count(name, n=1, **labels):
+    key = _key(name, labels)
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + n
+
+
+class PageTimer:
+    """
+    Phases of one Streamlit page run: phase("render") closes the current phase
+    ("transform" at the start) and opens the next; done() closes the last one.
+    A page that stops early (st.stop) simply does not record its open phase.
+    """
+
+    def __init__(self, page, first="transform"):
+        self.page = page
+        self.current = first
+        self.start = time.perf_counter()
+
+    def phase(self, name):
+        now = time.perf_counter()
+        observe(f"page.{self.current}", now - self.start, page=self.page)
+        self.current, self.start = name, now
+
+    def done(self):
+        if self.current is not None:
+            observe(f"page.{self.current}", time.perf_counter() - self.start, page=self.page)
+            self.current = None
+
+
+# --- EXPORT ---
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs: return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+def prometheus_text():
+    with _lock:
+        histograms = {k: h.copy() for k, h in _histograms.items()}
+        counters = dict(_counters)
+    lines = []
+    for family in sorted({name for name, _ in histograms}):
+        lines += [f"# HELP vigilance_{family} Time spent per stage", f"# TYPE vigilance_{family} histogram"]
+        for (name, labels), hist in sorted(histograms.items()):
+            if name != family: continue
+            cumulative = 0
+            for bound, n in zip(BUCKETS + ["+Inf"], hist.counts):
+                cumulative += n
+                le = bound if bound == "+Inf" else f"{bound:g}"
+                lines.append(f"vigilance_{name}_bucket{_labels(labels, [('le', le)])} {cumulative}")
+            lines.append(f"vigilance_{name}_sum{_labels(labels)} {hist.sum}")
+            lines.append(f"vigilance_{name}_count{_labels(labels)} {hist.count}")
+    for family in sorted({name for name, _ in counters}):
+        lines += [f"# HELP vigilance_{family}_total {COUNTER_HELP.get(family, family.replace('_', ' ') + ' count')}",
+                  f"# TYPE vigilance_{family}_total counter"]
+        for (name, labels), value in sorted(counters.items()):
+            if name == family: lines.append(f"vigilance_{name}_total{_labels(labels)} {value}")
+    return "\n".join(lines) + "\n"
+
+
+def _series_name(name, labels):
+    return name if not labels else name + "{" + ",".join(f"{k}={v}" for k, v in labels) + "}"
+
+
+class Snapshotter:
+    """Builds snapshots with totals plus quantiles/rates over the interval since the previous one"""
+
+    def __init__(self):
+        self.last_time = _started
+        self.last_histograms = {}
+        self.last_counters = {}
+
+    def snapshot(self):
+        now = time.time()
+        with _lock:
+            histograms = {k: h.copy() for k, h in _histograms.items()}
+            counters = dict(_counters)
+        elapsed = max(now - self.last_time, 1e-9)
+
+        stages = {}
+        for key, hist in sorted(histograms.items()):
+            prev = self.last_histograms.get(key)
+            window = [a - b for a, b in zip(hist.counts, prev.counts)] if prev else hist.counts
+            stages[_series_name(*key)] = {
+                "count": hist.count, "sum": round(hist.sum, 6),
+                "interval_count": sum(window),
+                **{f"p{int(q * 100)}": quantile(window, q) for q in QUANTILES},
+                **{f"all_p{int(q * 100)}": quantile(hist.counts, q) for q in QUANTILES},
+            }
+        totals = {}
+        for key, value in sorted(counters.items()):
+            totals[_series_name(*key)] = {"total": value,
+                                          "per_sec": (value - self.last_counters.get(key, 0)) / elapsed}
+
+        self.last_time, self.last_histograms, self.last_counters = now, histograms, counters
+        return {"ts": datetime.now().isoformat(), "process": _process, "pid": os.getpid(),
+                "interval_secs": round(elapsed, 3), "stages": stages, "counters": totals}
+
+
+def _json_path(process):
+    return os.path.join(METRICS_DIR, f"{process}.jsonl")
+
+
+def write_snapshot(snapshotter, process):
+    """Appends one snapshot line; the file rolls over to .1 past METRICS_MAX_BYTES"""
+    path = _json_path(process)
+    try:
+        os.makedirs(METRICS_DIR, exist_ok=True)
+        if os.path.exists(path) and os.path.getsize(path) > METRICS_MAX_BYTES:
+            os.replace(path, path + ".1")
+        with open(path, "a") as f:
+            f.write(json.dumps(snapshotter.snapshot()) + "\n")
+    except Exception as e:
+        print(f"DEBUG: Error writing {path} - {e}")
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.startswith("/metrics.json"):
+            body, kind = json.dumps(Snapshotter().snapshot()).encode(), "application/json"
+        elif self.path.startswith("/metrics"):
+            body, kind = prometheus_text().encode(), "text/plain; version=0.0.4"
+        else:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", kind)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def serve(port):
+    """HTTP endpoint on 127.0.0.1:port in a daemon thread (None when the port is taken)"""
+    try:
+        server = ThreadingHTTPServer(("127.0.0.1", port), _Handler)
+    except OSError as e:
+        print(f"DEBUG: Metrics endpoint disabled (port {port}) - {e}")
+        return None
+    threading.Thread(target=server.serve_forever, daemon=True, name="metrics-http").start()
+    print(f"DEBUG: Metrics at http://127.0.0.1:{server.server_address[1]}/metrics")
+    return server
+
+
+def start(process, port=None):
+    """
+    Starts exporting this process' metrics (once per process): the HTTP
+    endpoint on METRICS_PORT + PORTS[process] and the rolling JSON file.
+    A port already in use only disables the endpoint.
+    """
+    global _process, _snapshotter
+    with _lock:
+        if _process is not None: return
+        _process = process
+
+    port = (METRICS_PORT + PORTS.get(process.split("-")[0], 0)) if port is None and METRICS_PORT else port
+    if port: serve(port)
+
+    _snapshotter = Snapshotter()
+
+    def loop():
+        while True:
+            time.sleep(METRICS_INTERVAL)
+            flush()
+
+    threading.Thread(target=loop, daemon=True, name="metrics-json").start()
+    atexit.register(flush)
+
+
+def flush():
+    """Writes a snapshot now (processes that exit without atexit, e.g. pool workers, call this last)"""
+    with _flush_lock:
+        if _snapshotter is not None: write_snapshot(_snapshotter, _process)
@@ -1,60 +1,81 @@
-import csv
 import time
 import random
 import os
 import uuid
+import argparse
+import itertools
+import multiprocessing
 from datetime import datetime
+from collections import Counter
 from faker import Faker
+import stream_store
+import segments
+import symptoms
+import metrics
 
 fake = Faker()
 
+# Pre-generated Faker values (Faker is far too slow to call per row at high rates)
+POOL_SIZE = 2000
+POOLS = {}
+
+# Throughput mode: quiet output and deterministic, collision-free post ids
+VERBOSE = True
+ID_PREFIX = None
+ID_COUNTER = itertools.count()
+
+# Rows written per stream since the last report_ingest()
+WRITTEN = Counter()
+
 DATA_DIR = "./data"
 os.makedirs(DATA_DIR, exist_ok=True)
 
-# Files
-SALES_FILE = os.path.join(DATA_DIR, "sales_stream.csv")
-RX_FILE = os.path.join(DATA_DIR, "prescriptions_stream.csv")
-SOCIAL_FILE = os.path.join(DATA_DIR, "social_stream.csv")
+# Files (CSV compatibility mode)
+SALES_FILE = stream_store.CSV_FILES["sales"]
+RX_FILE = stream_store.CSV_FILES["rx"]
+SOCIAL_FILE = stream_store.CSV_FILES["social"]
+
+# One sink per stream: flat CSVs or hourly Parquet partitions (VIGILANCE_STORAGE);
+# rolled-over CSV segments are summarized/retired by segments.compact
+SINKS = stream_store.open_sinks(on_roll=segments.compact)
 
 # Real Drugs (Modern Blockbusters)
 DRUGS = ["Wegovy", "Leqembi", "Mounjaro", "Skyrizi", "Paxlovid", "Rinvoq"]
 SOURCES = ["Reddit", "Twitter", "PubMed", "DoctorForum"]
 ROLES = ["Patient", "Doctor", "Pharma Rep", "Pharmacist"]
 
-# "Emerging Signals" - Risks NOT yet on the FDA Label (AI Discovery)
-EMERGING_SIGNALS = {
-    "Wegovy": ["Ozempic Face", "Hair Shedding", "Muscle Loss"],
-    "Mounjaro": ["Thyroid Tenderness", "Severe Nausea"],
-    "Leqembi": ["Micro-Hemorrhage", "Brain Swelling"],
-    "Skyrizi": ["Liver enzyme spike", "Fatigue"],
-    "Paxlovid": ["Rebound COVID", "Taste loss"],
-    "Rinvoq": ["Acne", "Blood Clots"]
-}
+# "Emerging Signals" - Risks NOT yet on the FDA Label (AI Discovery), shared with the symptom lexicon
+EMERGING_SIGNALS = symptoms.EMERGING_SIGNALS
 
 # In-memory State for Threads
 ACTIVE_THREADS = [] # List of {post_id, drug}
 
+def init_pools(seed=None, size=POOL_SIZE):
+    if seed is not None: fake.seed_instance(seed)
+    POOLS["user_name"] = [fake.user_name() for _ in range(size)]
+    POOLS["last_name"] = [fake.last_name() for _ in range(size)]
+    POOLS["city"] = [fake.city() for _ in range(size)]
+
+def pick(kind):
+    if not POOLS: init_pools()
+    return random.choice(POOLS[kind])
+
+def new_post_id():
+    if ID_PREFIX is None: return str(uuid.uuid4())[:8]
+    return f"{ID_PREFIX}{next(ID_COUNTER):06x}"
+
+def log(msg):
+    if VERBOSE: print(msg)
+
+def report_ingest():
+    """Publishes the rows written since the last call as ingestion counters"""
+    for stream, n in WRITTEN.items(): metrics.count("ingested_rows", n, stream=stream)
+    WRITTEN.clear()
+
 def init_files():
-    if not os.path.exists(SALES_FILE):
-        with open(SALES_FILE, 'w', newline='', encoding='utf-8') as f:
-            writer = csv.writer(f)
-            writer.writerow(["timestamp", "drug_name", "pharmacy_id", "quantity_sold", "location"])
-
-    if not os.path.exists(RX_FILE):
-        with open(RX_FILE, 'w', newline='', encoding='utf-8') as f:
-            writer = csv.writer(f)
-            writer.writerow(["timestamp", "drug_name", "doctor_id", "dosage_mg", "patient_age_group"])
-
-    # New Social Schema for Reddit-style feed
-    if not os.path.exists(SOCIAL_FILE):
-        with open(SOCIAL_FILE, 'w', newline='', encoding='utf-8') as f:
-            writer = csv.writer(f)
-            writer.writerow([
-                "post_id", "parent_id", "timestamp", "drug_name", "source",
-                "author_name", "author_role", "text", 
-                "rating", "likes", "shares", "is_launch", "detected_symptom", "location",
-                "patient_age", "patient_gender"
-            ])
+    # Headers come from stream_store.SCHEMAS (the Reddit-style social schema included)
+    for sink in SINKS.values():
+        sink.init()
 
 def generate_sales():
     drug = random.choice(DRUGS)
@@ -63,12 +84,11 @@ def generate_sales():
         drug,
         f"PH-{random.randint(100, 999)}",
         random.randint(1, 50),
-        fake.city()
+        pick("city")
     ]
-    with open(SALES_FILE, 'a', newline='', encoding='utf-8') as f:
-        writer = csv.writer(f)
-        writer.writerow(row)
-    print(f"[SALES] {drug} sold.")
+    SINKS["sales"].write(row)
+    WRITTEN["sales"] += 1
+    log(f"[SALES] {drug} sold.")
 
 def generate_rx():
     drug = random.choice(DRUGS)
@@ -79,16 +99,14 @@ def generate_rx():
         random.choice([2, 5, 10, 15]), # Dosage often varied
         random.choice(["18-30", "31-50", "51-70", "71+"])
     ]
-    with open(RX_FILE, 'a', newline='', encoding='utf-8') as f:
-        writer = csv.writer(f)
-        writer.writerow(row)
-    print(f"[RX] {drug} prescribed.")
+    SINKS["rx"].write(row)
+    WRITTEN["rx"] += 1
+    log(f"[RX] {drug} prescribed.")
 
 def write_to_csv(row):
     try:
-        with open(SOCIAL_FILE, 'a', newline='', encoding='utf-8') as f:
-            writer = csv.writer(f)
-            writer.writerow(row)
+        SINKS["social"].write(row)
+        WRITTEN["social"] += 1
     except Exception as e:
         print(f"Error writing row: {e}")
 
@@ -113,13 +131,13 @@ def create_post(parent_id="", root_drug=None, root_source=None):
         detected_symptom = random.choice(EMERGING_SIGNALS.get(drug_name, ["None"]))
 
     # 3. CONTENT & AUTHOR
-    post_id = str(uuid.uuid4())[:8]
+    post_id = new_post_id()
     timestamp = datetime.now().isoformat()
     
     role = random.choice(ROLES)
-    author_name = fake.user_name()
-    if role == "Doctor": author_name = f"Dr_{fake.last_name()}"
-    elif source == "PubMed": author_name = f"{fake.last_name()}, MD/PhD"; role = "Researcher"
+    author_name = pick("user_name")
+    if role == "Doctor": author_name = f"Dr_{pick('last_name')}"
+    elif source == "PubMed": author_name = f"{pick('last_name')}, MD/PhD"; role = "Researcher"
 
     # Rating Logic: User requested 6,7,8. Avoiding 0s.
     # Emerging signals might still be low rated (safety warning), but we'll keep them > 1
@@ -135,7 +153,7 @@ def create_post(parent_id="", root_drug=None, root_source=None):
     if is_reply:
         # REPLY TEXT
         if source == "Twitter":
-            text = f"@{fake.user_name()} {random.choice(['True!', 'Same here.', 'Fake news.', 'Check DM.', 'OMG yes!', '100% agree'])}"
+            text = f"@{pick('user_name')} {random.choice(['True!', 'Same here.', 'Fake news.', 'Check DM.', 'OMG yes!', '100% agree'])}"
         elif source == "PubMed":
             text = f"Comment: Methodology seems sound but sample size is small."
             role = "Reviewer"
@@ -159,7 +177,7 @@ def create_post(parent_id="", root_drug=None, root_source=None):
                 text = f"Is {detected_symptom} normal? on {drug_name}." if is_emerging else f"{drug_name} log. Day 1: Feeling okay."
 
     # LOCATION (For Badge Batch Analysis)
-    location = fake.city()
+    location = pick("city")
 
     # DEMOGRAPHICS (For Advanced RAG)
     patient_age = random.randint(18, 75)
@@ -181,29 +199,124 @@ def create_post(parent_id="", root_drug=None, root_source=None):
     return post_id, drug_name, source
 
 def generate_social_burst():
-    # 1. Generate ROOT Post
-    root_id, root_drug, root_source = create_post(parent_id="")
-    print(f"[SOCIAL] NEW THREAD: {root_drug} ({root_source})")
-    
-    # 2. Generate 2-4 Replies IMMEDIATELY
-    num_replies = random.randint(2, 4)
-    for _ in range(num_replies):
-        create_post(parent_id=root_id, root_drug=root_drug, root_source=root_source)
+    # One commit per thread: readers never see a reply before (or without) its root
+    with SINKS["social"].batch():
+        # 1. Generate ROOT Post
+        root_id, root_drug, root_source = create_post(parent_id="")
+        log(f"[SOCIAL] NEW THREAD: {root_drug} ({root_source})")
+
+        # 2. Generate 2-4 Replies IMMEDIATELY
+        num_replies = random.randint(2, 4)
+        for _ in range(num_replies):
+            create_post(parent_id=root_id, root_drug=root_drug, root_source=root_source)
         
-    print(f"      + {num_replies} replies generated.")
+    log(f"      + {num_replies} replies generated.")
+    return 1 + num_replies
+
+def generate_tick():
+    """One tick of the live feed. Returns the number of rows written."""
+    rows = 0
+    if random.random() < 0.5: generate_sales(); rows += 1
+    if random.random() < 0.4: generate_rx(); rows += 1
+    rows += generate_social_burst() # Always generate full threads now
+    return rows
+
+# --- THROUGHPUT MODE (load testing) ---
+TICK_SECS = 0.05
+
+def run_worker(worker_id, rate, seed=None, duration=None, max_events=None, batch_rows=5000):
+    """
+    Writes rows at `rate` rows/sec (0 = as fast as possible) until `duration`
+    seconds or `max_events` rows. Sinks stay open and are flushed once per tick.
+    """
+    global SINKS, VERBOSE, ID_PREFIX
+    VERBOSE = False
+    worker_seed = None if seed is None else seed + worker_id
+    random.seed(worker_seed)
+    init_pools(worker_seed)
+    ID_PREFIX = f"{worker_id:02x}"
+    SINKS = stream_store.open_sinks(batch_rows=batch_rows, compact=(worker_id == 0), on_roll=segments.compact)
+    # Worker 0 serves the metrics endpoint, every worker writes its own JSON file
+    metrics.start(f"mock_stream-w{worker_id}", port=None if worker_id == 0 else 0)
+
+    produced = 0
+    start = last_report = time.time()
+    try:
+        while True:
+            now = time.time()
+            if duration and now - start >= duration: break
+            target = rate * (now - start + TICK_SECS) if rate else produced + batch_rows
+            if max_events: target = min(target, max_events)
+            while produced < target:
+                produced += generate_tick()
+            with metrics.span("ingest.flush"):
+                for sink in SINKS.values(): sink.flush()
+            report_ingest()
+
+            if max_events and produced >= max_events: break
+            if now - last_report >= 5:
+                print(f"[W{worker_id}] {produced:,} rows ({produced / (now - start):,.0f} rows/s)")
+                last_report = now
+            if rate: time.sleep(max(0.0, start + produced / rate - time.time()))
+    finally:
+        for sink in SINKS.values(): sink.close()
+        report_ingest()
+        metrics.flush()
+    return produced
+
+def run_throughput(rate, workers=1, seed=None, duration=None, max_events=None, batch_rows=5000):
+    """Splits the target rate (and event budget) across `workers` processes"""
+    init_files()
+    per_rate = rate / workers
+    per_events = -(-max_events // workers) if max_events else None
+    args = [(w, per_rate, seed, duration, per_events, batch_rows) for w in range(workers)]
+
+    start = time.time()
+    if workers == 1:
+        counts = [run_worker(*args[0])]
+    else:
+        with multiprocessing.Pool(workers) as pool:
+            counts = pool.starmap(run_worker, args)
+    elapsed = time.time() - start
+    total = sum(counts)
+    print(f">>> {total:,} rows in {elapsed:.1f}s ({total / elapsed:,.0f} rows/s, {workers} workers)")
+    return total
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Vigilance.AI mock event streams")
+    parser.add_argument("--rate", type=float, help="Throughput mode: target rows/sec across all workers (0 = unthrottled)")
+    parser.add_argument("--workers", type=int, default=1, help="Writer processes in throughput mode")
+    parser.add_argument("--seed", type=int, help="Deterministic seed (worker i uses seed + i)")
+    parser.add_argument("--duration", type=float, help="Stop after this many seconds")
+    parser.add_argument("--events", type=int, help="Stop after this many rows")
+    parser.add_argument("--batch", type=int, default=5000, help="Rows buffered per file before a write")
+    args = parser.parse_args()
+
+    if args.rate is not None:
+        run_throughput(args.rate, args.workers, args.seed, args.duration, args.events, args.batch)
+        raise SystemExit
+
+    if args.seed is not None:
+        random.seed(args.seed)
+        init_pools(args.seed)
+
     init_files()
+    metrics.start("mock_stream")
     print("Simulating Reddit-style Pharma Feed... Press Ctrl+C to stop.")
     
     # BURST: Generate 20 initial threads (approx 80 posts total)
     print(">>> Generating initial history...")
     for _ in range(20):
         generate_social_burst()
+    for sink in SINKS.values(): sink.flush()
         
     # STREAM: Fast loop
-    while True:
-        if random.random() < 0.5: generate_sales()
-        if random.random() < 0.4: generate_rx()
-        generate_social_burst() # Always generate full threads now
-        time.sleep(2) # Slower loop because we generate ~4 posts per tick
+    try:
+        while True:
+            with metrics.span("ingest.tick"):
+                generate_tick()
+                for sink in SINKS.values(): sink.flush() # One commit per stream per tick
+            report_ingest()
+            time.sleep(2) # Slower loop because we generate ~4 posts per tick
+    finally:
+        for sink in SINKS.values(): sink.close() # Flush buffered Parquet rows
@@ -2,44 +2,36 @@ import streamlit as st
 import pandas as pd
 import sys
 sys.path.append('.')
-from utils import load_data
+import metrics
+from utils import load_feed_page
+from live_views import FEED_FILTERS
+
+PAGE_SIZE = 20
 
 st.set_page_config(page_title="Interact (Feed)", page_icon="📱", layout="wide")
 
 st.title("📱 Live Social Stream")
-
-data = load_data()
-sdf = data['social']
-
-if sdf.empty:
-    st.info("No Data Stream. Run `mock_stream.py`.")
-    st.stop()
+timer = metrics.PageTimer("feed")
 
 # --- FILTER ---
-filter_option = st.radio("Dataset:", ["All Sources", "Social Media", "Clinical Research (PubMed/DoctorForum)"], horizontal=True)
+filter_option = st.radio("Dataset:", list(FEED_FILTERS), horizontal=True)
+
+# --- PAGINATION (cursor = oldest thread shown, stable while new posts stream in) ---
+if st.session_state.get("feed_filter") != filter_option:
+    st.session_state.feed_filter = filter_option
+    st.session_state.feed_cursors = [None]
 
-if filter_option == "Social Media":
-    sdf = sdf[sdf['source'].isin(['Reddit', 'Twitter'])]
-elif filter_option == "Clinical Research (PubMed/DoctorForum)":
-    sdf = sdf[sdf['source'].isin(['PubMed', 'DoctorForum'])]
+parents, threads, next_cursor, total = load_feed_page(filter_option, before=st.session_state.feed_cursors[-1], page_size=PAGE_SIZE)
+timer.phase("render")
 
-if sdf.empty:
-    st.info("No data for this filter.")
+if total == 0:
+    st.info("No Data Stream. Run `mock_stream.py`." if filter_option == "All Sources" else "No data for this filter.")
+    timer.done()
     st.stop()
 
 # --- FEED LOGIC ---
-sdf['is_launch'] = sdf['is_launch'].astype(str).replace({'True': True, 'False': False, 'true': True, 'false': False})
-sdf['post_id'] = sdf['post_id'].astype(str).str.strip()
-sdf['parent_id'] = sdf['parent_id'].fillna("").astype(str).str.strip().replace("nan", "")
-
-parents = sdf[sdf['is_launch'] == True].sort_values('timestamp', ascending=False)
-children = sdf[sdf['is_launch'] == False]
-
-if parents.empty and not children.empty:
-    parents = children.sort_values('timestamp', ascending=False).head(50)
-
 for _, parent in parents.iterrows():
-    thread_comments = children[children['parent_id'] == parent['post_id']]
+    thread_comments = threads.get(parent['post_id'], pd.DataFrame())
     score = float(parent['rating']) if not pd.isna(parent['rating']) else 0
     
     border_color = "#2F3336"
@@ -61,7 +53,7 @@ for _, parent in parents.iterrows():
 <span style="color: #71767B; font-size: 0.9em; margin-left: 5px;">{icon} {parent["source"]} • {parent["author_role"]}</span>
 {signal_badge}
 </div>
-<span style="color: #71767B; font-size: 0.8em;">{parent["timestamp"]}</span>
+<span style="color: #71767B; font-size: 0.8em;">{pd.Timestamp(parent["timestamp"]):%Y-%m-%d %H:%M:%S}</span>
 </div>
 <div style="margin-top: 8px; font-size: 1.05em; color: #E7E9EA; line-height: 1.4;">
 {parent["text"]}
@@ -84,3 +76,18 @@ for _, parent in parents.iterrows():
 {child["text"]}
 </div>
 """, unsafe_allow_html=True)
+
+# --- PAGE NAVIGATION ---
+nav_newer, nav_info, nav_older = st.columns([1, 2, 1])
+with nav_newer:
+    if len(st.session_state.feed_cursors) > 1 and st.button("⬅️ Newer"):
+        st.session_state.feed_cursors.pop()
+        st.rerun()
+with nav_info:
+    st.caption(f"Page {len(st.session_state.feed_cursors)} • {total} posts in stream")
+with nav_older:
+    if next_cursor is not None and st.button("Older ➡️"):
+        st.session_state.feed_cursors.append(next_cursor)
+        st.rerun()
+
+timer.done()
@@ -3,30 +3,36 @@ import pandas as pd
 import plotly.express as px
 import sys
 sys.path.append('.')
-from utils import load_data
+import metrics
+from utils import load_dashboard_views, load_live_stats, load_signals
 
 st.set_page_config(page_title="Dashboard", page_icon="📊", layout="wide")
 
 st.title("📊 Pharmacovigilance Command Center")
+timer = metrics.PageTimer("dashboard")
 
-data = load_data()
-social = data['social']
-rx = data['rx']
+# Pre-aggregated views, updated incrementally from the streams (see live_views.DashboardViews)
+views = load_dashboard_views()
+kpis = views['kpis']
+timer.phase("render")
 
-if social.empty:
+if kpis['posts'] == 0:
     st.error("Waiting for data pipelines...")
+    timer.done()
     st.stop()
 
 # --- KPIS ---
 col1, col2, col3, col4 = st.columns(4)
-total_ae = len(social[social['author_role'] == 'Patient'])
-avg_rating = social[social['rating'] > 0]['rating'].mean()
-risk_score = (total_ae * 1.5) / (len(rx) + 1) * 100 
+total_ae = kpis['safety_events']
+avg_rating = kpis['avg_rating']
+# Current risk: safety events vs prescriptions, time-decayed (see live_views.RISK_HALF_LIFE_SECS)
+risk_score = kpis['risk_index_now']
 
-with col1: st.metric("Active Prescriptions", f"{len(rx)}")
+with col1: st.metric("Active Prescriptions", f"{kpis['prescriptions']}")
 with col2: st.metric("Safety Events", f"{total_ae}")
 with col3: st.metric("Avg Sentiment", f"{avg_rating:.1f}/10")
-with col4: st.metric("Risk Index", f"{risk_score:.1f}")
+with col4: st.metric("Risk Index (Current)", f"{risk_score:.1f}",
+                     delta=f"{risk_score - kpis['risk_index']:+.1f} vs all-time", delta_color="inverse")
 
 st.markdown("---")
 
@@ -35,18 +41,16 @@ c1, c2 = st.columns([2, 1])
 
 with c1:
     st.markdown("### 📈 Safety Signal Trend")
-    if not social.empty:
-        social['ts'] = pd.to_datetime(social['timestamp'])
-        ae_trend = social[social['author_role'] == 'Patient'].set_index('ts').resample('1min')['post_id'].count().reset_index()
+    ae_trend = views['ae_trend']
+    if not ae_trend.empty:
         fig = px.area(ae_trend, x='ts', y='post_id', title=None, color_discrete_sequence=['#F4212E'])
         fig.update_layout(paper_bgcolor='#000000', plot_bgcolor='#000000', font=dict(color='#71767B'))
         st.plotly_chart(fig, use_container_width=True)
 
 with c2:
     st.markdown("### 💊 Rx Share")
-    if not rx.empty:
-        dist = rx['drug_name'].value_counts().reset_index()
-        dist.columns = ['Drug', 'Count']
+    dist = views['rx_share']
+    if not dist.empty:
         fig2 = px.pie(dist, values='Count', names='Drug', hole=0.6, color_discrete_sequence=px.colors.qualitative.Dark24)
         fig2.update_layout(paper_bgcolor='#000000', font=dict(color='white'), showlegend=False)
         st.plotly_chart(fig2, use_container_width=True)
@@ -58,10 +62,8 @@ r3_1, r3_2 = st.columns([1, 1])
 
 with r3_1:
     st.markdown("#### Adverse Event Frequency")
-    symptom_data = social[(social['detected_symptom'].notna()) & (social['detected_symptom'] != "None")]
-    if not symptom_data.empty:
-        symptom_counts = symptom_data['detected_symptom'].value_counts().reset_index()
-        symptom_counts.columns = ['Symptom', 'Count']
+    symptom_counts = views['symptom_counts']
+    if not symptom_counts.empty:
         fig_symptom = px.bar(symptom_counts, x='Count', y='Symptom', orientation='h', 
                             color='Count', color_continuous_scale='Reds', template='plotly_dark')
         st.plotly_chart(fig_symptom, use_container_width=True)
@@ -69,9 +71,33 @@ with r3_1:
 
 with r3_2:
     st.markdown("#### Doctor vs Patient Sentiment")
-    social['time_short'] = pd.to_datetime(social['timestamp']).dt.strftime('%H:%M')
-    if 'rating' in social.columns:
-        sentiment = social.groupby(['time_short', 'author_role'])['rating'].mean().reset_index()
+    sentiment = views['sentiment']
+    if not sentiment.empty:
         fig_sent = px.line(sentiment, x='time_short', y='rating', color='author_role', 
                         color_discrete_map={"Doctor": "#00E5FF", "Patient": "#FF4081"}, markers=True, template='plotly_dark')
         st.plotly_chart(fig_sent, use_container_width=True)
+
+# --- BACKEND WINDOWS (present while backend.py is running) ---
+live_stats = load_live_stats()
+if not live_stats.empty:
+    st.markdown("---")
+    st.subheader("Live Sales & Rx Windows")
+    st.dataframe(
+        live_stats[['drug_name', 'risk_score', 'sold_5m', 'prescribed_5m', 'sold_1h', 'prescribed_1h',
+                    'sold_24h', 'prescribed_24h']].sort_values('risk_score', ascending=False),
+        hide_index=True, use_container_width=True
+    )
+
+# --- DISPROPORTIONALITY SIGNALS ---
+signal_table = load_signals()
+if not signal_table.empty:
+    st.markdown("---")
+    st.subheader("Safety Signals (PRR / ROR)")
+    st.caption("Flagged: ≥3 cases, PRR ≥ 2, χ² ≥ 4 and ROR lower bound > 1. Novel: not in the FDA label's adverse reactions.")
+    st.dataframe(
+        signal_table[['drug_name', 'symptom', 'a', 'prr', 'prr_lo', 'ror', 'ror_lo', 'chi2', 'flagged', 'novel']]
+            .round(2).rename(columns={'a': 'cases'}),
+        hide_index=True, use_container_width=True
+    )
+
+timer.done()
@@ -1,13 +1,25 @@
 import streamlit as st
 import sys
 sys.path.append('.')
-from utils import query_copilot
+import metrics
+from utils import stream_copilot, get_response_cache
 
 st.set_page_config(page_title="Copilot", page_icon="🤖", layout="wide")
 
 st.title("🤖 Agentic Copilot")
+timer = metrics.PageTimer("copilot")
 st.info("Answers grounded in Live Social/Clinical Stream (RAG) + FDA Labels.")
 
+# Response cache sizing (shared by every session)
+cache_stats = get_response_cache().stats()
+timer.phase("render")
+with st.sidebar:
+    st.markdown("#### ⚡ Answer Cache")
+    st.metric("Hit Rate", f"{cache_stats['hit_rate']:.0%}")
+    st.caption(f"{cache_stats['hits']} hits • {cache_stats['misses']} misses • "
+               f"{cache_stats['size']}/{cache_stats['max_entries']} entries • "
+               f"{cache_stats['invalidations']} invalidated • {cache_stats['evictions']} evicted")
+
 if "messages" not in st.session_state:
     st.session_state.messages = []
 
@@ -20,9 +32,10 @@ if prompt := st.chat_input("Ask about drug safety (e.g. 'Side effects of Wegovy
     with st.chat_message("user"):
         st.write(prompt)
         
-    with st.spinner("Consulting live knowledge base..."):
-        response_text = query_copilot(prompt)
+    # Tokens are rendered as they arrive from the LLM
+    with st.chat_message("assistant"):
+        response_text = st.write_stream(stream_copilot(prompt))
     
     st.session_state.messages.append({"role": "assistant", "content": response_text})
-    with st.chat_message("assistant"):
-        st.write(response_text)
+
+timer.done()
@@ -1,53 +1,61 @@
 import streamlit as st
 import pandas as pd
 import sys
-import random
 import time
 sys.path.append('.')
-from utils import load_data
+import metrics
+from utils import load_scorecards
 
 st.set_page_config(page_title="Doctor View", page_icon="👨‍⚕️", layout="wide")
 
 st.title("👨‍⚕️ Prescribing Intelligence Portal")
+timer = metrics.PageTimer("doctor")
 
-data = load_data()
-sdf = data['social']
-
-# Ensure sdf is loaded
-if sdf.empty:
-    sdf = pd.DataFrame(columns=['drug_name'])
-
-drug_list = list(sdf['drug_name'].unique())
-if "All" not in drug_list: drug_list.insert(0, "All")
+# Per-drug cards precomputed from the stream (see scorecards.py)
+cards = load_scorecards()
+drug_list = cards.drug_list()
+timer.phase("render")
 
 # Main Selector
 selected_drug = st.selectbox("Select Drug for Protocol Review:", drug_list, index=0)
 st.markdown("---")
 
+card = cards.card(selected_drug)
+if card is None:
+    st.info(f"No scorecard for {selected_drug} yet: no posts have been seen for it.")
+    timer.done()
+    st.stop()
+
 col_safety, col_feed = st.columns([1, 1.2])
 
 with col_safety:
     st.markdown("### Safety Signal Gap Analysis")
     
-    ai_risk_score = random.randint(10, 90)
-    if selected_drug == "All": ai_risk_score = 45 
-    
-    ai_signal = "None"
-    if selected_drug == "Wegovy": ai_signal = "Hair Shedding (High Conf.)"
-    elif selected_drug == "Leqembi": ai_signal = "Micro-Hemorrhage Risk"
-    
-    st.metric("Real-Time Safety Score", f"{100-ai_risk_score}/100", 
-             delta="-5% vs Last Week" if ai_risk_score > 50 else "+2% vs Last Week",
-             delta_color="normal")
-    
+    ai_risk_score = 100 - card['score']
+    ai_signal = card['top_signal']
+    label_warning = ", ".join(card['label_listed'][:3]) or "None Listed"
+
+    st.metric("Real-Time Safety Score", f"{100-ai_risk_score}/100",
+             delta=f"{card['novel']} novel / {card['flagged']} flagged signals",
+             delta_color="off")
+
     st.markdown(f"""
     | Data Source | Status | Top Warning |
     | :--- | :--- | :--- |
-    | **FDA Label** | ✅ Clean | *None Listed* |
-    | **Vigilance AI** | ⚠️ **Signal** | **{ai_signal}** |
+    | **FDA Label** | {"⚠️ Listed" if label_warning != "None Listed" else "✅ Clean"} | *{label_warning}* |
+    | **Vigilance AI** | {"⚠️ **Signal**" if ai_signal != "None" else "✅ Clean"} | **{ai_signal}** |
     """, unsafe_allow_html=True)
-    
-    if ai_risk_score > 60:
+
+    if card['label_gap']:
+        st.caption(f"Label gap (signals not in the FDA label): {', '.join(card['label_gap'])}")
+    if not card['top_signals'].empty:
+        st.dataframe(
+            card['top_signals'][['drug_name', 'symptom', 'a', 'prr', 'ror_lo', 'novel']]
+                .round(2).rename(columns={'a': 'cases'}),
+            hide_index=True, use_container_width=True
+        )
+
+    if ai_risk_score > 60 and ai_signal != "None":
         st.error(f"⚠️ Recommendation: **Monitor {selected_drug} patients closely** for {ai_signal.split('(')[0]}.")
     else:
         st.success("✅ Recommendation: Proceed with standard protocol.")
@@ -64,11 +72,7 @@ with col_safety:
 with col_feed:
     st.markdown(f"### Live Clinical Surveillance: {selected_drug}")
     
-    crit_filter = (sdf['author_role'].isin(['Doctor', 'Pharmacist', 'Researcher'])) & (sdf['rating'] < 8)
-    if selected_drug != "All":
-        crit_filter = crit_filter & (sdf['drug_name'] == selected_drug)
-        
-    crit_docs = sdf[crit_filter].sort_values('timestamp', ascending=False).head(4)
+    crit_docs = card['critical_posts']
     
     if not crit_docs.empty:
         for i, row in crit_docs.iterrows():
@@ -79,7 +83,7 @@ with col_feed:
             <div style="border: 1px solid {border_color}; border-left: 5px solid {border_color}; padding: 12px; background-color: #1E1E1E; margin-bottom: 15px; border-radius: 8px;">
                 <div style="display: flex; justify-content: space-between; align-items: center;">
                     <span style="font-weight: bold; font-size: 1.1em; color: {border_color};">{icon} {row['author_role']} Alert</span>
-                    <span style="color: #888; font-size: 0.8em;">{row['timestamp'].split('T')[0]}</span>
+                    <span style="color: #888; font-size: 0.8em;">{pd.Timestamp(row['timestamp']):%Y-%m-%d}</span>
                 </div>
                 <div style="margin-top: 8px; font-size: 0.95em; color: #FFF; line-height: 1.4;">
                     "{row['text']}"
@@ -92,3 +96,5 @@ with col_feed:
             """, unsafe_allow_html=True)
     else:
         st.info(f"No critical safety signals detected for {selected_drug}.")
+
+timer.done()
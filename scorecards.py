@@ -0,0 +1,107 @@
+import heapq
+import threading
+import pandas as pd
+import signals
+
+# --- PER-DRUG SAFETY SCORECARDS FOR THE DOCTOR VIEW ---
+# Each sync folds the newly appended social rows into small per-drug state
+# (latest critical clinician posts) and rebuilds only the cards of the drugs
+# in those rows, plus any other drug whose flagged signals changed (e.g. a
+# pair expiring from the window). Rendering a drug is a dict lookup.
+
+ALL = "All"
+CLINICIANS = {'Doctor', 'Pharmacist', 'Researcher'}
+CRITICAL_RATING = 8  # clinician posts rated below this are shown as alerts
+TOP_SIGNALS = 5
+
+
+def safety_score(flagged, novel):
+    """0-100 (higher is safer): unlabeled signals weigh more than known reactions showing up again"""
+    risk = min(95, 10 + 25 * novel + 10 * (flagged - novel))
+    return 100 - risk
+
+
+class Scorecards:
+    """
+    Precomputed per-drug cards (plus one for ALL drugs):
+      score, flagged, novel  safety score and signal counts
+      top_signals            strongest flagged pairs (novel first)
+      top_signal             headline of the strongest novel signal ("None" if there is none)
+      label_gap              flagged symptoms the FDA label does not mention
+      label_listed           flagged symptoms the label already lists
+      critical_posts         newest clinician posts rated below CRITICAL_RATING
+    """
+
+    def __init__(self, detector=None, posts_per_drug=4):
+        self.detector = detector or signals.SignalDetector()
+        self.posts_per_drug = posts_per_drug
+        self.lock = threading.Lock()
+        self.cursor = None
+        self._reset()
+
+    def _reset(self):
+        self.drugs = {}     # drug -> None, in first-seen order
+        self.critical = {}  # drug -> min-heap of (timestamp, position), newest posts_per_drug kept
+        self.cards = {}
+        self.signatures = {}  # drug -> flagged (symptom, a, novel) the card was built from
+
+    def sync(self, reader):
+        with self.lock:
+            rows, self.cursor, reset = reader.since(self.cursor)
+            if reset: self._reset()
+            self.detector.sync(reader)
+            if rows.empty:
+                if not self.cards: self._build(reader, {ALL})
+                return
+
+            new_drugs = rows['drug_name'].astype(str).unique()
+            for drug in new_drugs: self.drugs.setdefault(drug, None)
+            touched = {ALL, *new_drugs}
+            rating = pd.to_numeric(rows['rating'], errors='coerce')
+            critical = rows[rows['author_role'].isin(CLINICIANS) & (rating < CRITICAL_RATING)]
+            for drug, ts, position in zip(critical['drug_name'].astype(str), critical['timestamp'].astype(str),
+                                          critical.index):
+                for key in (drug, ALL):
+                    heap = self.critical.setdefault(key, [])
+                    if len(heap) < self.posts_per_drug: heapq.heappush(heap, (ts, position))
+                    elif (ts, position) > heap[0]: heapq.heapreplace(heap, (ts, position))
+
+            self._build(reader, touched)
+
+    def _build(self, reader, touched):
+        """Rebuilds the cards of `touched` drugs and of drugs whose flagged signals changed"""
+        table = self.detector.table()
+        flagged = table[table['flagged']]
+        # Novel signals first, strongest PRR first within each group
+        flagged = flagged.sort_values(['novel', 'prr'], ascending=[False, False])
+        by_drug = dict(tuple(flagged.groupby('drug_name', sort=False)))
+        for drug in [ALL, *self.drugs]:
+            mine = flagged if drug == ALL else by_drug.get(drug, flagged.iloc[:0])
+            signature = list(zip(mine['symptom'], mine['a'], mine['novel']))
+            if drug not in touched and drug in self.cards and self.signatures.get(drug) == signature: continue
+            self.signatures[drug] = signature
+            novel = mine[mine['novel']]
+            top_signal = "None"
+            if not novel.empty:
+                top = novel.iloc[0]
+                top_signal = f"{top['symptom']} (PRR {top['prr']:.1f}, {top['a']} cases)"
+            positions = [p for _, p in sorted(self.critical.get(drug, []), reverse=True)]
+            self.cards[drug] = {
+                "drug": drug,
+                "score": safety_score(len(mine), len(novel)),
+                "flagged": len(mine),
+                "novel": len(novel),
+                "top_signal": top_signal,
+                "top_signals": mine.head(TOP_SIGNALS).reset_index(drop=True),
+                "label_gap": list(dict.fromkeys(novel['symptom'])),
+                "label_listed": list(dict.fromkeys(mine[mine['labeled']]['symptom'])),
+                "critical_posts": reader.take(positions),
+            }
+
+    def drug_list(self):
+        with self.lock:
+            return [ALL, *self.drugs]
+
+    def card(self, drug):
+        with self.lock:
+            return self.cards.get(drug)
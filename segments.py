@@ -0,0 +1,173 @@
+import os
+import sys
+import glob
+import json
+import time
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import stream_store
+import symptoms
+import demand
+
+# --- SEGMENT SUMMARIES AND RETENTION ---
+# Sealed CSV segments (see stream_store) older than the hot window are folded
+# into per-drug/per-hour summary tables holding what the views aggregate:
+# post, rating and symptom counts by role/gender/age/source (dashboard KPIs,
+# copilot cube), prescriptions per drug, and units sold per pharmacy (whose
+# stock is checkpointed into the inventory table at the same time). Readers
+# load the summaries plus the segments not summarized yet, so a (re)started
+# app parses the hot window only. Summarized segments are deleted once they
+# are past the retention period.
+#
+#     data/summaries/<stem>/summary-<ns>.parquet
+
+HOT_SECS = float(os.getenv("VIGILANCE_HOT_HOURS", "24")) * 3600
+RETENTION_SECS = float(os.getenv("VIGILANCE_RETENTION_HOURS", "0")) * 3600  # 0 = keep raw segments
+SUMMARY_MERGE = 24  # summary files are merged into one past this many
+SEGMENTS_KEY = b"vigilance.segments"
+
+SUMMARY_KEYS = {
+    "social": ["drug_name", "hour", "author_role", "patient_gender", "age_bucket", "source", "symptom"],
+    "rx": ["drug_name", "hour"],
+    "sales": ["drug_name", "hour", "pharmacy_id"],
+}
+MEASURES = ["posts", "rating_sum", "rated_posts", "prescriptions", "quantity_sold", "sales"]
+
+
+def summary_dir(path):
+    """Summary tables of one CSV stream file"""
+    stem = os.path.splitext(os.path.basename(path))[0]
+    return os.path.join(os.path.dirname(path), "summaries", stem)
+
+
+def _hours(timestamps):
+    if pd.api.types.is_datetime64_any_dtype(timestamps): return timestamps.dt.strftime("%Y-%m-%dT%H")
+    return timestamps.astype(str).str[:13]
+
+
+def summarize(stream, rows):
+    """Per-drug/per-hour aggregates of raw stream rows: SUMMARY_KEYS plus measure columns"""
+    keys = SUMMARY_KEYS[stream]
+    if stream == "social":
+        if 'extracted_symptom' not in rows: rows = symptoms.annotate(rows)
+        rating = pd.to_numeric(rows['rating'], errors='coerce').fillna(0.0)
+        frame = pd.DataFrame({
+            'drug_name': rows['drug_name'].astype(str), 'hour': _hours(rows['timestamp']),
+            'author_role': rows['author_role'].astype(str),
+            'patient_gender': rows['patient_gender'].astype(object).fillna("Unknown").astype(str),
+            'age_bucket': symptoms.age_bucket(rows['patient_age']),
+            'source': rows['source'].astype(str),
+            'symptom': symptoms.post_symptoms(rows),
+            'rating': rating, 'rated': (rating > 0).astype(int),
+        })
+        return frame.groupby(keys).agg(posts=('rating', 'size'), rating_sum=('rating', 'sum'),
+                                       rated_posts=('rated', 'sum')).reset_index()
+    frame = rows.assign(drug_name=rows['drug_name'].astype(str), hour=_hours(rows['timestamp']))
+    if stream == "rx":
+        return frame.groupby(keys).size().rename('prescriptions').reset_index()
+    frame['pharmacy_id'] = frame['pharmacy_id'].astype(str)
+    frame['quantity_sold'] = pd.to_numeric(frame['quantity_sold'], errors='coerce').fillna(0)
+    return frame.groupby(keys).agg(quantity_sold=('quantity_sold', 'sum'),
+                                   sales=('quantity_sold', 'size')).reset_index()
+
+
+def _summary_files(path):
+    return sorted(glob.glob(os.path.join(summary_dir(path), "summary-*.parquet")))
+
+
+def load_summary(path, attempts=3):
+    """(summary rows, names of the segments they cover) for one CSV stream"""
+    for _ in range(attempts):
+        frames, names = [], set()
+        try:
+            for f in _summary_files(path):
+                table = pq.read_table(f)
+                names.update(json.loads(table.schema.metadata[SEGMENTS_KEY]))
+                frames.append(table.to_pandas())
+        except FileNotFoundError:
+            continue  # merged away while listing, list again
+        except Exception as e:
+            print(f"DEBUG: Error reading summaries of {path} - {e}")
+            return pd.DataFrame(), set()
+        frames = [f for f in frames if not f.empty]
+        return (pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()), names
+    return pd.DataFrame(), set()
+
+
+def write_summary(path, frame, names):
+    """Atomically writes one summary file covering the named segments"""
+    os.makedirs(summary_dir(path), exist_ok=True)
+    table = pa.Table.from_pandas(frame, preserve_index=False)
+    table = table.replace_schema_metadata({SEGMENTS_KEY: json.dumps(sorted(names))})
+    name = os.path.join(summary_dir(path), f"summary-{time.time_ns()}.parquet")
+    pq.write_table(table, name + ".tmp")
+    os.replace(name + ".tmp", name)
+
+
+def merge_summaries(path):
+    """Merges the summary files of one stream into one once there are more than SUMMARY_MERGE"""
+    files = _summary_files(path)
+    if len(files) <= SUMMARY_MERGE: return 0
+    frames, names = [], set()
+    for f in files:
+        table = pq.read_table(f)
+        names.update(json.loads(table.schema.metadata[SEGMENTS_KEY]))
+        frames.append(table.to_pandas())
+    frames = [f for f in frames if not f.empty]
+    frame = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+    if not frame.empty:
+        keys = [c for c in frame.columns if c not in MEASURES]
+        frame = frame.groupby(keys).sum().reset_index()
+    write_summary(path, frame, names)
+    for f in files: os.remove(f)
+    return len(files)
+
+
+def compact(stream, path=None, now=None, inventory_path=demand.INVENTORY_DB):
+    """
+    Summarizes the sealed segments of one CSV stream that left the hot window
+    (oldest first, stopping at the first hot one so inventory checkpoints stay
+    in order) and deletes summarized segments past RETENTION_SECS.
+    Returns (segments summarized, segments deleted).
+    """
+    path = path or stream_store.CSV_FILES[stream]
+    now = now or time.time()
+    _, summarized = load_summary(path)
+    sealed = stream_store.list_segments(path)[:-1]
+
+    # 1. SUMMARIZE (one summary file per segment, merged when they pile up)
+    added = 0
+    for segment in sealed:
+        name = os.path.basename(segment)
+        if name in summarized: continue
+        if now - os.path.getmtime(segment) < HOT_SECS: break
+        rows = stream_store.read_segment(segment)
+        if stream == "sales" and not rows.empty:
+            # Before the summary: a retry after a crash in between skips the recorded segment
+            demand.checkpoint_inventory(rows, inventory_path, segment=name)
+        write_summary(path, summarize(stream, rows) if not rows.empty else pd.DataFrame(), [name])
+        summarized.add(name)
+        added += 1
+    if added: merge_summaries(path)
+
+    # 2. RETENTION (rolled raw segments only; the base stream file and summaries are kept)
+    deleted = 0
+    if RETENTION_SECS:
+        for segment in sealed:
+            if segment == path or os.path.basename(segment) not in summarized: continue
+            if now - os.path.getmtime(segment) < RETENTION_SECS: continue
+            os.remove(segment)
+            for sidecar in (stream_store.commit_path(segment), segment + ".lock"):
+                try: os.remove(sidecar)
+                except FileNotFoundError: pass
+            deleted += 1
+    return added, deleted
+
+
+if __name__ == "__main__":
+    # python segments.py -> summarize/retire old segments of every CSV stream
+    for stream in stream_store.SCHEMAS:
+        added, deleted = compact(stream)
+        print(f"[SEGMENTS] {stream}: summarized {added}, deleted {deleted} segments.")
+    sys.exit(0)
@@ -0,0 +1,179 @@
+import os
+import heapq
+import threading
+from collections import Counter
+import numpy as np
+import pandas as pd
+import fetch_fda
+import symptoms
+from live_views import _epoch_seconds
+
+# --- DISPROPORTIONALITY SIGNALS (PRR / ROR) PER DRUG x SYMPTOM ---
+# Every patient post is a report. Over a sliding window the detector keeps the
+# 2x2 contingency margins incrementally:
+#
+#                      symptom S   other reports
+#     drug D               a             b
+#     other drugs          c             d
+#
+# Reports are counted into 1-minute panes; when the watermark moves, expired
+# panes are subtracted from the running totals, so each event is added once
+# and removed once. PRR/ROR/chi-square are only computed when read.
+
+WINDOW_SECS = int(os.getenv("VIGILANCE_SIGNAL_WINDOW_MIN", str(24 * 60))) * 60
+PANE_SECS = 60
+MIN_CASES = int(os.getenv("VIGILANCE_SIGNAL_MIN_CASES", "3"))
+MIN_PRR = float(os.getenv("VIGILANCE_SIGNAL_MIN_PRR", "2.0"))
+MIN_CHI2 = float(os.getenv("VIGILANCE_SIGNAL_MIN_CHI2", "4.0"))
+Z = 1.96  # 95% confidence bounds
+
+COLUMNS = ['drug_name', 'symptom', 'a', 'b', 'c', 'd', 'prr', 'prr_lo', 'prr_hi',
+           'ror', 'ror_lo', 'ror_hi', 'chi2', 'flagged', 'labeled', 'novel']
+
+
+def label_text(drug):
+    """adverse_reactions text of the cached FDA label (never hits the network)"""
+    try:
+        label = fetch_fda.get_drug_label(drug, offline=True)
+    except Exception as e:
+        print(f"DEBUG: Error reading FDA label for {drug} - {e}")
+        return ""
+    return str(label.get('adverse_reactions', '')).lower() if label else ""
+
+
+def is_labeled(symptom, text):
+    """True when the label text mentions the symptom (any of its surface forms)"""
+    return bool(text) and any(form in text for form in symptoms.variants(symptom))
+
+
+def disproportionality(a, b, c, d):
+    """
+    PRR, ROR (with 95% bounds) and Yates chi-square for arrays of 2x2 tables.
+    Tables with an empty cell get the Haldane correction (+0.5 on every cell).
+    """
+    a, b, c, d = (np.asarray(x, dtype=float) for x in (a, b, c, d))
+    n = a + b + c + d
+    zero = (a == 0) | (b == 0) | (c == 0) | (d == 0)
+    ha, hb, hc, hd = (np.where(zero, x + 0.5, x) for x in (a, b, c, d))
+
+    prr = (ha / (ha + hb)) / (hc / (hc + hd))
+    prr_se = np.sqrt(1 / ha - 1 / (ha + hb) + 1 / hc - 1 / (hc + hd))
+    ror = (ha * hd) / (hb * hc)
+    ror_se = np.sqrt(1 / ha + 1 / hb + 1 / hc + 1 / hd)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        diff = np.maximum(np.abs(a * d - b * c) - n / 2, 0)
+        chi2 = n * diff ** 2 / ((a + b) * (c + d) * (a + c) * (b + d))
+    chi2 = np.nan_to_num(chi2, nan=0.0, posinf=0.0)
+
+    return {
+        'prr': prr, 'prr_lo': prr * np.exp(-Z * prr_se), 'prr_hi': prr * np.exp(Z * prr_se),
+        'ror': ror, 'ror_lo': ror * np.exp(-Z * ror_se), 'ror_hi': ror * np.exp(Z * ror_se),
+        'chi2': chi2,
+    }
+
+
+class SignalDetector:
+    """
+    Sliding-window drug x symptom contingency counts over the social stream,
+    folded in from a stream_loader reader like the live views.
+    A signal is flagged when a >= MIN_CASES, PRR >= MIN_PRR, chi-square >=
+    MIN_CHI2 and the ROR lower bound is above 1; it is novel when the drug's
+    FDA adverse_reactions text does not mention the symptom.
+    """
+
+    def __init__(self, window=WINDOW_SECS, pane=PANE_SECS, label_text=label_text):
+        self.window = window
+        self.pane = pane
+        self.label_text = label_text
+        self.lock = threading.Lock()
+        self.cursor = None
+        self._reset()
+
+    def _reset(self):
+        self.panes = {}          # pane start -> (pair counts, drug counts)
+        self.pane_starts = []    # min-heap of pane starts
+        self.pairs = Counter()   # (drug, symptom) -> a
+        self.drugs = Counter()   # drug -> a + b
+        self.symptoms = Counter()  # symptom -> a + c
+        self.total = 0
+        self.watermark = None
+
+    def sync(self, reader):
+        with self.lock:
+            rows, self.cursor, reset = reader.since(self.cursor)
+            if reset: self._reset()
+            if rows.empty: return
+            patients = rows[rows['author_role'] == 'Patient']
+            self._add(_epoch_seconds(patients['timestamp']), patients['drug_name'].astype(str).to_numpy(),
+                      symptoms.post_symptoms(patients).to_numpy())
+
+    def add(self, times, drugs, found):
+        """Folds in reports: epoch seconds, drug names and symptoms ("None" = no symptom)"""
+        with self.lock:
+            self._add(np.asarray(times, dtype=float), np.asarray(drugs, dtype=object), np.asarray(found, dtype=object))
+
+    def _add(self, times, drugs, found):
+        if len(times) == 0: return
+        newest = float(times.max())
+        self.watermark = newest if self.watermark is None else max(self.watermark, newest)
+        starts = (times // self.pane * self.pane).astype('int64')
+        live = starts > self.watermark - self.window  # late reports of expired panes are dropped
+        frame = pd.DataFrame({'pane': starts[live], 'drug': drugs[live], 'symptom': found[live]})
+
+        # One update per distinct (pane, drug, symptom) of the batch
+        grouped = frame.groupby(['pane', 'drug', 'symptom']).size()
+        for (start, drug, symptom), count in zip(grouped.index, grouped.to_numpy()):
+            pane = self.panes.get(start)
+            if pane is None:
+                pane = self.panes[start] = (Counter(), Counter())
+                heapq.heappush(self.pane_starts, start)
+            count = int(count)
+            pane[1][drug] += count
+            self.drugs[drug] += count
+            self.total += count
+            if symptom != symptoms.NONE:
+                pane[0][(drug, symptom)] += count
+                self.pairs[(drug, symptom)] += count
+                self.symptoms[symptom] += count
+        self._expire()
+
+    def _expire(self):
+        expired = False
+        while self.pane_starts and self.pane_starts[0] <= self.watermark - self.window:
+            pairs, drugs = self.panes.pop(heapq.heappop(self.pane_starts))
+            self.pairs.subtract(pairs)
+            self.drugs.subtract(drugs)
+            self.total -= sum(drugs.values())
+            for (_, symptom), count in pairs.items(): self.symptoms[symptom] -= count
+            expired = True
+        if expired: # Drop keys whose counts went to zero
+            self.pairs, self.drugs, self.symptoms = +self.pairs, +self.drugs, +self.symptoms
+
+    def table(self, drug=None):
+        """One row per drug x symptom pair in the window, strongest PRR first"""
+        with self.lock:
+            pairs = [(k, a) for k, a in self.pairs.items() if drug is None or k[0] == drug]
+            if not pairs: return pd.DataFrame(columns=COLUMNS)
+            names = [k for k, _ in pairs]
+            a = np.array([count for _, count in pairs], dtype=float)
+            drug_total = np.array([self.drugs[d] for d, _ in names], dtype=float)
+            symptom_total = np.array([self.symptoms[s] for _, s in names], dtype=float)
+            total = self.total
+
+        b, c = drug_total - a, symptom_total - a
+        df = pd.DataFrame({'drug_name': [d for d, _ in names], 'symptom': [s for _, s in names],
+                           'a': a.astype(int), 'b': b.astype(int), 'c': c.astype(int),
+                           'd': (total - a - b - c).astype(int)})
+        for name, values in disproportionality(df['a'], df['b'], df['c'], df['d']).items():
+            df[name] = values
+        df['flagged'] = ((df['a'] >= MIN_CASES) & (df['prr'] >= MIN_PRR)
+                         & (df['chi2'] >= MIN_CHI2) & (df['ror_lo'] > 1))
+        labels = {d: self.label_text(d) for d in df['drug_name'].unique()}
+        df['labeled'] = [is_labeled(s, labels[d]) for d, s in zip(df['drug_name'], df['symptom'])]
+        df['novel'] = df['flagged'] & ~df['labeled']
+        return df.sort_values('prr', ascending=False).reset_index(drop=True)[COLUMNS]
+
+    def flagged(self, drug=None, novel_only=False):
+        df = self.table(drug)
+        return df[df['novel'] if novel_only else df['flagged']].reset_index(drop=True)
@@ -0,0 +1,111 @@
+import os
+import sqlite3
+import threading
+import contextlib
+import pandas as pd
+import metrics
+from datetime import datetime
+
+# --- LATEST-STATE SINK FOR THE PATHWAY DASHBOARD STATS ---
+# One row per drug, upserted as the backend's output changes. Readers get the
+# current state with one small SELECT instead of replaying a diff log.
+
+RESULTS_DIR = "./results"
+DB_FILE = os.path.join(RESULTS_DIR, "live_stats.db")
+TABLE = "live_stats"
+KEY = "drug_name"
+
+
+def connect(path=DB_FILE):
+    conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL") # Readers never block the writer
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
+
+
+class StatsSink:
+    """
+    pw.io.subscribe callbacks that keep TABLE equal to the current contents
+    of a Pathway table keyed by `drug_name`. Changes are buffered and applied
+    in one transaction per Pathway time step.
+    """
+
+    def __init__(self, path=DB_FILE):
+        self.path = path
+        self.conn = None
+        self.columns = None
+        self.lock = threading.Lock()
+        self.pending = {}  # drug_name -> row dict (None = delete)
+
+    def _ensure_table(self, row):
+        if self.conn is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            self.conn = connect(self.path)
+        columns = [KEY] + [c for c in row if c != KEY] + ["updated_at"]
+        existing = [r[1] for r in self.conn.execute(f"PRAGMA table_info({TABLE})")]
+        if existing != columns:
+            # A derived snapshot: a new output schema simply starts a new table
+            self.conn.execute(f"DROP TABLE IF EXISTS {TABLE}")
+            cols = ", ".join(f'"{c}"' for c in columns[1:])
+            self.conn.execute(f'CREATE TABLE {TABLE} ("{KEY}" TEXT PRIMARY KEY, {cols})')
+            self.conn.commit()
+        # Otherwise the rows are kept: a backend resuming from persisted state only emits changes
+        self.columns = columns
+
+    def on_change(self, key, row, time, is_addition):
+        with self.lock:
+            if self.columns is None: self._ensure_table(row)
+            drug = row[KEY]
+            if is_addition:
+                self.pending[drug] = row
+            elif drug not in self.pending:
+                # An update is a deletion plus an addition in the same step; keep the addition
+                self.pending[drug] = None
+
+    def on_time_end(self, time):
+        with self.lock:
+            if not self.pending: return
+            updated_at = datetime.now().isoformat()
+            upserts = [[updated_at if c == "updated_at" else row[c] for c in self.columns]
+                       for row in self.pending.values() if row is not None]
+            deletes = [(drug,) for drug, row in self.pending.items() if row is None]
+            self.pending = {}
+
+            placeholders = ", ".join("?" for _ in self.columns)
+            names = ", ".join(f'"{c}"' for c in self.columns)
+            updates = ", ".join(f'"{c}" = excluded."{c}"' for c in self.columns[1:])
+            try:
+                with metrics.span("backend.sink_commit"), self.conn:
+                    self.conn.executemany(f'DELETE FROM {TABLE} WHERE "{KEY}" = ?', deletes)
+                    self.conn.executemany(
+                        f'INSERT INTO {TABLE} ({names}) VALUES ({placeholders}) '
+                        f'ON CONFLICT("{KEY}") DO UPDATE SET {updates}',
+                        upserts,
+                    )
+                metrics.count("backend_upserts", len(upserts))
+            except Exception as e:
+                print(f"DEBUG: Error writing {self.path} - {e}")
+
+    def on_end(self):
+        with self.lock:
+            if self.conn is not None:
+                self.conn.close()
+                self.conn = None
+
+
+def subscribe(table, path=DB_FILE):
+    """Mirrors a Pathway table keyed by drug_name into SQLite"""
+    import pathway as pw
+    sink = StatsSink(path)
+    pw.io.subscribe(table, on_change=sink.on_change, on_time_end=sink.on_time_end, on_end=sink.on_end)
+    return sink
+
+
+def read_stats(path=DB_FILE):
+    """Current per-drug stats (empty frame before the backend wrote anything)"""
+    if not os.path.exists(path): return pd.DataFrame()
+    try:
+        with contextlib.closing(sqlite3.connect(f"file:{path}?mode=ro", uri=True, timeout=5)) as conn:
+            return pd.read_sql_query(f"SELECT * FROM {TABLE}", conn)
+    except (sqlite3.OperationalError, pd.errors.DatabaseError):
+        return pd.DataFrame()
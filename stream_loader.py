@@ -0,0 +1,199 @@
+import io
+import os
+import abc
+import bisect
+import threading
+import pandas as pd
+import stream_store
+import segments
+import symptoms
+
+# Stream name -> append-only CSV written by mock_stream.py (or the real feeds)
+STREAM_FILES = stream_store.CSV_FILES
+
+# Per-stream column derivations, applied once to every newly parsed chunk
+ENRICHERS = {"social": symptoms.annotate}
+
+
+class ChunkedReader(abc.ABC):
+    """
+    Base for the incremental readers: keeps the rows parsed so far as a few
+    DataFrame chunks and only materializes the full frame on demand.
+    """
+
+    def __init__(self, path, enrich=None, stream=None):
+        self.path = path
+        self.enrich = enrich
+        self.stream = stream
+        self.lock = threading.Lock()
+        self.generation = 0
+        self._reset()
+
+    def _reset(self):
+        self.generation += 1
+        self.chunks = []  # parsed DataFrames in file order, sizes shrink geometrically
+        self.rows = 0
+        self._frame = None
+        self.summary = None  # aggregates of history not held as rows (see segments.py)
+        self.categories = {}  # column -> categories seen so far, shared by every chunk
+
+    @property
+    def version(self):
+        """Changes whenever the parsed frame changes (new rows or a restart)."""
+        return (self.generation, self.rows)
+
+    @abc.abstractmethod
+    def refresh(self):
+        """Appends the rows that arrived since the last call. Returns the number of new rows."""
+
+    def _append(self, chunk):
+        if self.enrich is not None:
+            try: chunk = self.enrich(chunk)
+            except Exception as e: print(f"DEBUG: Error enriching {self.path} - {e}")
+        if self.stream is not None: chunk = self._typed(chunk)
+        chunk.index = pd.RangeIndex(self.rows, self.rows + len(chunk))
+        self.chunks.append(chunk)
+        self.rows += len(chunk)
+        self._frame = None
+
+        # Merge tail chunks like a binary counter so there are only O(log n)
+        # chunks and each row is copied O(log n) times overall.
+        while len(self.chunks) > 1 and len(self.chunks[-2]) <= len(self.chunks[-1]):
+            last = self.chunks.pop()
+            self.chunks[-1] = pd.concat([self.chunks[-1], last])
+
+    def _typed(self, chunk):
+        """
+        Schema dtypes for a new chunk (stream_store.FRAME_TYPES). Categorical
+        columns use one category list per reader, extended in place when new
+        values show up, so chunks concatenate without falling back to strings.
+        """
+        chunk = stream_store.typed(self.stream, chunk)
+        for col in stream_store.categorical_columns(self.stream):
+            if col not in chunk: continue
+            known = self.categories.get(col)
+            seen = pd.Index(chunk[col].dropna().unique())
+            new = seen if known is None else seen.difference(known)
+            if known is None or len(new):
+                known = new if known is None else known.append(new)
+                self.categories[col] = known
+                for old in self.chunks:
+                    if col in old: old[col] = old[col].cat.set_categories(known)
+            chunk[col] = pd.Categorical(chunk[col], categories=known)
+        return chunk
+
+    def since(self, cursor):
+        """
+        Rows appended after `cursor`, the new cursor and whether the reader restarted.
+        A cursor is (generation, rows) from an earlier call (None = from scratch).
+        After a restart every row is returned again and the caller should rebuild.
+        """
+        with self.lock:
+            start = 0
+            if cursor is not None and cursor[0] == self.generation: start = cursor[1]
+            reset = cursor is None or cursor[0] != self.generation
+
+            parts = []
+            for chunk in reversed(self.chunks):
+                first = chunk.index[0]
+                if first + len(chunk) <= start: break
+                parts.append(chunk.iloc[max(0, start - first):])
+            if not parts: rows = pd.DataFrame()
+            elif len(parts) == 1: rows = parts[0]
+            else: rows = pd.concat(parts[::-1])
+            return rows, (self.generation, self.rows), reset
+
+    def take(self, positions):
+        """Rows at the given positions (the frame index), in the given order."""
+        positions = list(positions)
+        with self.lock:
+            if not positions or not self.chunks: return pd.DataFrame()
+            starts = [chunk.index[0] for chunk in self.chunks]
+            by_chunk = {}
+            for pos in positions:
+                i = bisect.bisect_right(starts, pos) - 1
+                if i >= 0: by_chunk.setdefault(i, []).append(pos - starts[i])
+            pieces = [self.chunks[i].iloc[local] for i, local in by_chunk.items()]
+        rows = pd.concat(pieces) if len(pieces) > 1 else pieces[0]
+        return rows.loc[[p for p in positions if p in rows.index]]
+
+    def frame(self):
+        """All rows parsed so far (cached until the next change)."""
+        with self.lock:
+            if self._frame is None:
+                if not self.chunks: self._frame = pd.DataFrame()
+                elif len(self.chunks) == 1: self._frame = self.chunks[0]
+                else: self._frame = pd.concat(self.chunks)
+            return self._frame
+
+
+class TailReader(ChunkedReader):
+    """
+    Tails one append-only CSV stream across its segments (stream_store.SegmentTail).
+    Only newly appended, complete lines are parsed. Segments already summarized
+    by segments.py are not read; their per-drug/per-hour aggregates are in
+    `summary`. Truncating or replacing the file being tailed restarts from scratch.
+    """
+
+    def _reset(self):
+        super()._reset()
+        self.summary, summarized = segments.load_summary(self.path)
+        self.tail = stream_store.SegmentTail(self.path, skip=summarized)
+
+    def refresh(self):
+        """Parses rows appended since the last call. Returns the number of new rows."""
+        with self.lock:
+            block, restarted = self.tail.read_new()
+            if restarted:
+                self._reset()
+                block, _ = self.tail.read_new()
+            if not block.strip(): return 0
+
+            chunk = pd.read_csv(io.BytesIO(self.tail.header + block))
+            if chunk.empty: return 0
+            self._append(chunk)
+            return len(chunk)
+
+
+class PartitionReader(ChunkedReader):
+    """Parquet-store counterpart of TailReader: only reads part files it has not seen yet."""
+
+    def __init__(self, stream, enrich=None):
+        super().__init__(stream_store.stream_dir(stream), enrich, stream)
+
+    def _reset(self):
+        super()._reset()
+        self.tracker = stream_store.PartTracker(self.stream)
+
+    def refresh(self):
+        with self.lock:
+            chunk = self.tracker.read_new()
+            if chunk.empty: return 0
+            self._append(chunk)
+            return len(chunk)
+
+
+class StreamLoader:
+    """Process-wide set of incremental readers, one per stream."""
+
+    def __init__(self, files=None, mode=None):
+        if (mode or stream_store.STORAGE_MODE) == "parquet":
+            self.readers = {name: PartitionReader(name, ENRICHERS.get(name)) for name in stream_store.SCHEMAS}
+        else:
+            self.readers = {name: TailReader(path, ENRICHERS.get(name), name) for name, path in (files or STREAM_FILES).items()}
+
+    def refresh(self):
+        for reader in self.readers.values():
+            try: reader.refresh()
+            except Exception as e: print(f"DEBUG: Error tailing {reader.path} - {e}")
+
+    @property
+    def version(self):
+        return tuple(reader.version for reader in self.readers.values())
+
+    def load(self):
+        """Refreshes every stream and returns {name: DataFrame}.
+        Frames are shallow copies so callers can add or replace columns
+        without touching the shared data."""
+        self.refresh()
+        return {name: reader.frame().copy(deep=False) for name, reader in self.readers.items()}
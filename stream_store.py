@@ -0,0 +1,673 @@
+"""
+Storage layer for the three event streams.
+
+CSV (default) keeps the original append-only files in ./data.
+Parquet writes hourly partitions keyed by drug and hour:
+
+    data/store/<stream>/drug_name=<drug>/hour=<YYYY-MM-DDTHH>/part-*.parquet
+
+Readers push column projection and drug_name / time predicates down to the
+Parquet dataset so only the matching partitions and columns are read.
+Select the mode with VIGILANCE_STORAGE=csv|parquet.
+
+CSV writers roll over to a new segment file past a size or age limit:
+
+    data/social_stream.csv                                   first segment
+    data/segments/social_stream/social_stream-<ns>.csv       later segments
+
+Segments are append-only and never renamed, so tailing readers only ever
+see appends and new files. Old segments are summarized and retired by
+segments.py.
+
+Every CSV append is a commit: a batch of whole rows is written under an
+exclusive lock, fsynced, then published by atomically replacing the
+segment's "<segment>.commit" marker with the new committed length. Readers
+stop at the marker, so they never parse a partial record or half a batch.
+"""
+import io
+import os
+import sys
+import csv
+import glob
+import json
+import time
+import uuid
+import contextlib
+from datetime import datetime, timedelta
+from urllib.parse import quote
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+try:
+    import fcntl
+except ImportError:
+    fcntl = None  # Windows: no cross-process lock, run a single CSV writer
+
+DATA_DIR = "./data"
+STORE_DIR = os.path.join(DATA_DIR, "store")
+
+STORAGE_MODE = os.getenv("VIGILANCE_STORAGE", "csv").lower()
+
+CSV_FILES = {
+    "social": os.path.join(DATA_DIR, "social_stream.csv"),
+    "rx": os.path.join(DATA_DIR, "prescriptions_stream.csv"),
+    "sales": os.path.join(DATA_DIR, "sales_stream.csv"),
+}
+
+# Column order is the CSV header order written by mock_stream.py
+SCHEMAS = {
+    "sales": {
+        "timestamp": "str", "drug_name": "str", "pharmacy_id": "str",
+        "quantity_sold": "int", "location": "str",
+    },
+    "rx": {
+        "timestamp": "str", "drug_name": "str", "doctor_id": "str",
+        "dosage_mg": "int", "patient_age_group": "str",
+    },
+    "social": {
+        "post_id": "str", "parent_id": "str", "timestamp": "str", "drug_name": "str", "source": "str",
+        "author_name": "str", "author_role": "str", "text": "str",
+        "rating": "int", "likes": "int", "shares": "int", "is_launch": "bool", "detected_symptom": "str", "location": "str",
+        "patient_age": "int", "patient_gender": "str",
+    },
+}
+
+# In-memory dtypes of the parsed frames (see typed()): timestamps parsed once,
+# narrow ints, and low-cardinality strings dictionary-encoded as categoricals.
+# Near-unique strings (ids, names, text, Faker cities) stay plain strings.
+FRAME_TYPES = {
+    "sales": {
+        "timestamp": "datetime", "drug_name": "category", "pharmacy_id": "category", "quantity_sold": "int16",
+    },
+    "rx": {
+        "timestamp": "datetime", "drug_name": "category", "dosage_mg": "int16", "patient_age_group": "category",
+    },
+    "social": {
+        "timestamp": "datetime", "drug_name": "category", "source": "category", "author_role": "category",
+        "rating": "int8", "likes": "int32", "shares": "int32", "is_launch": "bool",
+        "detected_symptom": "category", "extracted_symptom": "category", "patient_age": "int8", "patient_gender": "category",
+    },
+}
+
+ARROW_TYPES = {"str": pa.string(), "int": pa.int64(), "float": pa.float64(), "bool": pa.bool_()}
+
+# Partition keys live in the directory names, not inside the files
+PARTITIONING = ds.partitioning(pa.schema([("drug_name", pa.string()), ("hour", pa.string())]), flavor="hive")
+
+# Closed hours older than this are merged into a single compact-*.parquet file
+COMPACT_GRACE = timedelta(minutes=10)
+PARTS_KEY = b"vigilance.parts"
+
+# CSV segments roll over past this size or age (0 = no limit)
+SEGMENT_MAX_BYTES = int(float(os.getenv("VIGILANCE_SEGMENT_MAX_MB", "64")) * 1024 * 1024)
+SEGMENT_MAX_SECS = float(os.getenv("VIGILANCE_SEGMENT_MAX_MIN", "60")) * 60
+
+# CSV commits fsync the appended batch before publishing it (0 = safe against process crashes only)
+FSYNC = os.getenv("VIGILANCE_FSYNC", "1") != "0"
+
+# CSV sinks commit once this many rows are buffered or the oldest is this old
+# (checked on write; VIGILANCE_CSV_BATCH_ROWS=1 = one durable commit per row)
+CSV_BATCH_ROWS = int(os.getenv("VIGILANCE_CSV_BATCH_ROWS", "500"))
+CSV_FLUSH_SECS = float(os.getenv("VIGILANCE_CSV_FLUSH_SECS", "1"))
+
+# Bytes just before a tail's read offset, re-checked on every read to catch a
+# file that was truncated and then grew back past the old offset.
+FINGERPRINT_BYTES = 64
+
+
+def file_schema(stream):
+    """Arrow schema of the files in one stream partition (partition keys excluded)"""
+    return pa.schema([(col, ARROW_TYPES[t]) for col, t in SCHEMAS[stream].items() if col != "drug_name"])
+
+def stream_dir(stream):
+    return os.path.join(STORE_DIR, stream)
+
+def partition_dir(stream, drug, hour):
+    return os.path.join(stream_dir(stream), f"drug_name={quote(str(drug), safe='')}", f"hour={hour}")
+
+def _stem(path):
+    return os.path.splitext(os.path.basename(path))[0]
+
+def segment_dir(path):
+    """Rolled-over segments of one CSV stream file"""
+    return os.path.join(os.path.dirname(path), "segments", _stem(path))
+
+def list_segments(path):
+    """Segment files of one CSV stream, oldest first (the last one is being written)"""
+    files = [path] if os.path.exists(path) else []
+    return files + sorted(glob.glob(os.path.join(segment_dir(path), f"{_stem(path)}-*.csv")))
+
+def commit_path(path):
+    return path + ".commit"
+
+def committed_offset(path):
+    """Committed length of a segment (None = no marker yet: a file from before commit markers)"""
+    try:
+        with open(commit_path(path)) as f: return int(f.read())
+    except (FileNotFoundError, ValueError):
+        return None
+
+def _publish(path, offset):
+    """Atomically moves the commit marker of a segment (caller holds the exclusive lock)"""
+    tmp = commit_path(path) + ".tmp"
+    with open(tmp, "w") as f: f.write(str(offset))
+    os.replace(tmp, commit_path(path))
+
+def _complete_length(fd, size):
+    """Length of a marker-less file up to its last complete line"""
+    start = max(0, size - (1 << 20))
+    os.lseek(fd, start, os.SEEK_SET)
+    tail = os.read(fd, size - start)
+    return start + tail.rfind(b"\n") + 1
+
+def read_segment(path, **kwargs):
+    """pd.read_csv of the committed part of one segment"""
+    limit = committed_offset(path)
+    if limit is None: return pd.read_csv(path, **kwargs)
+    with open(path, "rb") as f:
+        return pd.read_csv(io.BytesIO(f.read(limit)), **kwargs)
+
+def hour_of(timestamp):
+    """'2026-01-05T12:14:21.70' -> '2026-01-05T12'"""
+    return str(timestamp)[:13]
+
+def _iso(value):
+    return value if isinstance(value, str) else pd.Timestamp(value).isoformat()
+
+
+# --- WRITERS ---
+
+@contextlib.contextmanager
+def _segment_lock(path, exclusive=False):
+    """Serializes commits and roll-overs of one CSV stream across writer processes"""
+    if fcntl is None:
+        yield
+        return
+    with open(path + ".lock", "a") as f:
+        fcntl.flock(f, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        try: yield
+        finally: fcntl.flock(f, fcntl.LOCK_UN)
+
+def _started_at(path):
+    """Epoch seconds a segment was started: from its name, else its first row's timestamp"""
+    name = _stem(path)
+    if "-" in name and name.rsplit("-", 1)[1].isdigit(): return int(name.rsplit("-", 1)[1]) / 1e9
+    with open(path, newline='', encoding='utf-8') as f:
+        rows = csv.reader(f)
+        header, first = next(rows, None), next(rows, None)
+    if not header or not first or "timestamp" not in header: return None
+    try: return datetime.fromisoformat(first[header.index("timestamp")]).timestamp()
+    except ValueError: return None
+
+
+class CsvSink:
+    """
+    Appends rows to the newest segment of a CSV stream, one commit per batch
+    of batch_rows rows or flush_secs seconds, whichever comes first (or per
+    batch() block, e.g. a thread and its replies). Writers call flush() to
+    commit early; batch_rows=1 commits every row.
+    A commit appends the whole batch under the exclusive lock, fsyncs it and
+    publishes the new length in the segment's commit marker. Bytes past the
+    marker are a batch torn by a crashed writer and are truncated before the
+    next commit, so several writer processes can share a stream safely.
+    With rotate=True (one writer per stream) the sink starts a new segment once
+    the current one passes SEGMENT_MAX_BYTES or SEGMENT_MAX_SECS, then calls
+    on_roll(stream, path), e.g. segments.compact to summarize and retire old ones.
+    """
+
+    def __init__(self, stream, batch_rows=CSV_BATCH_ROWS, flush_secs=CSV_FLUSH_SECS, rotate=True, on_roll=None):
+        self.stream = stream
+        self.path = CSV_FILES[stream]
+        self.batch_rows = batch_rows
+        self.flush_secs = flush_secs
+        self.rotate = rotate
+        self.on_roll = on_roll
+        self.buffer = io.StringIO()
+        self.writer = csv.writer(self.buffer)
+        self.pending = 0
+        self.deferred = 0
+        self.first_pending = None
+        self.fd = None
+        self.active = None
+        self.started = None
+
+    def _header(self):
+        header = io.StringIO()
+        csv.writer(header).writerow(list(SCHEMAS[self.stream]))
+        return header.getvalue().encode('utf-8')
+
+    def init(self):
+        with _segment_lock(self.path, exclusive=True):
+            if not list_segments(self.path): self._commit(self._header())
+
+    def _current(self):
+        """Newest segment, reopening when another writer rolled over"""
+        segments = list_segments(self.path)
+        active = segments[-1] if segments else self.path
+        if active != self.active:
+            self._close_fd()
+            self.active, self.started = active, None
+        return active
+
+    def write(self, row):
+        self.writer.writerow(row)
+        if not self.pending: self.first_pending = time.time()
+        self.pending += 1
+        if not self.deferred and self._due(): self.flush()
+
+    def _due(self):
+        return self.pending >= self.batch_rows or time.time() - self.first_pending >= self.flush_secs
+
+    @contextlib.contextmanager
+    def batch(self):
+        """Rows written inside the block are committed together (never split across commits)"""
+        self.deferred += 1
+        try:
+            yield self
+        finally:
+            self.deferred -= 1
+            if not self.deferred and self.pending and self._due(): self.flush()
+
+    def flush(self):
+        if not self.pending: return
+        data = self.buffer.getvalue().encode('utf-8')
+        with _segment_lock(self.path, exclusive=True):
+            self._commit(data)
+        self.buffer.seek(0)
+        self.buffer.truncate()
+        self.pending = 0
+        self._maybe_roll()
+
+    def _commit(self, data):
+        """Appends `data` to the newest segment and publishes it (caller holds the exclusive lock)"""
+        active = self._current()
+        if self.fd is None:
+            self.fd = os.open(active, os.O_RDWR | os.O_APPEND | os.O_CREAT | getattr(os, "O_BINARY", 0))
+        size = os.fstat(self.fd).st_size
+        committed = committed_offset(active)
+        if committed is None: committed = _complete_length(self.fd, size)
+        if size > committed: os.ftruncate(self.fd, committed)  # torn batch of a crashed writer
+        view = memoryview(data)
+        while view: view = view[os.write(self.fd, view):]
+        if FSYNC: os.fsync(self.fd)
+        _publish(active, committed + len(data))
+
+    def _maybe_roll(self):
+        if not self.rotate or not (SEGMENT_MAX_BYTES or SEGMENT_MAX_SECS): return
+        try:
+            size = committed_offset(self.active) or os.path.getsize(self.active)
+            if self.started is None: self.started = _started_at(self.active) or time.time()
+        except (OSError, TypeError) as e:
+            print(f"DEBUG: Error checking segment {self.active} - {e}")
+            return
+        too_big = SEGMENT_MAX_BYTES and size >= SEGMENT_MAX_BYTES
+        too_old = SEGMENT_MAX_SECS and time.time() - self.started >= SEGMENT_MAX_SECS
+        if too_big or too_old: self.roll()
+
+    def roll(self):
+        """Starts a new segment (header only, committed), then runs the on_roll hook"""
+        os.makedirs(segment_dir(self.path), exist_ok=True)
+        name = os.path.join(segment_dir(self.path), f"{_stem(self.path)}-{time.time_ns()}.csv")
+        header = self._header()
+        with open(name + ".tmp", 'wb') as f:
+            f.write(header)
+        with _segment_lock(self.path, exclusive=True):
+            _publish(name, len(header))
+            os.replace(name + ".tmp", name)
+            self._current()
+
+        if self.on_roll is None: return
+        try: self.on_roll(self.stream, self.path)
+        except Exception as e: print(f"DEBUG: Error compacting {self.stream} segments - {e}")
+
+    def _close_fd(self):
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
+
+    def close(self):
+        self.flush()
+        self._close_fd()
+
+
+class ParquetSink:
+    """Buffers rows and writes them as hourly, per-drug Parquet part files."""
+
+    def __init__(self, stream, batch_rows=500, flush_secs=5.0, compact=True):
+        self.stream = stream
+        self.batch_rows = batch_rows
+        self.flush_secs = flush_secs
+        self.compact = compact  # only one writer per stream should compact
+        self.buffer = []
+        self.deferred = 0
+        self.last_flush = time.time()
+        self.last_hour = None
+
+    def init(self):
+        os.makedirs(stream_dir(self.stream), exist_ok=True)
+
+    def write(self, row):
+        self.buffer.append(row)
+        if not self.deferred and self._due(): self.flush()
+
+    def _due(self):
+        return len(self.buffer) >= self.batch_rows or time.time() - self.last_flush >= self.flush_secs
+
+    @contextlib.contextmanager
+    def batch(self):
+        """Rows written inside the block are flushed together"""
+        self.deferred += 1
+        try:
+            yield self
+        finally:
+            self.deferred -= 1
+            if not self.deferred and self._due(): self.flush()
+
+    def flush(self):
+        self.last_flush = time.time()
+        if not self.buffer: return
+        df = pd.DataFrame(self.buffer, columns=list(SCHEMAS[self.stream]))
+        self.buffer = []
+
+        df['hour'] = df['timestamp'].map(hour_of)
+        for (drug, hour), part in df.groupby(['drug_name', 'hour'], sort=False):
+            write_part(self.stream, drug, hour, part)
+
+        # A new hour started: the previous ones can be merged
+        current_hour = df['hour'].max()
+        if self.compact and self.last_hour is not None and current_hour != self.last_hour:
+            compact(self.stream)
+        self.last_hour = current_hour
+
+    def close(self):
+        self.flush()
+
+
+def _coerce(stream, df):
+    """Writer rows carry CSV-style values ("True", "" ...); cast them to the schema types"""
+    df = df.copy()
+    for col, t in SCHEMAS[stream].items():
+        if col not in df: continue
+        if t == "bool": df[col] = df[col].astype(str).str.lower().eq("true")
+        elif t in ("int", "float"): df[col] = pd.to_numeric(df[col], errors="coerce")
+        else: df[col] = df[col].where(df[col].astype(str) != "", None)
+    return df
+
+def typed(stream, df):
+    """Casts a parsed chunk to FRAME_TYPES (categoricals are left to the caller, see ChunkedReader)"""
+    for col, t in FRAME_TYPES.get(stream, {}).items():
+        if col not in df or t == "category": continue
+        try:
+            if t == "datetime": df[col] = pd.to_datetime(df[col], format="ISO8601")
+            elif t == "bool": df[col] = df[col].astype(str).str.lower().eq("true")
+            else:
+                values = pd.to_numeric(df[col], errors="coerce")
+                df[col] = values.astype(t) if values.notna().all() else values.astype("float32")
+        except Exception as e:
+            print(f"DEBUG: Error typing {stream}.{col} - {e}")
+    return df
+
+def categorical_columns(stream):
+    return [col for col, t in FRAME_TYPES.get(stream, {}).items() if t == "category"]
+
+def write_part(stream, drug, hour, df):
+    """Atomically writes one part file (readers never see a half-written file)"""
+    schema = file_schema(stream)
+    table = pa.Table.from_pandas(_coerce(stream, df)[schema.names], schema=schema, preserve_index=False)
+    out_dir = partition_dir(stream, drug, hour)
+    os.makedirs(out_dir, exist_ok=True)
+    name = f"part-{time.time_ns()}-{uuid.uuid4().hex[:6]}.parquet"
+    tmp = os.path.join(out_dir, f".{name}.tmp")
+    pq.write_table(table, tmp)
+    os.replace(tmp, os.path.join(out_dir, name))
+
+def open_sink(stream, mode=None, batch_rows=None, compact=True, on_roll=None):
+    """`on_roll(stream, path)` runs after a CSV sink starts a new segment (see CsvSink)"""
+    if (mode or STORAGE_MODE) == "parquet":
+        return ParquetSink(stream, batch_rows=batch_rows or 500, compact=compact)
+    return CsvSink(stream, batch_rows=batch_rows or CSV_BATCH_ROWS, rotate=compact, on_roll=on_roll)
+
+def open_sinks(mode=None, batch_rows=None, compact=True, on_roll=None):
+    return {stream: open_sink(stream, mode, batch_rows, compact, on_roll) for stream in SCHEMAS}
+
+
+# --- COMPACTION ---
+
+def compact(stream, now=None):
+    """Merges the part files of every closed hour into one compact-*.parquet file"""
+    cutoff = hour_of(((now or datetime.now()) - COMPACT_GRACE).isoformat())
+    merged = 0
+    for part_dir in glob.glob(os.path.join(stream_dir(stream), "drug_name=*", "hour=*")):
+        if os.path.basename(part_dir)[len("hour="):] >= cutoff: continue
+        files = list_files(part_dir)
+        if len(files) < 2: continue
+
+        # Record which parts (and how many rows each) the compact file replaces, in order
+        parts = []
+        for f in files:
+            if is_compacted(f): parts += replaced_parts(f)
+            else: parts.append([os.path.basename(f), pq.read_metadata(f).num_rows])
+
+        table = pa.concat_tables([pq.read_table(f, schema=file_schema(stream)) for f in files])
+        table = table.replace_schema_metadata({PARTS_KEY: json.dumps(parts)})
+        name = f"compact-{time.time_ns()}.parquet"
+        tmp = os.path.join(part_dir, f".{name}.tmp")
+        pq.write_table(table, tmp)
+        os.replace(tmp, os.path.join(part_dir, name))
+        for f in files: os.remove(f)
+        merged += 1
+    return merged
+
+
+# --- READERS ---
+
+def replaced_parts(path):
+    """[[part file name, row count], ...] recorded in a compact file"""
+    return json.loads(pq.read_schema(path).metadata[PARTS_KEY])
+
+def list_files(part_dir):
+    return sorted(glob.glob(os.path.join(part_dir, "*.parquet")))
+
+def list_parts(stream):
+    """Every visible part/compact file of a stream, oldest partition first"""
+    return sorted(glob.glob(os.path.join(stream_dir(stream), "drug_name=*", "hour=*", "*.parquet")))
+
+def is_compacted(path):
+    return os.path.basename(path).startswith("compact-")
+
+
+class SegmentTail:
+    """
+    Follows the segments of one CSV stream (see list_segments): each sealed
+    segment is read to its end once, then the newest one is tailed. Only
+    committed bytes (up to the commit marker) are returned; files without a
+    marker are read up to their last complete line. `skip` names segments
+    the caller covers otherwise (summaries).
+    """
+
+    def __init__(self, path, skip=()):
+        self.path = path
+        self.skip = set(skip)
+        self.done = set()
+        self.header = b""
+        self._open(None)
+
+    def _open(self, path, inode=None):
+        self.current, self.inode, self.offset, self.fingerprint = path, inode, 0, b""
+
+    def read_new(self):
+        """(complete new lines, restarted). restarted = the file being tailed was truncated,
+        replaced or removed, so everything returned before is stale."""
+        files = [f for f in list_segments(self.path) if os.path.basename(f) not in self.skip | self.done]
+        if self.current is not None and self.current not in files: return b"", True
+
+        blocks = []
+        for i, path in enumerate(files):
+            sealed = i < len(files) - 1
+            try:
+                f = open(path, "rb")
+            except FileNotFoundError:
+                if path == self.current: return b"", True
+                continue
+            with f:
+                limit = committed_offset(path)  # before fstat: those bytes are already written
+                st = os.fstat(f.fileno())
+                if path != self.current: self._open(path, st.st_ino)
+                elif not self._is_same_file(f, st): return b"", True
+                size = st.st_size if limit is None else min(limit, st.st_size)
+                if size < self.offset: return b"", True
+                f.seek(self.offset)
+                data = f.read(size - self.offset)
+
+            # 1. HEADER (first line of every segment)
+            if self.offset == 0:
+                nl = data.find(b"\n")
+                if nl < 0:
+                    if sealed: self.done.add(os.path.basename(path))
+                    continue
+                self.header = self.header or data[:nl + 1]
+                self._advance(data[:nl + 1])
+                data = data[nl + 1:]
+
+            # 2. COMPLETE LINES ONLY (a sealed segment gets no more writes)
+            end = data.rfind(b"\n")
+            if end >= 0:
+                blocks.append(data[:end + 1])
+                self._advance(data[:end + 1])
+            if sealed:
+                self.done.add(os.path.basename(path))
+                self._open(None)
+        return b"".join(blocks), False
+
+    def state(self):
+        """JSON-able position, for resuming with restore() in another process"""
+        return {"done": sorted(self.done), "current": self.current, "inode": self.inode, "offset": self.offset,
+                "fingerprint": self.fingerprint.hex(), "header": self.header.hex()}
+
+    def restore(self, state):
+        self.done = set(state["done"])
+        self._open(state["current"], state["inode"])
+        self.offset = state["offset"]
+        self.fingerprint = bytes.fromhex(state["fingerprint"])
+        self.header = bytes.fromhex(state["header"])
+
+    def _is_same_file(self, f, st):
+        if st.st_ino != self.inode or st.st_size < self.offset:
+            return False
+        if self.fingerprint:
+            f.seek(self.offset - len(self.fingerprint))
+            return f.read(len(self.fingerprint)) == self.fingerprint
+        return True
+
+    def _advance(self, consumed):
+        self.offset += len(consumed)
+        self.fingerprint = (self.fingerprint + consumed)[-FINGERPRINT_BYTES:]
+
+
+class PartTracker:
+    """
+    Remembers which part files of a stream were already consumed.
+    Compact files list the parts they replaced, so after a compaction only
+    the rows of parts this tracker had not seen yet are returned again.
+    """
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.seen = set()
+
+    def read_new(self, columns=None):
+        """Rows from part files not consumed yet (empty frame when there are none)"""
+        whole, pieces = [], []
+        for path in list_parts(self.stream):
+            if path in self.seen: continue
+            self.seen.add(path)
+            if not is_compacted(path):
+                whole.append(path)
+                continue
+
+            part_dir = os.path.dirname(path)
+            offset, ranges = 0, []
+            for name, rows in replaced_parts(path):
+                if os.path.join(part_dir, name) not in self.seen:
+                    self.seen.add(os.path.join(part_dir, name))
+                    ranges.append((offset, offset + rows))
+                offset += rows
+            if not ranges: continue
+            if ranges == [(0, offset)]:
+                whole.append(path)
+                continue
+            df = read_parquet(self.stream, columns, paths=[path])
+            pieces.append(pd.concat([df.iloc[a:b] for a, b in ranges]))
+
+        if whole: pieces.insert(0, read_parquet(self.stream, columns, paths=whole))
+        if not pieces: return empty_frame(self.stream, columns)
+        return pd.concat(pieces, ignore_index=True) if len(pieces) > 1 else pieces[0]
+
+def _predicate(drugs=None, start=None, end=None):
+    flt = None
+    def both(a, b): return b if a is None else a & b
+    if drugs is not None:
+        flt = both(flt, ds.field("drug_name").isin([str(d) for d in drugs]))
+    if start is not None:
+        start = _iso(start)
+        flt = both(flt, (ds.field("hour") >= hour_of(start)) & (ds.field("timestamp") >= start))
+    if end is not None:
+        end = _iso(end)
+        flt = both(flt, (ds.field("hour") <= hour_of(end)) & (ds.field("timestamp") < end))
+    return flt
+
+def read_parquet(stream, columns=None, drugs=None, start=None, end=None, paths=None):
+    """Reads a projected, filtered slice of the Parquet store (or of the given part files)"""
+    columns = list(columns or SCHEMAS[stream])
+    if paths is None:
+        if not os.path.isdir(stream_dir(stream)): paths = []
+        else: paths = list_parts(stream)
+    if not paths:
+        return empty_frame(stream, columns)
+
+    schema = file_schema(stream).append(pa.field("drug_name", pa.string())).append(pa.field("hour", pa.string()))
+    dataset = ds.dataset(paths, format="parquet", schema=schema,
+                         partitioning=PARTITIONING, partition_base_dir=stream_dir(stream))
+    table = dataset.to_table(columns=columns, filter=_predicate(drugs, start, end))
+    return table.to_pandas()
+
+def filter_frame(df, columns=None, drugs=None, start=None, end=None):
+    """Same predicates as read_parquet, applied to an in-memory frame"""
+    if df.empty: return df
+    mask = pd.Series(True, index=df.index)
+    if drugs is not None: mask &= df['drug_name'].isin(list(drugs))
+    if start is not None or end is not None:
+        # Parsed timestamps compare as datetimes, raw ISO strings compare lexically
+        parsed = pd.api.types.is_datetime64_any_dtype(df['timestamp'])
+        ts = df['timestamp'] if parsed else df['timestamp'].astype(str)
+        bound = (lambda v: pd.Timestamp(_iso(v))) if parsed else _iso
+        if start is not None: mask &= ts >= bound(start)
+        if end is not None: mask &= ts < bound(end)
+    out = df if mask.all() else df[mask]
+    return out[list(columns)] if columns is not None else out
+
+def read_stream(stream, columns=None, drugs=None, start=None, end=None):
+    """One-shot read of a stream in the configured storage mode"""
+    if STORAGE_MODE == "parquet":
+        return read_parquet(stream, columns, drugs, start, end)
+    try:
+        usecols = None
+        if columns is not None:
+            usecols = set(columns) | ({'drug_name'} if drugs is not None else set()) | ({'timestamp'} if start or end else set())
+        frames = [read_segment(path, usecols=usecols) for path in list_segments(CSV_FILES[stream])]
+    except FileNotFoundError:
+        return empty_frame(stream, columns)
+    if not frames: return empty_frame(stream, columns)
+    df = frames[0] if len(frames) == 1 else pd.concat(frames, ignore_index=True)
+    return filter_frame(df, columns, drugs, start, end)
+
+def empty_frame(stream, columns=None):
+    return pd.DataFrame(columns=list(columns or SCHEMAS[stream]))
+
+
+if __name__ == "__main__":
+    # python stream_store.py compact  -> merge closed hourly partitions
+    if len(sys.argv) > 1 and sys.argv[1] == "compact":
+        for stream in SCHEMAS:
+            print(f"[STORE] {stream}: compacted {compact(stream)} partitions.")
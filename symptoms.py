@@ -0,0 +1,206 @@
+import re
+import json
+import threading
+from collections import deque
+import numpy as np
+import pandas as pd
+
+try:
+    import ahocorasick  # pyahocorasick (C automaton), optional
+except ImportError:
+    ahocorasick = None
+
+# --- SYMPTOM EXTRACTION FROM POST TEXT ---
+# One Aho-Corasick automaton over every symptom surface form (lexicon below),
+# matched on lowercased text with word-boundary checks. Batches resolve each
+# distinct text once, which on templated social posts is most of the work.
+
+FDA_FILE = "./data/fda_context.json"
+NONE = "None"
+
+# Risks not yet on the FDA labels that the social streams carry (mock_stream.py tags posts with them)
+EMERGING_SIGNALS = {
+    "Wegovy": ["Ozempic Face", "Hair Shedding", "Muscle Loss"],
+    "Mounjaro": ["Thyroid Tenderness", "Severe Nausea"],
+    "Leqembi": ["Micro-Hemorrhage", "Brain Swelling"],
+    "Skyrizi": ["Liver enzyme spike", "Fatigue"],
+    "Paxlovid": ["Rebound COVID", "Taste loss"],
+    "Rinvoq": ["Acne", "Blood Clots"],
+}
+
+# Patient wording -> lexicon symptom
+SLANG = {
+    "Hair Shedding": ["hair loss", "losing hair", "hair falling out", "hair is falling out", "balding"],
+    "Ozempic Face": ["saggy face", "face looks older", "sunken face"],
+    "Muscle Loss": ["losing muscle", "muscle wasting"],
+    "Severe Nausea": ["throwing up", "cant stop puking", "puking"],
+    "Fatigue": ["exhausted", "so tired", "no energy"],
+    "Taste loss": ["cant taste", "metallic taste", "paxlovid mouth"],
+    "Rebound COVID": ["covid rebound", "tested positive again"],
+    "Blood Clots": ["blood clot", "dvt"],
+    "Brain Swelling": ["aria-e"],
+    "Micro-Hemorrhage": ["microbleed", "microbleeds", "aria-h"],
+}
+
+# Common label terms, kept when the FDA adverse_reactions text mentions them
+LABEL_TERMS = [
+    "Nausea", "Vomiting", "Diarrhea", "Constipation", "Abdominal Pain", "Headache", "Dizziness",
+    "Fatigue", "Hypoglycemia", "Pancreatitis", "Injection Site Reaction", "Rash", "Upper Respiratory Tract Infection",
+    "Dyspepsia", "Decreased Appetite", "Cough", "Dysgeusia", "Hypertension", "Myalgia", "Acne", "Insomnia",
+]
+
+BULLET_RE = re.compile(r"•\s*([^•\[\]]{3,80}?)\s*(?:\[|•|$)")
+
+
+def variants(term):
+    """Surface forms of a symptom: as written, hyphens as spaces, and squashed for hashtags (#hairshedding)"""
+    base = term.lower().strip()
+    spaced = base.replace("-", " ")
+    return {base, spaced, re.sub(r"[\s\-]+", "", base)}
+
+
+def label_terms(path=FDA_FILE):
+    """Symptom names from the adverse_reactions sections of the cached FDA labels"""
+    try:
+        with open(path) as f: labels = json.load(f)
+    except Exception:
+        return []
+    terms = set()
+    for label in labels.values():
+        text = str(label.get("adverse_reactions", "")) if isinstance(label, dict) else ""
+        lowered = text.lower()
+        for bullet in BULLET_RE.findall(text):
+            bullet = bullet.strip(" .;,")
+            if 1 <= len(bullet.split()) <= 6: terms.add(bullet)
+        terms.update(term for term in LABEL_TERMS if term.lower() in lowered)
+    return sorted(terms)
+
+
+def build_lexicon(fda_path=FDA_FILE):
+    """surface form -> symptom name; emerging signals win over label terms"""
+    lexicon = {}
+    for term in label_terms(fda_path):
+        for form in variants(term): lexicon.setdefault(form, term)
+    for symptom, slang in SLANG.items():
+        for form in slang: lexicon[form.lower()] = symptom
+    for signals in EMERGING_SIGNALS.values():
+        for symptom in signals:
+            for form in variants(symptom): lexicon[form] = symptom
+    return lexicon
+
+
+class PyAutomaton:
+    """Pure-Python Aho-Corasick (used when pyahocorasick is not installed)"""
+
+    def __init__(self, patterns):
+        self.goto = [{}]
+        self.fail = [0]
+        self.out = [[]]
+        for pattern in patterns:
+            node = 0
+            for ch in pattern:
+                nxt = self.goto[node].get(ch)
+                if nxt is None:
+                    nxt = len(self.goto)
+                    self.goto[node][ch] = nxt
+                    self.goto.append({}); self.fail.append(0); self.out.append([])
+                node = nxt
+            self.out[node].append(pattern)
+
+        queue = deque(self.goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, nxt in self.goto[node].items():
+                queue.append(nxt)
+                f = self.fail[node]
+                while f and ch not in self.goto[f]: f = self.fail[f]
+                self.fail[nxt] = self.goto[f].get(ch, 0) if self.goto[f].get(ch, 0) != nxt else 0
+                self.out[nxt] = self.out[nxt] + self.out[self.fail[nxt]]
+
+    def iter(self, text):
+        """(end index, pattern) for every occurrence"""
+        goto, fail, out = self.goto, self.fail, self.out
+        node = 0
+        for i, ch in enumerate(text):
+            while node and ch not in goto[node]: node = fail[node]
+            node = goto[node].get(ch, 0)
+            for pattern in out[node]:
+                yield i, pattern
+
+
+def _make_automaton(patterns):
+    if ahocorasick is None: return PyAutomaton(patterns)
+    automaton = ahocorasick.Automaton()
+    for pattern in patterns: automaton.add_word(pattern, pattern)
+    automaton.make_automaton()
+    return automaton
+
+
+class SymptomExtractor:
+    """Finds lexicon symptoms in post text (whole words/hashtags only)"""
+
+    def __init__(self, lexicon=None):
+        self.lexicon = lexicon if lexicon is not None else build_lexicon()
+        self.automaton = _make_automaton(self.lexicon)
+
+    def extract(self, text):
+        """Distinct symptoms mentioned in `text`, in order of first mention"""
+        lowered = str(text).lower()
+        found = []
+        for end, pattern in self.automaton.iter(lowered):
+            start = end - len(pattern) + 1
+            if start > 0 and lowered[start - 1].isalnum(): continue
+            if end + 1 < len(lowered) and lowered[end + 1].isalnum(): continue
+            symptom = self.lexicon[pattern]
+            if symptom not in found: found.append(symptom)
+        return found
+
+    def extract_many(self, texts):
+        """extract() over a batch; each distinct text is scanned once"""
+        codes, uniques = pd.factorize(pd.Series(texts, dtype=object).fillna("").astype(str))
+        if len(uniques) == 0: return []
+        results = np.empty(len(uniques), dtype=object)
+        results[:] = [self.extract(text) for text in uniques]
+        return results[codes].tolist()
+
+    def first_many(self, texts):
+        """First symptom per text ("None" when nothing matched)"""
+        return [found[0] if found else NONE for found in self.extract_many(texts)]
+
+
+_extractor = None
+_extractor_lock = threading.Lock()
+
+def get_extractor():
+    """Process-wide extractor, built on first use"""
+    global _extractor
+    with _extractor_lock:
+        if _extractor is None: _extractor = SymptomExtractor()
+        return _extractor
+
+
+def annotate(frame):
+    """Adds `extracted_symptom` (first symptom found in `text`) to a social-stream frame"""
+    if frame.empty or 'text' not in frame: return frame
+    frame['extracted_symptom'] = get_extractor().first_many(frame['text'].tolist())
+    return frame
+
+
+# --- PER-POST COLUMNS SHARED BY THE VIEWS, SIGNALS AND SEGMENT SUMMARIES ---
+# Copilot age filters ("under 30", "over 50") map onto these buckets
+AGE_BUCKETS = ["<30", "30-50", ">50"]
+
+
+def age_bucket(ages):
+    """Vectorized patient_age -> AGE_BUCKETS label ("Unknown" when missing)"""
+    ages = pd.to_numeric(ages, errors='coerce')
+    labels = np.select([ages < 30, ages > 50, ages.notna()], ["<30", ">50", "30-50"], default="Unknown")
+    return pd.Series(labels, index=ages.index)
+
+
+def post_symptoms(rows):
+    """Symptom per post: the one extracted from the text, else the feed's own tag"""
+    detected = rows['detected_symptom'].astype(object).fillna(NONE).astype(str)
+    if 'extracted_symptom' not in rows: return detected
+    extracted = rows['extracted_symptom'].astype(object).fillna(NONE).astype(str)
+    return extracted.where(extracted != NONE, detected)
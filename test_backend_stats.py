@@ -0,0 +1,50 @@
+import numpy as np
+import pandas as pd
+
+
+def events(n, seed, hours=30):
+    rng = np.random.default_rng(seed)
+    times = pd.Timestamp("2026-01-05") + pd.to_timedelta(np.sort(rng.uniform(0, hours * 3600, n)), unit="s")
+    return times.strftime("%Y-%m-%dT%H:%M:%S.%f"), rng.choice(["Wegovy", "Rinvoq"], n), rng
+
+
+def expected_stats(sales, rx, backend):
+    """Windows and decayed risk recomputed from scratch with pandas"""
+    t = lambda df: (pd.to_datetime(df["timestamp"]) - pd.Timestamp(0)).dt.total_seconds()
+    sales, rx = sales.assign(t=t(sales)), rx.assign(t=t(rx))
+    watermark = max(sales["t"].max(), rx["t"].max())
+    rows = {}
+    for drug in ["Rinvoq", "Wegovy"]:
+        s, r = sales[sales["drug_name"] == drug], rx[rx["drug_name"] == drug]
+        weights = np.concatenate([s["quantity_sold"] * backend.SALES_WEIGHT, np.full(len(r), backend.RX_WEIGHT)])
+        times = np.concatenate([s["t"], r["t"]])
+        row = {"risk_score": (weights * 2 ** ((times - watermark) / backend.RISK_HALF_LIFE_SECS)).sum()}
+        for name, span in backend.WINDOWS.items():
+            live = lambda df: df[(df["t"] // 60 * 60 > watermark - span.total_seconds()) & (df["t"] // 60 * 60 <= watermark)]
+            row[f"sold_{name}"] = live(s)["quantity_sold"].sum()
+            row[f"prescribed_{name}"] = len(live(r))
+        rows[drug] = row
+    return pd.DataFrame.from_dict(rows, orient="index")
+
+
+def test_windows_and_decayed_risk_match_recompute(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    import pathway as pw
+    import backend
+
+    stamps, drugs, rng = events(3000, seed=1)
+    sales = pd.DataFrame({"timestamp": stamps, "drug_name": drugs, "quantity_sold": rng.integers(1, 5, len(stamps)),
+                          "location": "Springfield"})
+    stamps, drugs, rng = events(2000, seed=2)
+    rx = pd.DataFrame({"timestamp": stamps, "drug_name": drugs, "dosage_mg": rng.choice([5, 10], len(stamps))})
+
+    pw.internals.parse_graph.G.clear()
+    stats = backend.build_dashboard_stats(
+        pw.debug.table_from_pandas(sales, schema=backend.stream_schema("sales", list(sales.columns))),
+        pw.debug.table_from_pandas(rx, schema=backend.stream_schema("rx", list(rx.columns))))
+    got = pw.debug.table_to_pandas(stats).set_index("drug_name").sort_index()
+
+    expected = expected_stats(sales, rx, backend)
+    assert (expected["sold_24h"] < sales.groupby("drug_name")["quantity_sold"].sum()).all()  # older rows left the window
+    for col in expected:
+        np.testing.assert_allclose(got[col].astype(float), expected[col].astype(float), rtol=1e-6, err_msg=col)
@@ -0,0 +1,38 @@
+import os
+import sys
+import json
+import subprocess
+
+import benchmark
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+
+def test_compare_flags_only_slowdowns_past_tolerance():
+    baseline = {"10k": {"load_data.cold": 1.0, "feed.page.warm": 0.010}, "100k": {"load_data.cold": 8.0}}
+    current = {"10k": {"load_data.cold": 1.2, "feed.page.warm": 0.020, "new.op": 5.0}, "1M": {"load_data.cold": 90.0}}
+    assert benchmark.compare(current, baseline, tolerance=1.25) == [("10k", "feed.page.warm", 0.010, 0.020)]
+    assert benchmark.compare(current, baseline, tolerance=2.5) == []
+
+
+def test_run_records_results_and_fails_on_regression(tmp_path):
+    """A tiny end-to-end run (own process: it changes directory and fills the app caches)"""
+    baseline = tmp_path / "baseline.json"
+    baseline.write_text(json.dumps({"results": {"tiny": {"load_data.cold": 1e-9, "feed.page.warm": 1e3}}}))
+    script = (
+        "import sys, benchmark;"
+        f"benchmark.SIZES = {{'tiny': 2000}}; benchmark.APPEND_ROWS = 100;"
+        f"benchmark.BENCH_DIR = {str(tmp_path / 'data')!r}; benchmark.RESULTS_DIR = {str(tmp_path / 'results')!r};"
+        f"sys.argv = ['benchmark.py', '--sizes', 'tiny', '--workers', '1', '--skip-backend', '--baseline', {str(baseline)!r}];"
+        "sys.exit(benchmark.main())"
+    )
+    result = subprocess.run([sys.executable, "-c", script], cwd=tmp_path, capture_output=True, text=True,
+                            env={**os.environ, "PYTHONPATH": ROOT, "VIGILANCE_METRICS_PORT": "0", "VIGILANCE_STORAGE": "csv"})
+    assert result.returncode == 1, result.stderr[-2000:]
+    assert "[tiny] load_data.cold" in result.stdout and "feed.page.warm" not in result.stdout.split("REGRESSION")[1]
+
+    [report] = [name for name in os.listdir(tmp_path / "results") if name.endswith(".json")]
+    with open(tmp_path / "results" / report) as f: ops = json.load(f)["results"]["tiny"]
+    assert {"load_data.cold", "load_data.incremental", "copilot.social_stats.warm", "feed.page.incremental",
+            "dashboard.views.incremental"} <= set(ops)
+    assert all(seconds > 0 for seconds in ops.values())
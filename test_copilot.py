@@ -0,0 +1,94 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import fetch_fda
+import metrics
+import utils
+
+# Local stand-in for the OpenAI chat completions endpoint (no network, no key)
+STUB_TOKENS = ["Clinical ", "Insight: ", "hair ", "shedding ", "reported."]
+STUB_REQUESTS = []
+
+
+class StubLLM(BaseHTTPRequestHandler):
+    def log_message(self, *args): pass
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        STUB_REQUESTS.append(body)
+        if not body.get("stream"):
+            payload = json.dumps({
+                "id": "stub", "object": "chat.completion", "created": 0, "model": body["model"],
+                "choices": [{"index": 0, "finish_reason": "stop",
+                             "message": {"role": "assistant", "content": "".join(STUB_TOKENS)}}],
+            }).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.end_headers()
+        for token in STUB_TOKENS:
+            chunk = {"id": "stub", "object": "chat.completion.chunk", "created": 0, "model": body["model"],
+                     "choices": [{"index": 0, "delta": {"content": token}, "finish_reason": None}]}
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+            self.wfile.flush()
+            time.sleep(0.2) # Slow generation: the first token must not wait for the last
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+
+
+@pytest.fixture(scope="module")
+def stub_llm():
+    """Base URL of a StubLLM server running for this module's tests"""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubLLM)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_port}/v1"
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture(autouse=True)
+def copilot_env(stub_llm, monkeypatch):
+    """OpenAI clients point at the stub; FDA labels only come from the local store"""
+    monkeypatch.setenv("OPENAI_BASE_URL", stub_llm)
+    monkeypatch.setenv("OPENAI_API_KEY", "stub-key")
+    monkeypatch.setattr(fetch_fda, "OFFLINE", True)
+    STUB_REQUESTS.clear()
+
+
+def test_stream_copilot_streams_tokens():
+    start = time.time()
+    stream = utils.stream_copilot("Side effects of Wegovy for women under 30")
+    first = next(stream)
+    time_to_first_token = time.time() - start
+    rest = list(stream)
+
+    assert [first] + rest == STUB_TOKENS
+    assert time_to_first_token < 1.0, time_to_first_token
+    assert len(STUB_REQUESTS) == 1 and STUB_REQUESTS[0]["stream"] is True
+    assert "LIVE OBSERVATIONAL DATA" in STUB_REQUESTS[0]["messages"][0]["content"]
+
+
+def test_repeated_question_is_served_from_cache():
+    question = "Is Rinvoq safe for men over 50?"
+    first = "".join(utils.stream_copilot(question))
+    again = "".join(utils.stream_copilot("is rinvoq safe for men, over 50"))
+    assert first == again == "".join(STUB_TOKENS)
+    assert len(STUB_REQUESTS) == 1
+
+
+def test_query_copilot_blocking_variant():
+    assert utils.query_copilot("What about Skyrizi?") == "".join(STUB_TOKENS)
+    assert STUB_REQUESTS[0].get("stream") in (None, False)
+    stages = metrics.Snapshotter().snapshot()["stages"]
+    assert {"stage_seconds{stage=copilot.filter}", "stage_seconds{stage=copilot.format}"} <= set(stages)
+
@@ -0,0 +1,52 @@
+import copilot_cache
+
+INTENT = {"drug": "Wegovy", "gender": "Female", "age": "<30"}
+BASED_ON = copilot_cache.fingerprint((200, 3.4, {"Hair Shedding": 40, "Nausea": 30, "Fatigue": 10, "None": 99}))
+
+
+def test_equivalent_questions_share_a_key():
+    key = copilot_cache.ResponseCache.key(INTENT, "What are the side effects of Wegovy?")
+    assert copilot_cache.ResponseCache.key(INTENT, "wegovy side effects") == key
+    assert copilot_cache.ResponseCache.key({**INTENT, "age": ">50"}, "wegovy side effects") != key
+
+
+def test_fingerprint_ignores_noise_and_catches_material_changes():
+    assert BASED_ON == (200, 3.4, ("Fatigue", "Hair Shedding", "Nausea"))
+    cache = copilot_cache.ResponseCache()
+    key = cache.key(INTENT, "side effects")
+    cache.put(key, BASED_ON, "answer")
+
+    # A few more posts, same top symptoms: still the same answer
+    grown = copilot_cache.fingerprint((215, 3.5, {"Hair Shedding": 44, "Nausea": 31, "Fatigue": 11}))
+    assert cache.get(key, grown) == "answer"
+
+    # The top symptoms changed: the entry is dropped
+    shifted = copilot_cache.fingerprint((215, 3.5, {"Hair Shedding": 44, "Nausea": 31, "Muscle Loss": 20}))
+    assert cache.get(key, shifted) is None
+    assert cache.get(key, BASED_ON) is None and cache.stats()["invalidations"] == 1
+
+    # So do a >10% larger slice and a moved average rating
+    for changed in ((230, 3.4, BASED_ON[2]), (200, 4.1, BASED_ON[2])):
+        cache.put(key, BASED_ON, "answer")
+        assert cache.get(key, changed) is None
+    assert cache.stats()["invalidations"] == 3
+
+
+def test_size_bound_evicts_least_recently_used():
+    cache = copilot_cache.ResponseCache(max_entries=3)
+    keys = [cache.key(INTENT, f"question {i}") for i in range(5)]
+    for i, key in enumerate(keys[:3]): cache.put(key, BASED_ON, f"answer {i}")
+    assert cache.get(keys[0], BASED_ON) == "answer 0"  # now the most recently used
+
+    for i, key in enumerate(keys[3:], start=3): cache.put(key, BASED_ON, f"answer {i}")
+    stats = cache.stats()
+    assert stats["size"] == 3 and stats["evictions"] == 2
+    assert [cache.get(key, BASED_ON) for key in keys] == ["answer 0", None, None, "answer 3", "answer 4"]
+
+
+def test_entries_expire_after_ttl():
+    cache = copilot_cache.ResponseCache(ttl=-1)
+    key = cache.key(INTENT, "side effects")
+    cache.put(key, BASED_ON, "answer")
+    assert cache.get(key, BASED_ON) is None
+    assert cache.stats()["size"] == 0 and cache.stats()["evictions"] == 1
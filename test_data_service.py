@@ -0,0 +1,103 @@
+import shutil
+import threading
+import pandas as pd
+import pytest
+
+import stream_loader
+import stream_store
+import data_service
+
+
+@pytest.fixture
+def streams(tmp_path, monkeypatch):
+    """Copies of the sample streams under tmp_path, so tests can append to them"""
+    files = {}
+    for stream, path in stream_store.CSV_FILES.items():
+        files[stream] = str(tmp_path / f"{stream}.csv")
+        shutil.copy(path, files[stream])
+        monkeypatch.setitem(stream_store.CSV_FILES, stream, files[stream])
+    return files
+
+
+@pytest.fixture
+def service(streams, tmp_path):
+    """(local hub, remote hub) over the same streams, the remote one through a served hub"""
+    loader = lambda: stream_loader.StreamLoader(files=streams, mode="csv")
+    local = data_service.DataHub(loader(), str(tmp_path / "local.db"))
+    server = data_service.serve(data_service.DataHub(loader(), str(tmp_path / "served.db")), port=0)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield local, data_service.RemoteHub(f"http://127.0.0.1:{server.server_address[1]}")
+    server.shutdown()
+
+
+def test_pack_roundtrip():
+    frame = pd.DataFrame({"drug_name": ["Wegovy", "Rinvoq"], "rating": [3, 9],
+                          "ts": pd.to_datetime(["2026-01-01", "2026-01-02"])}, index=[7, 3])
+    values, tables = data_service.unpack(data_service.pack({"total": 2, "cursor": [1, 5]}, {"rows": frame}))
+    assert values == {"total": 2, "cursor": [1, 5]}
+    pd.testing.assert_frame_equal(tables["rows"], frame)
+
+
+def test_remote_matches_local(service):
+    local, remote = service
+    columns = ["timestamp", "drug_name", "rating"]
+    pd.testing.assert_frame_equal(remote.slice("social", columns, ["Wegovy"]),
+                                  local.slice("social", columns, ["Wegovy"]), check_dtype=False)
+
+    mine, theirs = local.dashboard(), remote.dashboard()
+    assert mine["kpis"]["posts"] == theirs["kpis"]["posts"]
+    pd.testing.assert_frame_equal(mine["symptom_counts"], theirs["symptom_counts"])
+
+    parents, threads, cursor, total = remote.feed_page("All Sources", page_size=5)
+    expected = local.feed_page("All Sources", page_size=5)
+    assert list(parents["post_id"]) == list(expected[0]["post_id"]) and total == expected[3]
+    assert cursor == expected[2] and set(threads) == set(expected[1])
+    assert all(len(threads[pid]) == len(expected[1][pid]) for pid in threads)
+
+    drug = local.scorecards().drug_list()[0]
+    assert remote.scorecards().drug_list() == local.scorecards().drug_list()
+    assert remote.scorecards().card(drug)["score"] == local.scorecards().card(drug)["score"]
+    assert remote.scorecards().card("NoSuchDrug") is None
+    assert remote.cube().query(drug)[0] == local.cube().query(drug)[0]
+
+
+def test_remote_load_fetches_only_new_rows(service, streams, monkeypatch):
+    local, remote = service
+    fetched = []
+    get = remote._get
+    def counting_get(path, **params):
+        values, tables = get(path, **params)
+        if path == "/since": fetched.append(len(tables["rows"]))
+        return values, tables
+    monkeypatch.setattr(remote, "_get", counting_get)
+
+    first = remote.load()
+    assert sum(fetched) == sum(len(df) for df in local.load().values())
+
+    rx = pd.read_csv(streams["rx"], dtype=str, keep_default_na=False)
+    rx.tail(3).to_csv(streams["rx"], mode="a", header=False, index=False)
+    fetched.clear()
+    second = remote.load()
+    assert fetched.count(3) == 1 and sum(fetched) == 3
+    assert len(second["rx"]) == len(first["rx"]) + 3
+    pd.testing.assert_frame_equal(second["social"], local.load()["social"], check_dtype=False)
+
+    # A rewritten stream is sent again from scratch
+    rx.head(5).to_csv(streams["rx"], index=False)
+    assert len(remote.load()["rx"]) == 5
+
+
+def test_remote_load_keeps_only_the_newest_rows(service, streams):
+    local, remote = service
+    capped = data_service.RemoteHub(remote.url, max_rows=50)
+    assert capped.readers is None
+
+    frames = capped.load()
+    for stream, frame in local.load().items():
+        assert len(frames[stream]) == min(len(frame), 50)
+        assert list(frames[stream].index) == list(frame.index[-50:])
+
+    rx = pd.read_csv(streams["rx"], dtype=str, keep_default_na=False)
+    rx.head(30).to_csv(streams["rx"], mode="a", header=False, index=False)
+    expected = local.load()["rx"].tail(50)
+    pd.testing.assert_frame_equal(capped.load()["rx"], expected, check_dtype=False)
@@ -0,0 +1,50 @@
+import random
+import pandas as pd
+
+import dedup
+import stream_store
+
+POSTS = [
+    ("p1", "2026-01-05T10:00:01", "Wegovy", "@anna Same here!"),
+    ("p2", "2026-01-05T10:00:02", "Wegovy", "@bob same here"),
+    ("p3", "2026-01-05T10:00:03", "Wegovy", "Hair shedding after week 4"),
+    ("p4", "2026-01-05T10:00:04", "Mounjaro", "@carl Same here!"),
+    ("p5", "2026-01-05T10:00:05", "Wegovy", "hair shedding after week 12"),
+]
+
+
+def test_ordered_batches_resolve_the_same_canonicals():
+    ids, stamps, drugs, texts = map(list, zip(*POSTS))
+    expected = dedup.NearDupIndex().add_many(ids, texts, drugs, order=stamps)
+    assert expected == ["p1", "p1", "p3", "p4", "p3"]
+
+    shuffled = list(range(len(POSTS)))
+    random.Random(3).shuffle(shuffled)
+    pick = lambda values: [values[i] for i in shuffled]
+    canonical = dedup.NearDupIndex().add_many(pick(ids), pick(texts), pick(drugs), order=pick(stamps))
+    assert canonical == pick(expected)
+
+
+def test_resumed_backend_rebuilds_the_index(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    import backend
+
+    path = tmp_path / "social_stream.csv"
+    rows = pd.DataFrame([dict.fromkeys(stream_store.SCHEMAS["social"], "") for _ in POSTS])
+    rows[["post_id", "timestamp", "drug_name", "text"]] = POSTS
+    rows.to_csv(path, index=False)
+    tail = stream_store.SegmentTail(str(path))
+    tail.read_new()
+
+    # Operator snapshots restored canonical_post's results, not the index
+    monkeypatch.setenv("PATHWAY_LICENSE_KEY", "test")
+    monkeypatch.setattr(backend, "NEAR_DUPS", dedup.NearDupIndex())
+    backend.rebuild_near_dups(tail)
+    assert backend.NEAR_DUPS.add("p6", "@dan SAME HERE", "Wegovy") == "p1"
+    assert backend.NEAR_DUPS.add("p7", "Hair shedding after week 30", "Wegovy") == "p3"
+
+    # Input replay runs the persisted posts through canonical_post itself
+    monkeypatch.delenv("PATHWAY_LICENSE_KEY")
+    monkeypatch.setattr(backend, "NEAR_DUPS", dedup.NearDupIndex())
+    backend.rebuild_near_dups(tail)
+    assert backend.NEAR_DUPS.stats()["posts"] == 0
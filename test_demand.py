@@ -0,0 +1,68 @@
+import numpy as np
+import pandas as pd
+
+import demand
+
+
+class FrameReader:
+    """Stands in for a stream_loader reader over a growing DataFrame"""
+
+    def __init__(self, frame):
+        self.frame = frame
+
+    def since(self, cursor):
+        start = cursor[1] if cursor else 0
+        return self.frame.iloc[start:], (1, len(self.frame)), cursor is None
+
+
+def sales_frame(n, seed=0, span=7200):
+    rng = np.random.default_rng(seed)
+    times = pd.Timestamp("2026-01-01") + pd.to_timedelta(np.sort(rng.uniform(0, span, n)), unit="s")
+    return pd.DataFrame({
+        "timestamp": times.strftime("%Y-%m-%dT%H:%M:%S.%f"),
+        "drug_name": rng.choice(["Wegovy", "Rinvoq", "Skyrizi"], n),
+        "pharmacy_id": [f"PH-{i}" for i in rng.integers(0, 40, n)],
+        "quantity_sold": rng.integers(1, 4, n),
+    })
+
+
+def test_rates_match_recompute():
+    rng = np.random.default_rng(1)
+    times = np.sort(rng.uniform(0, 7200, 20000))
+    keys = rng.choice(["a", "b", "c"], len(times)).astype(object)
+    values = rng.integers(1, 5, len(times)).astype(float)
+
+    tracker = demand.RateTracker(half_life=600, window=3600)
+    for batch in np.array_split(np.arange(len(times)), 13):
+        tracker.add(keys[batch], times[batch], values[batch])
+
+    live = times // 60 * 60 > times.max() - 3600
+    for key in ("a", "b", "c"):
+        mine = keys == key
+        pos = tracker.index[key]
+        assert np.isclose(tracker.rolling[pos], values[mine & live].sum())
+        expected = (values[mine] * 2 ** ((times[mine] - times.max()) / 600)).sum()
+        assert np.isclose(tracker.decayed[pos], expected)
+
+
+def test_stock_projection_survives_restart(tmp_path):
+    path = str(tmp_path / "inventory.db")
+    sales = sales_frame(3000)
+    social = pd.DataFrame(columns=["timestamp", "drug_name"])
+    engine = demand.DemandEngine(path=path)
+    engine.sync(FrameReader(sales), FrameReader(social))
+
+    sold = sales.groupby(["pharmacy_id", "drug_name"])["quantity_sold"].sum()
+    stock = engine.pharmacies().set_index(["pharmacy_id", "drug_name"])["stock"]
+    np.testing.assert_allclose(stock.loc[sold.index], np.maximum(demand.DEFAULT_STOCK - sold.values, 0))
+
+    pharmacy, drug = sold.index[0]
+    engine.restock(pharmacy, drug, 500)
+    before = engine.pharmacies().set_index(["pharmacy_id", "drug_name"])["stock"]
+
+    # A restarted engine replays the same history against the persisted inventory
+    restarted = demand.DemandEngine(path=path)
+    restarted.sync(FrameReader(sales), FrameReader(social))
+    after = restarted.pharmacies().set_index(["pharmacy_id", "drug_name"])["stock"]
+    pd.testing.assert_series_equal(before.sort_index(), after.sort_index())
+    assert after.loc[(pharmacy, drug)] == max(demand.DEFAULT_STOCK - sold.iloc[0], 0) + 500
@@ -0,0 +1,68 @@
+import os
+import numpy as np
+import pytest
+
+import embedding
+
+
+class CountingModel(embedding.HashingModel):
+    def __init__(self, dimensions=64):
+        super().__init__(dimensions)
+        self.encoded = []
+
+    def encode(self, texts):
+        self.encoded.append(list(texts))
+        return super().encode(texts)
+
+
+def test_batches_encode_each_distinct_text_once():
+    embedder = embedding.LocalEmbedder(dimensions=64)
+    model = embedder.model = CountingModel()
+    texts = ["Hair shedding on Wegovy", "Nausea after Mounjaro", "Hair shedding on Wegovy", ""]
+    vectors = embedder.embed(texts)
+    assert model.encoded == [["Hair shedding on Wegovy", "Nausea after Mounjaro", "."]]
+    np.testing.assert_array_equal(vectors[0], vectors[2])
+    assert np.allclose([np.linalg.norm(v) for v in vectors[:3]], 1.0)
+
+    again = embedder.embed(["Nausea after Mounjaro", "hair shedding after week 4"])
+    assert model.encoded[1:] == [["hair shedding after week 4"]]
+    np.testing.assert_array_equal(again[0], vectors[1])
+    # Shared words land on shared features: related posts are closer than unrelated ones
+    assert again[1] @ vectors[0] > again[1] @ vectors[1]
+    assert embedder.cache.stats()["hits"] == 1
+
+
+def test_cache_is_bounded_and_survives_a_torn_file(tmp_path):
+    path = str(tmp_path / "embeddings.bin")
+    cache = embedding.EmbeddingCache(max_entries=3, path=path)
+    vectors = [(embedding.content_key(f"text {i}"), np.full(4, i, dtype=np.float32)) for i in range(5)]
+    cache.put_many(vectors)
+    assert cache.stats()["size"] == 3 and not cache.get_many([vectors[0][0]])
+
+    with open(path, "ab") as f: f.write(embedding.RECORD_HEADER.pack(b"x" * 16, 4) + b"\0" * 6)  # crashed mid-record
+    restarted = embedding.EmbeddingCache(max_entries=3, path=path)
+    assert list(restarted.entries) == [key for key, _ in vectors[2:]]
+    assert os.path.getsize(path) == 3 * (embedding.RECORD_HEADER.size + 16)  # evicted and torn records dropped
+
+
+@pytest.mark.parametrize("torn", [embedding.RECORD_HEADER.pack(b"x" * 16, 4) + b"\0" * 6, b"\1" * 7],
+                         ids=["mid-body", "mid-header"])
+def test_torn_tail_is_dropped_before_new_records_are_appended(tmp_path, torn):
+    path = str(tmp_path / "embeddings.bin")
+    vectors = [(embedding.content_key(f"text {i}"), np.full(4, i, dtype=np.float32)) for i in range(4)]
+    embedding.EmbeddingCache(path=path).put_many(vectors[:2])
+    with open(path, "ab") as f: f.write(torn)
+
+    restarted = embedding.EmbeddingCache(path=path)  # nothing evicted, only the torn tail to drop
+    assert list(restarted.entries) == [key for key, _ in vectors[:2]]
+    restarted.put_many(vectors[2:])
+    reloaded = embedding.EmbeddingCache(path=path)
+    assert list(reloaded.entries) == [key for key, _ in vectors]
+    for key, vector in vectors: np.testing.assert_array_equal(reloaded.entries[key], vector)
+
+
+def test_local_embedder_cache_file_is_per_model(tmp_path):
+    embedder, dimensions = embedding.make_embedder("local", cache_dir=str(tmp_path))
+    assert dimensions == embedding.EMBED_DIM
+    embedder.embed(["Acne on Rinvoq"])
+    assert os.listdir(tmp_path) == [f"embeddings-hashing-{embedding.EMBED_DIM}.bin"]
@@ -0,0 +1,130 @@
+import json
+import time
+import threading
+from collections import OrderedDict
+
+import pytest
+
+import fetch_fda
+
+
+class FakeFDA:
+    """fetch_drug_label stand-in: a new label version per call, None for unknown drugs"""
+
+    def __init__(self, known=("Wegovy",), delay=0.0):
+        self.known = set(known)
+        self.delay = delay
+        self.calls = []
+        self.lock = threading.Lock()
+
+    def __call__(self, drug_name):
+        with self.lock: self.calls.append(drug_name)
+        time.sleep(self.delay)
+        if drug_name not in self.known: return None
+        return {"brand_name": drug_name, "set_id": f"set-{drug_name}", "version": str(len(self.calls))}
+
+
+@pytest.fixture
+def fda(tmp_path, monkeypatch):
+    """A fresh label cache over an empty store under tmp_path, fetching from a FakeFDA"""
+    fake = FakeFDA()
+    monkeypatch.setattr(fetch_fda, "OUTPUT_FILE", str(tmp_path / "fda_context.json"))
+    monkeypatch.setattr(fetch_fda, "_cache", OrderedDict())
+    monkeypatch.setattr(fetch_fda, "_inflight", {})
+    monkeypatch.setattr(fetch_fda, "_stored", set())
+    monkeypatch.setattr(fetch_fda, "_store_mtime", None)
+    monkeypatch.setattr(fetch_fda, "OFFLINE", False)
+    monkeypatch.setattr(fetch_fda, "fetch_drug_label", fake)
+    return fake
+
+
+def settle():
+    """Waits for background refreshes to finish"""
+    for event in list(fetch_fda._inflight.values()): event.wait(5)
+
+
+def test_stale_label_is_served_then_refreshed(fda, monkeypatch):
+    assert fetch_fda.get_drug_label("Wegovy")["version"] == "1"
+    assert fetch_fda.get_drug_label("wegovy ")["version"] == "1" and len(fda.calls) == 1
+
+    monkeypatch.setattr(fetch_fda, "CACHE_TTL", 0)
+    time.sleep(0.01)
+    assert fetch_fda.get_drug_label("Wegovy")["version"] == "1"  # stale, served without waiting
+    settle()
+    assert len(fda.calls) == 2 and fetch_fda.get_drug_label("Wegovy", offline=True)["version"] == "2"
+    with open(fetch_fda.OUTPUT_FILE) as f:
+        assert json.load(f)["Wegovy"]["version"] == "2"
+
+
+def test_misses_are_cached_for_the_negative_ttl(fda, monkeypatch):
+    assert fetch_fda.get_drug_label("NoSuchDrug") is None
+    assert fetch_fda.get_drug_label("NoSuchDrug") is None
+    assert fda.calls == ["NoSuchDrug"]
+
+    monkeypatch.setattr(fetch_fda, "NEGATIVE_TTL", 0)
+    time.sleep(0.01)
+    assert fetch_fda.get_drug_label("NoSuchDrug") is None
+    settle()
+    assert fda.calls == ["NoSuchDrug"] * 2
+
+
+def test_offline_reads_cache_and_store_only(fda, monkeypatch):
+    assert fetch_fda.get_drug_label("Wegovy", offline=True) is None
+    assert fetch_fda.get_drug_label("Wegovy")["version"] == "1"
+
+    # A new process: nothing in memory, the label is on disk
+    monkeypatch.setattr(fetch_fda, "_cache", OrderedDict())
+    monkeypatch.setattr(fetch_fda, "_store_mtime", None)
+    monkeypatch.setattr(fetch_fda, "OFFLINE", True)
+    monkeypatch.setattr(fetch_fda, "CACHE_TTL", 0)
+    assert fetch_fda.get_drug_label("Wegovy")["version"] == "1"  # stale, but never refreshed offline
+    assert fetch_fda.get_drug_label("NoSuchDrug") is None
+    assert fda.calls == ["Wegovy"] and not fetch_fda._inflight
+
+
+def test_concurrent_callers_wait_for_one_fetch(fda):
+    fda.delay = 0.2
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(fetch_fda.get_drug_label("Wegovy"))) for _ in range(8)]
+    for t in threads: t.start()
+    for t in threads: t.join()
+    assert fda.calls == ["Wegovy"]
+    assert [label["version"] for label in results] == ["1"] * 8
+
+
+def test_slow_miss_does_not_block_the_caller(fda, monkeypatch):
+    fda.delay = 0.5
+    monkeypatch.setattr(fetch_fda, "MISS_WAIT_SECS", 0.05)
+    start = time.time()
+    assert fetch_fda.get_drug_label("Wegovy") is None  # gave up waiting, the fetch goes on
+    assert fetch_fda.get_drug_label("Wegovy") is None and time.time() - start < 0.4
+    settle()
+    assert fetch_fda.get_drug_label("Wegovy")["version"] == "1" and fda.calls == ["Wegovy"]
+
+
+def test_store_load_is_bounded_by_the_lru(fda, monkeypatch):
+    monkeypatch.setattr(fetch_fda, "CACHE_SIZE", 8)
+    now = time.time()
+    store = {f"Drug{i:02d}": {"set_id": f"set-{i}", "version": "1", "_fetched_at": now - 100 + i} for i in range(20)}
+    with open(fetch_fda.OUTPUT_FILE, "w") as f: json.dump(store, f)
+
+    assert fetch_fda.get_drug_label("Drug19", offline=True)["set_id"] == "set-19"
+    assert len(fetch_fda._cache) == 8
+    assert "drug19" in fetch_fda._cache and "drug00" not in fetch_fda._cache  # the newest labels are loaded
+    # Labels left out (or evicted) are still read from the store
+    assert fetch_fda.get_drug_label("Drug00", offline=True)["set_id"] == "set-0"
+    assert len(fetch_fda._cache) == 8 and fda.calls == []
+
+
+def test_non_label_store_values_are_skipped(fda):
+    with open(fetch_fda.OUTPUT_FILE, "w") as f:
+        json.dump({"Broken": None, "Junk": "not a label", "Rinvoq": {"set_id": "set-r", "version": "1"}}, f)
+    assert fetch_fda.get_drug_label("Rinvoq", offline=True)["set_id"] == "set-r"
+    assert fetch_fda.get_drug_label("Junk", offline=True) is None
+    fetch_fda._cache.clear()
+    assert fetch_fda.get_drug_label("Broken", offline=True) is None
+
+    # A fetched label replaces the junk value
+    fda.known.add("Junk")
+    assert fetch_fda.get_drug_label("Junk")["set_id"] == "set-Junk"
+    with open(fetch_fda.OUTPUT_FILE) as f: assert json.load(f)["Junk"]["set_id"] == "set-Junk"
@@ -0,0 +1,125 @@
+import json
+import time
+import threading
+from collections import OrderedDict
+from urllib.parse import urlparse, parse_qs
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+import pytest
+
+import fetch_fda
+
+
+class StubFDA(BaseHTTPRequestHandler):
+    """Local stand-in for api.fda.gov/drug/label.json"""
+    labels = {}     # search term -> label result
+    failures = {}   # search term -> [status, ...] answered before the label
+    version = "1"
+    requests = 0
+    in_flight = 0
+    max_in_flight = 0
+    lock = threading.Lock()
+
+    def do_GET(self):
+        cls = type(self)
+        with cls.lock:
+            cls.requests += 1
+            cls.in_flight += 1
+            cls.max_in_flight = max(cls.max_in_flight, cls.in_flight)
+        try:
+            time.sleep(0.02)
+            search = parse_qs(urlparse(self.path).query)["search"][0]
+            term = search.split(":", 1)[1].split(" OR ")[0].strip('"')
+            with cls.lock:
+                queued = cls.failures.get(term)
+                status = queued.pop(0) if queued else None
+            if status:
+                self.send_response(status)
+                if status == 429: self.send_header("Retry-After", "0")
+                self.end_headers()
+                return
+            if term not in cls.labels:
+                self.send_response(404)
+                self.end_headers()
+                return
+            body = json.dumps({"results": [{**cls.labels[term], "version": cls.version}]}).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        finally:
+            with cls.lock: cls.in_flight -= 1
+
+    def log_message(self, *args):
+        pass
+
+
+def label(term):
+    return {
+        "set_id": f"set-{term}", "effective_time": "20260101",
+        "openfda": {"brand_name": [term.title()], "substance_name": [term.upper()]},
+        "boxed_warning": [f"WARNING: {term} boxed warning"],
+        "warnings": [f"{term} warnings"],
+        "adverse_reactions": [f"{term} causes nausea", "and headache"],
+        "adverse_reactions_table": ["<table></table>"],
+        "indications_and_usage": [f"{term} indications"],
+    }
+
+
+@pytest.fixture
+def stub_fda(tmp_path, monkeypatch):
+    """StubFDA on a local port serving drug000..drug059 and semaglutide; labels stored under tmp_path"""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubFDA)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    monkeypatch.setattr(fetch_fda, "OUTPUT_FILE", str(tmp_path / "fda_context.json"))
+    monkeypatch.setattr(fetch_fda, "FDA_URL", f"http://127.0.0.1:{server.server_address[1]}/drug/label.json")
+    monkeypatch.setattr(fetch_fda, "BACKOFF_SECS", 0.01)
+    monkeypatch.setattr(fetch_fda, "OFFLINE", False)
+    monkeypatch.setattr(fetch_fda, "_cache", OrderedDict())
+    monkeypatch.setattr(fetch_fda, "_stored", set())
+    monkeypatch.setattr(fetch_fda, "_store_mtime", None)
+    labels = {term: label(term) for term in [f"drug{i:03d}" for i in range(60)] + ["semaglutide"]}
+    for name, value in {"labels": labels, "failures": {}, "version": "1", "requests": 0, "max_in_flight": 0}.items():
+        monkeypatch.setattr(StubFDA, name, value)
+    yield StubFDA
+    server.shutdown()
+
+
+def test_prefetch_concurrent_with_retries(stub_fda):
+    stub_fda.failures = {"drug001": [503, 503], "drug002": [429], "drug003": [500] * 10}
+    drugs = ["Wegovy"] + [f"drug{i:03d}" for i in range(60)] + ["nosuchdrug"]
+    report = fetch_fda.prefetch(drugs, workers=6, rate=0)
+
+    assert report["Wegovy"] == "new" and report["drug001"] == "new" and report["drug002"] == "new"
+    assert report["nosuchdrug"] == "missing"
+    assert report["drug003"].startswith("error") and "HTTP 500" in report["drug003"]
+    assert 1 < stub_fda.max_in_flight <= 6
+
+    with open(fetch_fda.OUTPUT_FILE) as f: store = json.load(f)
+    assert len(store) == 60 and "drug003" not in store
+    wegovy = store["Wegovy"]
+    assert wegovy["adverse_reactions"] == "semaglutide causes nausea"
+    assert wegovy["sections"]["adverse_reactions"] == "semaglutide causes nausea\nand headache"
+    assert "boxed_warning" in wegovy["sections"] and "adverse_reactions_table" not in wegovy["sections"]
+    assert (wegovy["set_id"], wegovy["version"]) == ("set-semaglutide", "1")
+    assert fetch_fda.get_drug_label("Wegovy", offline=True)["version"] == "1"
+
+
+def test_store_is_incremental_and_versioned(stub_fda):
+    drugs = [f"drug{i:03d}" for i in range(10)]
+    assert set(fetch_fda.prefetch(drugs, rate=0).values()) == {"new"}
+
+    before = stub_fda.requests
+    assert set(fetch_fda.prefetch(drugs, rate=0).values()) == {"fresh"}
+    assert stub_fda.requests == before  # fresh labels are not refetched
+
+    assert set(fetch_fda.prefetch(drugs[:5], rate=0, force=True).values()) == {"unchanged"}
+    stub_fda.version = "2"
+    assert set(fetch_fda.prefetch(drugs[:5], rate=0, force=True).values()) == {"updated"}
+
+    with open(fetch_fda.OUTPUT_FILE) as f: store = json.load(f)
+    assert len(store) == 10
+    assert store["drug000"]["version"] == "2" and store["drug009"]["version"] == "1"
+    assert [h["version"] for h in store["drug000"]["_history"]] == ["1"]
+
@@ -0,0 +1,94 @@
+import shutil
+import numpy as np
+import pandas as pd
+import pytest
+
+import stream_loader
+import stream_store
+import live_views
+import symptoms
+
+
+def empty_reader(tmp_path, stream):
+    path = tmp_path / f"{stream}.csv"
+    path.write_text(",".join(stream_store.SCHEMAS[stream]) + "\n")  # header only
+    reader = stream_loader.TailReader(str(path), stream=stream)
+    reader.refresh()
+    return reader
+
+
+def test_dashboard_snapshot_of_empty_store(tmp_path):
+    views = live_views.DashboardViews()
+    views.sync(empty_reader(tmp_path, "social"), empty_reader(tmp_path, "rx"))
+    snapshot = views.snapshot()
+    assert snapshot["kpis"]["posts"] == 0 and snapshot["kpis"]["prescriptions"] == 0
+    assert snapshot["sentiment"].empty and "time_short" in snapshot["sentiment"]
+    assert snapshot["ae_trend"].empty and snapshot["rx_share"].empty
+
+
+@pytest.fixture
+def social_reader(stream_file):
+    """TailReader over a copy of the sample social stream"""
+    path = stream_file("social")
+    shutil.copy("data/social_stream.csv", path)
+    reader = stream_loader.TailReader(path, stream_loader.ENRICHERS["social"], "social")
+    reader.refresh()
+    return reader
+
+
+def test_feed_pages_cover_every_thread_once(social_reader):
+    index = live_views.FeedIndex()
+    index.sync(social_reader)
+    frame = social_reader.frame()
+    roots = frame[frame["is_launch"]]
+
+    for name, allowed in live_views.FEED_FILTERS.items():
+        pages, cursor = [], None
+        while True:
+            page, cursor = index.page(name, cursor, size=37)
+            pages += page
+            if cursor is None: break
+        expected = roots if allowed is None else roots[roots["source"].isin(allowed)]
+        assert pages == list(expected.index[::-1])  # newest first, no gaps or repeats
+        assert index.total(name) == (len(frame) if allowed is None else frame["source"].isin(allowed).sum())
+
+    replies = frame[~frame["is_launch"]].groupby(frame["parent_id"].astype(str))
+    for parent_id in roots["post_id"].head(20):
+        expected = list(replies.get_group(parent_id).index) if parent_id in replies.groups else []
+        assert index.children_of(parent_id) == expected
+
+
+def test_feed_cursor_is_stable_while_posts_arrive(social_reader):
+    index = live_views.FeedIndex()
+    index.sync(social_reader)
+    first, cursor = index.page("All Sources", size=10)
+    second, _ = index.page("All Sources", cursor, size=10)
+
+    with open(social_reader.path, "a") as f:
+        f.write("zz000001,,2026-01-06T00:00:00,Wegovy,Reddit,new_user,Patient,Hair shedding again,3,0,0,True,None,Springfield,41,Female\n")
+    social_reader.refresh()
+    index.sync(social_reader)
+    assert index.page("All Sources", size=1)[0] == [social_reader.rows - 1]  # the new root is on top
+    assert index.page("All Sources", cursor, size=10)[0] == second
+
+
+def test_cube_matches_brute_force_slices(social_reader):
+    cube = live_views.DemographicCube()
+    cube.sync(social_reader)
+    frame = social_reader.frame()
+    dims = pd.DataFrame({
+        "drug": frame["drug_name"].astype(str), "gender": frame["patient_gender"].astype(str),
+        "age": symptoms.age_bucket(frame["patient_age"]), "source": frame["source"].astype(str),
+        "symptom": symptoms.post_symptoms(frame), "rating": frame["rating"].astype(float),
+    })
+    for query in ({}, {"drug": "Wegovy"}, {"drug": "Wegovy", "gender": "Female", "age": "<30"},
+                  {"age": ">50", "source": "Reddit"}, {"drug": "NoSuchDrug"}):
+        mask = pd.Series(True, index=dims.index)
+        for dim, value in query.items(): mask &= dims[dim] == value
+        posts, avg_rating, counts = cube.query(**query)
+        assert posts == mask.sum()
+        if posts:
+            assert np.isclose(avg_rating, dims.loc[mask, "rating"].mean())
+            assert counts == dims.loc[mask, "symptom"].value_counts().to_dict()
+        else:
+            assert np.isnan(avg_rating) and counts == {}
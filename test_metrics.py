@@ -0,0 +1,36 @@
+import urllib.request
+import numpy as np
+
+import metrics
+
+
+def test_quantiles_from_buckets():
+    hist = metrics.Histogram()
+    samples = np.random.default_rng(0).lognormal(mean=-4, sigma=1, size=20000)
+    for value in samples: hist.observe(value)
+    for q in metrics.QUANTILES:
+        estimate, exact = metrics.quantile(hist.counts, q), np.quantile(samples, q)
+        # Doubling buckets: the estimate stays inside the bucket of the exact value
+        assert exact / 2 <= estimate <= exact * 2, (q, estimate, exact)
+
+
+def test_prometheus_endpoint_and_snapshot():
+    with metrics.span("test.stage"): sum(range(1000))
+    metrics.count("test_rows", 5, stream="social")
+    server = metrics.serve(0)  # any free port
+    try:
+        text = urllib.request.urlopen(f"http://127.0.0.1:{server.server_address[1]}/metrics").read().decode()
+    finally:
+        server.shutdown()
+    assert '# TYPE vigilance_stage_seconds histogram' in text
+    assert 'vigilance_stage_seconds_bucket{stage="test.stage",le="+Inf"} 1' in text
+    assert 'vigilance_test_rows_total{stream="social"} 5' in text
+    # Every family has its HELP line
+    assert '# HELP vigilance_stage_seconds Time spent per stage' in text
+    assert '# HELP vigilance_test_rows_total test rows count' in text
+
+    snapshot = metrics.Snapshotter().snapshot()
+    stage = snapshot["stages"]["stage_seconds{stage=test.stage}"]
+    assert stage["count"] == 1 and stage["p50"] is not None
+    assert snapshot["counters"]["test_rows{stream=social}"]["total"] == 5
+
@@ -0,0 +1,54 @@
+import pandas as pd
+
+import signals
+import scorecards
+import stream_loader
+
+
+class MemoryReader(stream_loader.ChunkedReader):
+    """Reader over rows handed to it with _append()"""
+
+    def refresh(self):
+        return 0
+
+
+def social_rows(drugs, start=0):
+    """Patient posts tagged Hair Shedding for Wegovy, plus one critical doctor post per drug"""
+    rows = []
+    for i, drug in enumerate(drugs):
+        symptom = "Hair Shedding" if drug == "Wegovy" else "None"
+        rows.append({"timestamp": f"2026-01-01T00:{(start + i) % 60:02d}:00", "drug_name": drug,
+                     "author_role": "Patient", "rating": 6, "detected_symptom": symptom, "text": "post"})
+    for drug in dict.fromkeys(drugs):
+        rows.append({"timestamp": f"2026-01-01T01:{start % 60:02d}:00", "drug_name": drug,
+                     "author_role": "Doctor", "rating": 3, "detected_symptom": "None", "text": f"alert {start}"})
+    return pd.DataFrame(rows)
+
+
+def test_sync_rebuilds_only_touched_drugs(monkeypatch):
+    reader = MemoryReader("memory")
+    reader._append(social_rows(["Wegovy"] * 10 + ["Rinvoq"] * 30 + ["Skyrizi"] * 30))
+    cards = scorecards.Scorecards(signals.SignalDetector(label_text=lambda drug: ""))
+    cards.sync(reader)
+    assert cards.card("Wegovy")["novel"] == 1 and cards.card("Wegovy")["top_signal"].startswith("Hair Shedding")
+    before = {drug: cards.card(drug) for drug in cards.drug_list()}
+
+    taken = []
+    take = reader.take
+    monkeypatch.setattr(reader, "take", lambda positions: (taken.append(list(positions)), take(positions))[1])
+    reader._append(social_rows(["Wegovy"] * 5, start=40))
+    cards.sync(reader)
+
+    # Only Wegovy's and the ALL card were rebuilt; the others are the same objects
+    assert cards.card("Rinvoq") is before["Rinvoq"] and cards.card("Skyrizi") is before["Skyrizi"]
+    assert cards.card("Wegovy") is not before["Wegovy"] and len(taken) == 2
+    assert cards.card("Wegovy")["critical_posts"]["text"].iloc[0] == "alert 40"
+
+    # And the rebuilt cards match building everything from scratch
+    fresh = scorecards.Scorecards(signals.SignalDetector(label_text=lambda drug: ""))
+    fresh.sync(reader)
+    for drug in (scorecards.ALL, "Wegovy"):
+        mine, theirs = cards.card(drug), fresh.card(drug)
+        assert {k: v for k, v in mine.items() if not isinstance(v, pd.DataFrame)} == \
+               {k: v for k, v in theirs.items() if not isinstance(v, pd.DataFrame)}
+        pd.testing.assert_frame_equal(mine["top_signals"], theirs["top_signals"])
@@ -0,0 +1,101 @@
+import os
+import time
+import contextlib
+import numpy as np
+import pandas as pd
+import pytest
+
+import demand
+import segments
+import stream_loader
+import stream_store
+from test_demand import FrameReader, sales_frame
+
+LATER = time.time() + 2 * segments.HOT_SECS
+
+
+@pytest.fixture
+def sales_segments(stream_file):
+    """3000 sales rows in three segments (two sealed); returns (path, rows)"""
+    path = stream_file("sales")
+    sales = sales_frame(3000, span=4 * 3600).assign(location="Springfield")
+    sink = stream_store.CsvSink("sales", batch_rows=100, rotate=False)
+    sink.init()
+    for i, row in enumerate(sales.itertuples(index=False)):
+        sink.write(list(row))
+        if i in (999, 1999):
+            sink.flush()
+            sink.roll()
+    sink.close()
+    return path, sales
+
+
+def projected_stock(reader, inventory, tmp_path, sales):
+    """(stock from inventory + summaries + hot rows, stock from replaying every row)"""
+    empty = FrameReader(pd.DataFrame(columns=["timestamp", "drug_name"]))
+    engine = demand.DemandEngine(path=inventory)
+    engine.sync(reader, empty)
+    full = demand.DemandEngine(path=str(tmp_path / "full.db"))
+    full.sync(FrameReader(sales), empty)
+    mine = engine.pharmacies().set_index(["pharmacy_id", "drug_name"]).sort_index()
+    expected = full.pharmacies().set_index(["pharmacy_id", "drug_name"]).sort_index()
+    return mine, expected
+
+
+def test_summarized_history_matches_full_replay(sales_segments, tmp_path):
+    path, sales = sales_segments
+    assert len(stream_store.list_segments(path)) == 3
+    assert len(stream_store.read_stream("sales")) == len(sales)
+
+    # Two sealed segments leave the hot window; the newest one stays raw
+    inventory = str(tmp_path / "inventory.db")
+    added, _ = segments.compact("sales", path, now=LATER, inventory_path=inventory)
+    assert added == 2
+
+    reader = stream_loader.TailReader(path, stream="sales")
+    reader.refresh()
+    assert len(reader.frame()) == 1000 and reader.summary["sales"].sum() == 2000
+    assert reader.summary["quantity_sold"].sum() == sales["quantity_sold"].iloc[:2000].sum()
+
+    # Stock projected from inventory checkpoints + summaries + hot rows = full replay
+    mine, expected = projected_stock(reader, inventory, tmp_path, sales)
+    np.testing.assert_allclose(mine["stock"], expected["stock"])
+    np.testing.assert_allclose(mine["units_sold"], expected["units_sold"])
+
+
+def test_compaction_retry_does_not_checkpoint_twice(sales_segments, tmp_path, monkeypatch):
+    path, sales = sales_segments
+    inventory = str(tmp_path / "inventory.db")
+
+    # Crash between the inventory checkpoint and the summary of the first segment
+    def crash(*args): raise OSError("disk full")
+    with monkeypatch.context() as m:
+        m.setattr(segments, "write_summary", crash)
+        with pytest.raises(OSError):
+            segments.compact("sales", path, now=LATER, inventory_path=inventory)
+    assert segments.load_summary(path)[1] == set()
+
+    assert segments.compact("sales", path, now=LATER, inventory_path=inventory) == (2, 0)
+    sealed = [os.path.basename(s) for s in stream_store.list_segments(path)[:2]]
+    with contextlib.closing(demand.connect(inventory)) as conn:
+        assert sorted(r[0] for r in conn.execute("SELECT segment FROM checkpoints")) == sorted(sealed)
+    first = stream_store.read_segment(path)
+    assert demand.checkpoint_inventory(first, inventory, segment=sealed[0]) is False
+    reader = stream_loader.TailReader(path, stream="sales")
+    reader.refresh()
+    mine, expected = projected_stock(reader, inventory, tmp_path, sales)
+    np.testing.assert_allclose(mine["stock"], expected["stock"])
+
+
+def test_retention_removes_rolled_segments_with_their_sidecars(sales_segments, tmp_path, monkeypatch):
+    path, _ = sales_segments
+    monkeypatch.setattr(segments, "RETENTION_SECS", 3600)
+    rolled = stream_store.list_segments(path)[1]
+    open(rolled + ".lock", "a").close()
+
+    added, deleted = segments.compact("sales", path, now=LATER, inventory_path=str(tmp_path / "inventory.db"))
+    assert (added, deleted) == (2, 1)
+    assert not os.path.exists(rolled) and not os.path.exists(stream_store.commit_path(rolled))
+    assert not os.path.exists(rolled + ".lock")
+    # The base stream file is summarized but never retired
+    assert os.path.exists(path) and os.path.exists(stream_store.commit_path(path))
@@ -0,0 +1,83 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import fetch_fda
+import signals
+
+LABELS = {"Wegovy": "nausea, vomiting, diarrhea", "Rinvoq": "acne, upper respiratory tract infections"}
+
+
+@pytest.fixture
+def detector():
+    """SignalDetector factory reading labels from LABELS"""
+    return lambda window=3600: signals.SignalDetector(window=window, label_text=lambda drug: LABELS.get(drug, ""))
+
+
+def test_disproportionality_matches_hand_computed_table():
+    out = signals.disproportionality([20], [80], [10], [890])
+    prr = (20 / 100) / (10 / 900)
+    ror = (20 * 890) / (80 * 10)
+    assert np.isclose(out['prr'][0], prr)
+    assert np.isclose(out['ror'][0], ror)
+    se = np.sqrt(1 / 20 - 1 / 100 + 1 / 10 - 1 / 900)
+    assert np.isclose(out['prr_lo'][0], prr * np.exp(-1.96 * se))
+    n = 1000
+    chi2 = n * (abs(20 * 890 - 80 * 10) - n / 2) ** 2 / (100 * 900 * 30 * 970)
+    assert np.isclose(out['chi2'][0], chi2)
+
+
+def test_flags_unlabeled_pairs_only_as_novel(detector):
+    det = detector()
+    rng = np.random.default_rng(0)
+    drugs = np.array(["Wegovy"] * 300 + ["Rinvoq"] * 300 + ["Skyrizi"] * 300, dtype=object)
+    found = np.array(["None"] * 900, dtype=object)
+    found[:40] = "Hair Shedding"    # Wegovy, not on its label
+    found[40:80] = "Nausea"         # Wegovy, on its label
+    found[300:303] = "Hair Shedding"
+    found[600:602] = "Fatigue"      # too few cases
+    det.add(1000 + rng.uniform(0, 60, 900), drugs, found)
+
+    table = det.table().set_index(['drug_name', 'symptom'])
+    assert table.loc[('Wegovy', 'Hair Shedding'), 'novel']
+    assert table.loc[('Wegovy', 'Nausea'), 'flagged'] and table.loc[('Wegovy', 'Nausea'), 'labeled']
+    assert not table.loc[('Wegovy', 'Nausea'), 'novel']
+    assert not table.loc[('Skyrizi', 'Fatigue'), 'flagged']
+    assert list(det.flagged(novel_only=True)['symptom']) == ["Hair Shedding"]
+
+
+def test_sliding_window_equals_recompute(detector):
+    rng = np.random.default_rng(1)
+    n = 5000
+    times = np.sort(rng.uniform(0, 4 * 3600, n))
+    drugs = rng.choice(["Wegovy", "Rinvoq", "Skyrizi"], n).astype(object)
+    found = rng.choice(["None", "Acne", "Fatigue", "Hair Shedding"], n).astype(object)
+
+    det = detector(window=3600)
+    for batch in np.array_split(np.arange(n), 37):
+        det.add(times[batch], drugs[batch], found[batch])
+
+    # Reference: every report whose pane is still inside the window, counted from scratch
+    starts = times // 60 * 60
+    live = starts > times.max() - 3600
+    ref = pd.DataFrame({'drug': drugs[live], 'symptom': found[live]})
+    ref = ref[ref['symptom'] != "None"].groupby(['drug', 'symptom']).size()
+    table = det.table().set_index(['drug_name', 'symptom'])['a']
+    assert table.sort_index().to_dict() == ref.sort_index().to_dict()
+    assert det.total == int(live.sum())
+
+
+
+def test_label_text_reads_the_cached_label_only(monkeypatch):
+    calls = []
+    def get_drug_label(drug, offline=False):
+        calls.append((drug, offline))
+        if drug == "Broken": raise ValueError("corrupt store")
+        return {"adverse_reactions": "Nausea, Micro Hemorrhage"} if drug == "Wegovy" else None
+    monkeypatch.setattr(fetch_fda, "get_drug_label", get_drug_label)
+
+    assert signals.label_text("Wegovy") == "nausea, micro hemorrhage"
+    assert signals.label_text("Unknown") == "" and signals.label_text("Broken") == ""
+    assert all(offline for _, offline in calls)
+    assert signals.is_labeled("Micro-Hemorrhage", signals.label_text("Wegovy"))  # hyphen as space
+    assert not signals.is_labeled("Acne", signals.label_text("Wegovy"))
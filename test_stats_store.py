@@ -0,0 +1,49 @@
+import pandas as pd
+
+import stats_store
+
+
+def current(path):
+    return stats_store.read_stats(path).drop(columns="updated_at").set_index("drug_name").sort_index()
+
+
+def test_sink_upserts_each_time_step(tmp_path):
+    path = str(tmp_path / "live_stats.db")
+    assert stats_store.read_stats(path).empty
+
+    sink = stats_store.StatsSink(path)
+    sink.on_change(1, {"drug_name": "Wegovy", "sold": 3, "risk_score": 1.5}, 2, True)
+    sink.on_change(2, {"drug_name": "Rinvoq", "sold": 1, "risk_score": 0.5}, 2, True)
+    assert stats_store.read_stats(path).empty  # nothing is written before the step ends
+    sink.on_time_end(2)
+    assert current(path).to_dict("index") == {"Rinvoq": {"sold": 1, "risk_score": 0.5},
+                                              "Wegovy": {"sold": 3, "risk_score": 1.5}}
+
+    # An update arrives as an addition plus a deletion of the old row, in either order
+    sink.on_change(1, {"drug_name": "Wegovy", "sold": 5, "risk_score": 2.0}, 4, True)
+    sink.on_change(1, {"drug_name": "Wegovy", "sold": 3, "risk_score": 1.5}, 4, False)
+    sink.on_change(2, {"drug_name": "Rinvoq", "sold": 1, "risk_score": 0.5}, 4, False)
+    sink.on_time_end(4)
+    sink.on_end()
+    assert current(path).to_dict("index") == {"Wegovy": {"sold": 5, "risk_score": 2.0}}
+
+    # A resumed backend with the same schema keeps the rows; a new schema starts over
+    resumed = stats_store.StatsSink(path)
+    resumed.on_change(3, {"drug_name": "Skyrizi", "sold": 2, "risk_score": 1.0}, 6, True)
+    resumed.on_time_end(6)
+    assert list(current(path).index) == ["Skyrizi", "Wegovy"]
+    changed = stats_store.StatsSink(path)
+    changed.on_change(3, {"drug_name": "Skyrizi", "sold_5m": 2}, 8, True)
+    changed.on_time_end(8)
+    assert current(path).to_dict("index") == {"Skyrizi": {"sold_5m": 2}}
+
+
+def test_subscribe_mirrors_a_pathway_table(tmp_path):
+    import pathway as pw
+    path = str(tmp_path / "live_stats.db")
+    pw.internals.parse_graph.G.clear()
+    sales = pw.debug.table_from_pandas(pd.DataFrame({"drug_name": ["Wegovy", "Rinvoq", "Wegovy"], "sold": [1, 2, 3]}))
+    totals = sales.groupby(sales.drug_name).reduce(sales.drug_name, sold=pw.reducers.sum(sales.sold))
+    stats_store.subscribe(totals, path)
+    pw.run(monitoring_level=pw.MonitoringLevel.NONE)
+    assert current(path)["sold"].to_dict() == {"Rinvoq": 2, "Wegovy": 4}
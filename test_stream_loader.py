@@ -0,0 +1,169 @@
+import os
+import pandas as pd
+import pytest
+
+import stream_loader
+import stream_store
+
+RX_HEADER = "timestamp,drug_name,doctor_id,dosage_mg,patient_age_group\n"
+
+
+def rx_row(i):
+    return f"2026-01-01T00:{i:02d}:00,Wegovy,DOC-{i},5,18-30\n"
+
+
+def rx_reader(path):
+    return stream_loader.TailReader(str(path), stream="rx")
+
+
+def doctors(frame):
+    return frame["doctor_id"].astype(str).tolist()
+
+
+def test_typed_chunks_concatenate(tmp_path):
+    path = tmp_path / "sales.csv"
+    rows = pd.DataFrame({
+        "timestamp": pd.date_range("2026-01-01", periods=12, freq="min").strftime("%Y-%m-%dT%H:%M:%S.%f"),
+        "drug_name": ["Wegovy"] * 4 + ["Rinvoq"] * 4 + ["Skyrizi"] * 4,  # new categories in later chunks
+        "pharmacy_id": [f"PH-{i % 5}" for i in range(12)],
+        "quantity_sold": range(1, 13),
+        "location": ["Springfield"] * 12,
+    })
+    reader = stream_loader.TailReader(str(path), stream="sales")
+    for start in (0, 4, 8, 10):
+        rows.iloc[start:start + (4 if start < 8 else 2)].to_csv(path, mode="a", header=start == 0, index=False)
+        reader.refresh()
+
+    frame = reader.frame()
+    assert isinstance(frame["drug_name"].dtype, pd.CategoricalDtype)
+    assert isinstance(frame["pharmacy_id"].dtype, pd.CategoricalDtype)
+    assert frame["quantity_sold"].dtype == "int16"
+    assert pd.api.types.is_datetime64_any_dtype(frame["timestamp"])
+    assert frame["drug_name"].astype(str).tolist() == rows["drug_name"].tolist()
+    # Tail chunks merge like a binary counter: 4 + 4 + 2 + 2 rows -> [8, 4]
+    assert [len(chunk) for chunk in reader.chunks] == [8, 4]
+    assert reader.take([9, 0, 5])["quantity_sold"].tolist() == [10, 1, 6]
+
+    since, _, _ = reader.since((reader.generation, 2))
+    assert isinstance(since["drug_name"].dtype, pd.CategoricalDtype) and len(since) == 10
+    window = stream_store.filter_frame(frame, drugs=["Rinvoq"], start="2026-01-01T00:05:00")
+    assert window["quantity_sold"].tolist() == [6, 7, 8]
+
+
+def test_partial_trailing_line_waits_for_its_newline(tmp_path):
+    path = tmp_path / "rx.csv"
+    path.write_text(RX_HEADER + rx_row(0) + rx_row(1)[:15])
+    reader = rx_reader(path)
+    assert reader.refresh() == 1
+
+    with open(path, "a") as f: f.write(rx_row(1)[15:])
+    assert reader.refresh() == 1
+    assert doctors(reader.frame()) == ["DOC-0", "DOC-1"]
+    assert reader.refresh() == 0
+
+
+def test_header_only_and_missing_files(tmp_path):
+    path = tmp_path / "rx.csv"
+    reader = rx_reader(path)
+    assert reader.refresh() == 0  # not created yet
+
+    path.write_text(RX_HEADER)
+    assert reader.refresh() == 0 and reader.frame().empty
+    rows, cursor, reset = reader.since(None)
+    assert rows.empty and reset and cursor == (reader.generation, 0)
+
+    with open(path, "a") as f: f.write(rx_row(3))
+    assert reader.refresh() == 1
+    rows, _, reset = reader.since(cursor)
+    assert doctors(rows) == ["DOC-3"] and not reset
+
+
+def test_truncation_resets_offsets(tmp_path):
+    path = tmp_path / "rx.csv"
+    path.write_text(RX_HEADER + rx_row(0) + rx_row(1) + rx_row(2))
+    reader = rx_reader(path)
+    assert reader.refresh() == 3
+    cursor = reader.version
+
+    # Truncated in place and rewritten shorter: everything is read again from the header
+    path.write_text(RX_HEADER + rx_row(5))
+    assert reader.refresh() == 1
+    rows, new_cursor, reset = reader.since(cursor)
+    assert reset and doctors(rows) == ["DOC-5"]
+    assert new_cursor == (cursor[0] + 1, 1) and reader.tail.offset == os.path.getsize(path)
+
+    # Rewritten in place to the very same length: caught by the tail's fingerprint
+    path.write_text(RX_HEADER + rx_row(6))
+    assert reader.refresh() == 1 and doctors(reader.frame()) == ["DOC-6"]
+
+
+def test_rotation_resets_offsets(tmp_path):
+    path = tmp_path / "rx.csv"
+    path.write_text(RX_HEADER + rx_row(0))
+    reader = rx_reader(path)
+    assert reader.refresh() == 1
+    generation = reader.generation
+
+    # Rotated: a new (longer) file replaces the one being tailed
+    rotated = tmp_path / "rx.csv.new"
+    rotated.write_text(RX_HEADER + rx_row(7) + rx_row(8))
+    os.replace(rotated, path)
+    assert reader.refresh() == 2
+    assert reader.generation == generation + 1 and doctors(reader.frame()) == ["DOC-7", "DOC-8"]
+
+
+def test_readers_stop_at_commit_marker(stream_file):
+    path = stream_file("rx")
+    sink = stream_store.CsvSink("rx", batch_rows=3, rotate=False)
+    sink.init()
+    reader = rx_reader(path)
+    with sink.batch():
+        for i in range(5): sink.write(["2026-01-01T00:00:00", "Wegovy", f"DOC-{i}", 5, "18-30"])
+        assert reader.refresh() == 0  # nothing committed inside the batch
+    assert reader.refresh() == 5
+
+    # A writer crashed halfway through a batch: the torn bytes are never parsed...
+    with open(path, "ab") as f: f.write(b"2026-01-01T00:01:00,Wegovy,DOC-9,5,18-30\n2026-01-01T00:01:00,Weg")
+    assert reader.refresh() == 0 and len(stream_store.read_stream("rx")) == 5
+    # ...and the next commit replaces them
+    sink.write(["2026-01-01T00:02:00", "Rinvoq", "DOC-7", 10, "31-50"])
+    sink.close()
+    assert reader.refresh() == 1
+    assert doctors(reader.frame()) == [f"DOC-{i}" for i in range(5)] + ["DOC-7"]
+    assert os.path.getsize(path) == stream_store.committed_offset(path)
+
+
+def test_sink_commits_by_rows_or_age(stream_file, monkeypatch):
+    path = stream_file("rx")
+    sink = stream_store.CsvSink("rx", batch_rows=3, flush_secs=60, rotate=False)
+    sink.init()
+    reader = rx_reader(path)
+    row = lambda i: ["2026-01-01T00:00:00", "Wegovy", f"DOC-{i}", 5, "18-30"]
+    for i in range(2): sink.write(row(i))
+    assert reader.refresh() == 0  # buffered, not committed yet
+    sink.write(row(2))
+    assert reader.refresh() == 3
+
+    # A quiet stream still commits once its oldest buffered row is flush_secs old
+    sink.write(row(3))
+    assert reader.refresh() == 0
+    sink.flush_secs = 0
+    sink.write(row(4))
+    assert reader.refresh() == 2
+
+    # Per-row durability stays available
+    commits = []
+    publish = stream_store._publish
+    monkeypatch.setattr(stream_store, "_publish", lambda *args: (commits.append(args), publish(*args)))
+    per_row = stream_store.CsvSink("rx", batch_rows=1, rotate=False)
+    for i in range(5, 8): per_row.write(row(i))
+    per_row.close()
+    assert len(commits) == 3 and reader.refresh() == 3
+    assert stream_store.open_sink("rx", mode="csv").batch_rows == stream_store.CSV_BATCH_ROWS
+
+
+def test_readers_must_implement_refresh():
+    class NoRefresh(stream_loader.ChunkedReader):
+        pass
+    with pytest.raises(TypeError):
+        NoRefresh("memory")
@@ -0,0 +1,61 @@
+import os
+import pandas as pd
+import pytest
+
+import stream_store
+
+
+@pytest.fixture
+def parquet_store(tmp_path, monkeypatch):
+    monkeypatch.setattr(stream_store, "STORE_DIR", str(tmp_path / "store"))
+    return tmp_path / "store"
+
+
+def sales_rows(n, start="2026-01-05T10:00:00"):
+    times = pd.Timestamp(start) + pd.to_timedelta(range(0, 60 * n, 60), unit="s")  # one row a minute
+    return pd.DataFrame({
+        "timestamp": times.strftime("%Y-%m-%dT%H:%M:%S.%f"),
+        "drug_name": [["Wegovy", "Rinvoq", "Skyrizi"][i % 3] for i in range(n)],
+        "pharmacy_id": [f"PH-{i % 7}" for i in range(n)],
+        "quantity_sold": [i % 5 + 1 for i in range(n)],
+        "location": ["Springfield"] * n,
+    })
+
+
+def write(rows, batch_rows=40):
+    sink = stream_store.ParquetSink("sales", batch_rows=batch_rows, flush_secs=3600, compact=False)
+    sink.init()
+    for row in rows.itertuples(index=False): sink.write(list(row))
+    sink.close()
+
+
+def test_parquet_reads_push_down_drug_time_and_columns(parquet_store):
+    rows = sales_rows(150)  # 10:00 to 12:29, three hourly partitions per drug
+    write(rows)
+    assert sorted(os.listdir(parquet_store / "sales")) == ["drug_name=Rinvoq", "drug_name=Skyrizi", "drug_name=Wegovy"]
+    assert len(os.listdir(parquet_store / "sales" / "drug_name=Wegovy")) == 3
+
+    columns = ["timestamp", "drug_name", "quantity_sold"]
+    start, end = "2026-01-05T10:45:00", "2026-01-05T12:05:00"
+    got = stream_store.read_parquet("sales", columns, ["Wegovy", "Skyrizi"], start, end)
+    expected = stream_store.filter_frame(rows, columns, ["Wegovy", "Skyrizi"], start, end)
+    assert list(got.columns) == columns
+    pd.testing.assert_frame_equal(got.sort_values("timestamp").reset_index(drop=True),
+                                  expected.reset_index(drop=True), check_dtype=False)
+    assert stream_store.read_parquet("sales", drugs=["Paxlovid"]).empty
+
+
+def test_compaction_keeps_every_row_once(parquet_store):
+    rows = sales_rows(120)
+    tracker = stream_store.PartTracker("sales")
+    write(rows.iloc[:90], batch_rows=10)
+    seen = tracker.read_new()
+    assert len(seen) == 90
+
+    # Closed hours are merged into one compact file each; the tracker does not re-read them
+    assert stream_store.compact("sales", now=pd.Timestamp("2026-01-06")) > 0
+    assert all(len(stream_store.list_files(os.path.dirname(p))) == 1 for p in stream_store.list_parts("sales"))
+    write(rows.iloc[90:], batch_rows=10)
+    seen = pd.concat([seen, tracker.read_new()])
+    assert sorted(seen["timestamp"]) == sorted(rows["timestamp"])
+    assert len(stream_store.read_parquet("sales")) == len(rows)
@@ -1,97 +1,150 @@
 import streamlit as st
-from openai import OpenAI
+from openai import OpenAI, AsyncOpenAI
 import pandas as pd
 import os
+import time
+import asyncio
+import queue
+import threading
 import requests
 import json
 from dotenv import load_dotenv
 import fetch_fda 
+import stats_store
+import data_service
+import copilot_cache
+import metrics
 
 load_dotenv()
 
+# Stage timings on 127.0.0.1:VIGILANCE_METRICS_PORT/metrics (only inside a running Streamlit app)
+if st.runtime.exists(): metrics.start("app")
+
 # --- SHARED FUNCTIONS ---
 
+@st.cache_resource
+def get_data_hub():
+    """The parsed streams and their views: a client of the shared data service when
+    VIGILANCE_DATA_SERVICE is set, else one in-process hub per Streamlit process"""
+    return data_service.make_hub()
+
 def load_data():
-    """Robust data loader with empty fallback"""
-    data = {}
-    try: data['social'] = pd.read_csv("./data/social_stream.csv")
-    except: data['social'] = pd.DataFrame()
-    
-    try: data['rx'] = pd.read_csv("./data/prescriptions_stream.csv")
-    except: data['rx'] = pd.DataFrame()
-    
-    try: data['sales'] = pd.read_csv("./data/sales_stream.csv")
-    except: data['sales'] = pd.DataFrame()
-    return data
+    """Incremental data loader with empty fallback (only newly appended rows are parsed)"""
+    with metrics.span("load_data"):
+        return get_data_hub().load()
 
-def query_copilot(user_query):
-    """
-    Hybrid RAG Logic for Drug Copilot
-    """
-    client = OpenAI()
-    
-    # 1. IDENTIFY DRUG
-    target_drug = "Unknown"
-    for drug in ["Wegovy", "Leqembi", "Mounjaro", "Skyrizi", "Paxlovid", "Rinvoq", "Ozempic"]:
-        if drug.lower() in user_query.lower():
-            target_drug = drug
+def load_feed_page(feed_filter, before=None, page_size=20):
+    """One page of threads: (parents DataFrame newest first, {post_id: replies DataFrame}, next cursor, total posts).
+    The index is extended with newly appended rows only, so a page costs the same at any history size."""
+    return get_data_hub().feed_page(feed_filter, before, page_size)
+
+def load_dashboard_views():
+    """Folds newly appended social/rx rows into the dashboard views and returns their snapshot"""
+    return get_data_hub().dashboard()
+
+def load_live_stats():
+    """Current per-drug backend stats (windows + decayed risk), one row per drug"""
+    return stats_store.read_stats()
+
+def load_slice(stream, columns=None, drugs=None, start=None, end=None):
+    """Projected, filtered slice of one stream.
+    Parquet mode pushes columns and drug/time predicates down to the partitioned store;
+    CSV mode applies the same filters to the shared in-memory frame."""
+    return get_data_hub().slice(stream, columns, drugs, start, end)
+
+def load_cube():
+    """drug x gender x age x source x symptom counts, folded forward to the newest social rows"""
+    return get_data_hub().cube()
+
+def load_canonical_posts(drug=None, n=5):
+    """Most repeated distinct posts (near-duplicates collapsed) with their multiplicity"""
+    return get_data_hub().canonical_posts(drug, n)
+
+def load_signals(drug=None):
+    """Drug x symptom disproportionality table over the signal window (see signals.py)"""
+    return get_data_hub().signals(drug)
+
+def load_scorecards():
+    """Per-drug Doctor View scorecards, up to date with the stream; pick a card with .card(drug)"""
+    return get_data_hub().scorecards()
+
+def load_demand():
+    """Demand velocity + stock projection, up to date with the sales/social streams"""
+    return get_data_hub().demand()
+
+COPILOT_DRUGS = ["Wegovy", "Leqembi", "Mounjaro", "Skyrizi", "Paxlovid", "Rinvoq", "Ozempic"]
+
+def parse_intent(user_query):
+    """Normalized copilot intent: target drug plus demographic filters"""
+    query = user_query.lower()
+    intent = {"drug": "Unknown", "gender": None, "age": None}
+
+    for drug in COPILOT_DRUGS:
+        if drug.lower() in query:
+            intent["drug"] = drug
             break
-            
-    # 2. FDA CONTEXT
-    fda_context = ""
-    if target_drug != "Unknown":
-        try:
-            label = fetch_fda.fetch_drug_label(target_drug)
-            if label:
-                fda_context = f"FDA LABEL FOR {target_drug}: {label.get('warnings', '')[:1000]}..."
-        except: pass
-        
-    # 3. SOCIAL CONTEXT (Hybrid RAG)
-    social_insight = "No live social data available."
+
+    if "women" in query or "female" in query: intent["gender"] = "Female"
+    elif "men" in query or "male" in query: intent["gender"] = "Male"
+
+    if "under 30" in query: intent["age"] = "<30"
+    elif "over 50" in query: intent["age"] = ">50"
+    return intent
+
+def fda_context_for(target_drug):
+    """FDA label excerpt for the prompt (served from the label cache)"""
+    if target_drug == "Unknown": return ""
     try:
-        sdf = pd.read_csv("./data/social_stream.csv")
-        
-        # Demographic Filtering
-        filtered_sdf = sdf.copy()
-        filter_desc = "All Patients"
-        
-        # Gender
-        if "women" in user_query.lower() or "female" in user_query.lower():
-            filtered_sdf = filtered_sdf[filtered_sdf['patient_gender'] == "Female"]; filter_desc += ", Female"
-        elif "men" in user_query.lower() or "male" in user_query.lower():
-            filtered_sdf = filtered_sdf[filtered_sdf['patient_gender'] == "Male"]; filter_desc += ", Male"
-            
-        # Age
-        if "under 30" in user_query.lower():
-            filtered_sdf = filtered_sdf[filtered_sdf['patient_age'] < 30]; filter_desc += ", <30 years"
-        elif "over 50" in user_query.lower():
-            filtered_sdf = filtered_sdf[filtered_sdf['patient_age'] > 50]; filter_desc += ", >50 years"
-            
-        # Drug Filter
-        if target_drug != "Unknown":
-            filtered_sdf = filtered_sdf[filtered_sdf['drug_name'] == target_drug]
-            
-        # Calc Stats
-        if not filtered_sdf.empty:
-            symptoms = filtered_sdf[filtered_sdf['detected_symptom'] != "None"]['detected_symptom'].value_counts().head(3).to_dict()
-            total_reports = len(filtered_sdf)
-            avg_rating = filtered_sdf['rating'].mean()
-            
-            social_insight = f"""
+        label = fetch_fda.get_drug_label(target_drug)
+        if label:
+            return f"FDA LABEL FOR {target_drug}: {label.get('warnings', '')[:1000]}..."
+    except: pass
+    return ""
+
+def slice_stats(intent):
+    """(posts, avg rating, {symptom: posts}) of the intent's slice, read from the demographic cube"""
+    return load_cube().query(
+        drug=None if intent["drug"] == "Unknown" else intent["drug"],
+        gender=intent["gender"],
+        age=intent["age"],
+    )
+
+def social_insight_for(intent, stats=None):
+    """Live social statistics for the intent's slice, formatted for the prompt"""
+    target_drug = intent["drug"]
+    filter_desc = "All Patients"
+    if intent["gender"]: filter_desc += f", {intent['gender']}"
+    if intent["age"]: filter_desc += f", {intent['age']} years"
+
+    try:
+        total_reports, avg_rating, symptom_counts = stats or slice_stats(intent)
+    except Exception as e:
+        return f"Social Analytics Error: {e}"
+    symptom_counts = dict(symptom_counts)
+
+    if not total_reports:
+        return f"No reports found matching criteria: {filter_desc}"
+
+    symptom_counts.pop("None", None)
+    symptoms = dict(sorted(symptom_counts.items(), key=lambda kv: -kv[1])[:3])
+
+    # Each distinct report once, with how often it (or a near-copy) was posted
+    try:
+        top_posts = load_canonical_posts(None if target_drug == "Unknown" else target_drug, n=3)
+        reports = "; ".join(f'"{row.text}" (x{row.multiplicity})' for row in top_posts.itertuples())
+    except Exception as e:
+        reports = f"unavailable ({e})"
+    return f"""
             LIVE OBSERVATIONAL DATA ({filter_desc}):
             - Sample Size: {total_reports} reports filtered.
             - Drug: {target_drug}
             - Top Side Effects: {symptoms}
             - Avg Satisfaction: {avg_rating:.1f}/10
+            - Most Repeated Reports: {reports}
             """
-        else:
-            social_insight = f"No reports found matching criteria: {filter_desc}"
-            
-    except Exception as e:
-        social_insight = f"Social Analytics Error: {e}"
 
-    # 4. LLM CALL
-    full_prompt = f"""
+def build_prompt(user_query, fda_context, social_insight):
+    return f"""
     You are Vigilance.AI, a specialized safety analyst.
     USER QUERY: "{user_query}"
     SOURCE 1 (FDA): {fda_context}
@@ -102,13 +155,133 @@ def query_copilot(user_query):
     2. Highlight discrepancies between FDA labels and Live Signals.
     3. Format as "Clinical Insight".
     """
+
+def fallback_answer(social_insight, error):
+    return f"**Analysis based on Live Stream:** \n\n{social_insight}\n\n*(AI Generation Unavailable: {error})*"
+
+@st.cache_resource
+def get_response_cache():
+    """Copilot answers shared across sessions (bounded LRU + TTL)"""
+    return copilot_cache.ResponseCache(max_entries=256, ttl=900)
+
+def query_copilot(user_query):
+    """
+    Hybrid RAG Logic for Drug Copilot
+    """
+    # 1. IDENTIFY DRUG (+ demographic filters)
+    with metrics.span("copilot.detect_drug"):
+        intent = parse_intent(user_query)
+
+    # 1b. RESPONSE CACHE (same intent + question, aggregates not materially changed -> same answer)
+    with metrics.span("copilot.filter"):
+        try: stats = slice_stats(intent)
+        except Exception: stats = None
+    cache = get_response_cache()
+    cache_key = cache.key(intent, user_query)
+    based_on = copilot_cache.fingerprint(stats) if stats else None
+    if based_on:
+        cached = cache.get(cache_key, based_on)
+        if cached:
+            metrics.count("copilot_cache_hits")
+            return cached
+            
+    # 2. FDA CONTEXT
+    with metrics.span("copilot.fda_fetch"):
+        fda_context = fda_context_for(intent["drug"])
+        
+    # 3. SOCIAL CONTEXT (Hybrid RAG, pre-aggregated cube)
+    with metrics.span("copilot.format"):
+        social_insight = social_insight_for(intent, stats)
+
+    # 4. LLM CALL
+    full_prompt = build_prompt(user_query, fda_context, social_insight)
     
     try:
-        completion = client.chat.completions.create(
-            model="gpt-4o", 
-            messages=[{"role": "user", "content": full_prompt}],
+        with metrics.span("copilot.llm"):
+            client = OpenAI()
+            completion = client.chat.completions.create(
+                model="gpt-4o", 
+                messages=[{"role": "user", "content": full_prompt}],
+                temperature=0,
+            )
+        answer = completion.choices[0].message.content
+        if based_on: cache.put(cache_key, based_on, answer)
+        return answer
+    except Exception as e:
+        metrics.count("copilot_llm_errors")
+        return fallback_answer(social_insight, e)
+
+async def astream_copilot(user_query):
+    """
+    Async, streaming variant of query_copilot.
+    The FDA context and the social stats are computed concurrently, then the
+    LLM answer is yielded token by token as it arrives.
+    """
+    # 1. IDENTIFY DRUG (+ demographic filters)
+    with metrics.span("copilot.detect_drug"):
+        intent = parse_intent(user_query)
+
+    # 2 + 3. FDA CONTEXT and SOCIAL STATS in parallel
+    fda_context, stats = await asyncio.gather(
+        asyncio.to_thread(metrics.timed("copilot.fda_fetch")(fda_context_for), intent["drug"]),
+        asyncio.to_thread(metrics.timed("copilot.filter")(slice_stats), intent),
+        return_exceptions=True,
+    )
+    if isinstance(fda_context, Exception): fda_context = ""
+    if isinstance(stats, Exception): stats = None
+
+    # Cached answers are yielded whole
+    cache = get_response_cache()
+    cache_key = cache.key(intent, user_query)
+    based_on = copilot_cache.fingerprint(stats) if stats else None
+    if based_on:
+        cached = cache.get(cache_key, based_on)
+        if cached:
+            metrics.count("copilot_cache_hits")
+            yield cached
+            return
+
+    with metrics.span("copilot.format"):
+        social_insight = social_insight_for(intent, stats)
+
+    # 4. LLM CALL (streamed; time to first token and to the full answer)
+    tokens = []
+    started = time.perf_counter()
+    try:
+        client = AsyncOpenAI()
+        stream = await client.chat.completions.create(
+            model="gpt-4o",
+            messages=[{"role": "user", "content": build_prompt(user_query, fda_context, social_insight)}],
             temperature=0,
+            stream=True,
         )
-        return completion.choices[0].message.content
+        async for chunk in stream:
+            token = chunk.choices[0].delta.content if chunk.choices else None
+            if token:
+                if not tokens: metrics.observe("copilot.llm_first_token", time.perf_counter() - started)
+                tokens.append(token)
+                yield token
+        metrics.observe("copilot.llm", time.perf_counter() - started)
     except Exception as e:
-        return f"**Analysis based on Live Stream:** \n\n{social_insight}\n\n*(AI Generation Unavailable: {e})*"
+        metrics.count("copilot_llm_errors")
+        yield fallback_answer(social_insight, e)
+        return
+    if based_on and tokens: cache.put(cache_key, based_on, "".join(tokens))
+
+def stream_copilot(user_query):
+    """Sync generator over astream_copilot (for st.write_stream): runs the event loop on a worker thread"""
+    tokens = queue.Queue()
+    done = object()
+
+    async def pump():
+        try:
+            async for token in astream_copilot(user_query):
+                tokens.put(token)
+        except Exception as e:
+            tokens.put(f"*(Copilot error: {e})*")
+        finally:
+            tokens.put(done)
+
+    threading.Thread(target=asyncio.run, args=(pump(),), daemon=True).start()
+    while (token := tokens.get()) is not done:
+        yield token